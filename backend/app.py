@@ -7,13 +7,26 @@ from datetime import datetime, timedelta
 
 from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from dotenv import load_dotenv
 from functools import wraps
 import requests
 
 from models import db as models_db # Kept for explicit import chain if needed, but not shadowing
 from extensions import db, socketio, jwt
+from json_provider import init_json
+from compression import init_compression
+from metrics import init_metrics, start_metrics_snapshots
+from cluster import start_cluster_sync
+from db_profile import init_db_profile, engine_options, normalize_database_url
+from pi_registry import pi_registry
+from live_positions import ALL_BUSES_ROOM, position_grid, set_viewport, clear_viewport, \
+    add_client, remove_client, set_buses, clear_buses, bus_room, route_room, driver_room, emit_alert, \
+    client_room
+import geo
+import socket_codec
+import telemetry
+from telemetry import telemetry_watchers
 
 # Load environment variables
 load_dotenv()
@@ -21,7 +34,8 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend/dist', static_url_path='')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///rash_driving.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(os.getenv('DATABASE_URL', 'sqlite:///rash_driving.db'))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # JWT Configuration
@@ -48,11 +62,20 @@ def require_api_key(f):
         return jsonify({'error': 'Unauthorized'}), 401
     return decorated_function
 
+# Fast JSON responses (orjson when installed) and gzip/brotli compression.
+# Metrics hooks go first so request timings include compression.
+init_json(app)
+init_metrics(app, socketio)
+init_compression(app)
+
 # Initialize extensions
 CORS(app, origins="*")
+init_db_profile()  # SQLite WAL/pragmas on every connection
 db.init_app(app)
 jwt.init_app(app)
 socketio.init_app(app)
+start_cluster_sync()  # replay cache changes from other workers (needs SOCKETIO_MESSAGE_QUEUE)
+start_metrics_snapshots(socketio)  # per-worker metrics for /metrics (needs METRICS_DIR)
 
 # Import and register blueprints
 from routes.events import events_bp
@@ -62,6 +85,7 @@ from routes.media import media_bp
 from routes.simulation import simulation_bp
 from routes.drivers import drivers_bp
 from routes.analytics import analytics_bp
+from routes.dashboard import dashboard_bp
 
 app.register_blueprint(events_bp)
 app.register_blueprint(buses_bp)
@@ -70,39 +94,192 @@ app.register_blueprint(media_bp)
 app.register_blueprint(simulation_bp)
 app.register_blueprint(drivers_bp)
 app.register_blueprint(analytics_bp)
+app.register_blueprint(dashboard_bp)
 
 
 # ==================== SOCKETIO EVENTS ====================
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection to WebSocket."""
+def handle_connect(auth=None):
+    """
+    Handle client connection to WebSocket.
+    Clients may ask for binary frames with auth {encoding: 'msgpack'} (or
+    ?encoding=msgpack); the `connected` reply says which encoding is in use
+    and, for MessagePack, carries the field codebook.
+    """
     print(f"Client connected")
-    emit('connected', {'status': 'connected', 'message': 'Welcome to Rash Driving Detection System'})
+    requested = (auth or {}).get('encoding') if isinstance(auth, dict) else None
+    encoding = socket_codec.negotiate(requested or request.args.get('encoding'))
+    add_client(request.sid, encoding)
+    join_room(client_room(request.sid, ALL_BUSES_ROOM))
+    reply = {'status': 'connected', 'message': 'Welcome to Rash Driving Detection System',
+             'encoding': encoding}
+    if encoding == socket_codec.MSGPACK:
+        reply['fields'] = socket_codec.FIELD_CODES
+    emit('connected', reply)
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
+    remove_client(request.sid)
+    telemetry_watchers.unwatch(request.sid)
     print(f"Client disconnected")
 
 
-def broadcast_alert(event_data):
+@socketio.on('subscribe_viewport')
+def handle_subscribe_viewport(data):
     """
-    Broadcast a new driving event to all connected dashboard clients.
-    Called from the events API when a new event is received.
+    Only receive bus_updates for buses inside a map viewport.
+    Payload: { bbox: [south, west, north, east] } (or "south,west,north,east").
+    Replies with a viewport_snapshot of the buses currently inside it.
+    """
+    raw = (data or {}).get('bbox')
+    try:
+        bbox = geo.parse_bbox(raw if isinstance(raw, str) else ','.join(str(v) for v in raw))
+    except (ValueError, TypeError):
+        emit('error', {'error': 'bbox must be south,west,north,east'})
+        return
+    set_viewport(request.sid, bbox)
+    position_grid.load()
+    locations = position_grid.query(bbox)
+    emit('viewport_snapshot', {'count': len(locations), 'locations': locations})
+
+
+@socketio.on('unsubscribe_viewport')
+def handle_unsubscribe_viewport():
+    """Go back to receiving every bus's updates (unless scoped with 'subscribe')."""
+    clear_viewport(request.sid)
+
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
     """
-    socketio.emit('new_alert', event_data)
+    Scope a client to some buses instead of the whole fleet (driver app,
+    per-route or per-bus dashboards). Alerts then come only from the joined
+    bus/route/driver rooms, and bus_updates only for those buses.
+    Payload (any combination): { bus_id, bus_ids: [..], route, token }
+    `token` is a driver JWT: joins the driver's room and follows the bus of
+    their active trip. Replies with 'subscribed'.
+    """
+    from models import Bus, Trip
+    data = data or {}
+    bus_ids = set(data.get('bus_ids') or [])
+    if data.get('bus_id') is not None:
+        bus_ids.add(data['bus_id'])
+    try:
+        bus_ids = {int(b) for b in bus_ids}
+    except (ValueError, TypeError):
+        emit('error', {'error': 'bus_id must be an integer'})
+        return
+    scoped_rooms = [bus_room(b) for b in bus_ids]
+
+    route = data.get('route')
+    if route:
+        scoped_rooms.append(route_room(route))
+        bus_ids.update(b.id for b in Bus.query.with_entities(Bus.id).filter_by(route=route))
+
+    if data.get('token'):
+        try:
+            from flask_jwt_extended import decode_token
+            driver_id = int(decode_token(data['token'])['sub'])
+        except Exception:
+            emit('error', {'error': 'Invalid driver token'})
+            return
+        scoped_rooms.append(driver_room(driver_id))
+        trip = Trip.query.filter_by(driver_id=driver_id, ended_at=None).first()
+        if trip is not None:
+            bus_ids.add(trip.bus_id)
+
+    if not scoped_rooms:
+        emit('error', {'error': 'bus_id, bus_ids, route or token required'})
+        return
+    _leave_scoped_rooms()
+    leave_room(client_room(request.sid, ALL_BUSES_ROOM))
+    for room in scoped_rooms:
+        join_room(client_room(request.sid, room))
+    set_buses(request.sid, bus_ids)
+    emit('subscribed', {'rooms': scoped_rooms, 'bus_ids': sorted(bus_ids)})
+
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe():
+    """Back to fleet-wide alerts and bus_updates."""
+    _leave_scoped_rooms()
+    join_room(client_room(request.sid, ALL_BUSES_ROOM))
+    clear_buses(request.sid)
+
+
+@socketio.on('watch_telemetry')
+def handle_watch_telemetry(data):
+    """
+    Receive a bus's live telemetry (Pis started with TELEMETRY_STREAM=true).
+    Payload: { bus_id, rate?: 1|2|5|10 (Hz), record?: bool }
+    Frames arrive as 'telemetry' events holding min/max buckets per field at
+    the chosen rate. `record` also appends the raw samples to a CSV on the
+    server while this client watches. Replies 'telemetry_watching'.
+    """
+    data = data or {}
+    try:
+        bus_id = int(data.get('bus_id'))
+        rate = int(data.get('rate') or telemetry.DEFAULT_RATE)
+    except (ValueError, TypeError):
+        emit('error', {'error': 'bus_id and rate must be integers'})
+        return
+    if rate not in telemetry.RATES:
+        emit('error', {'error': f'rate must be one of {list(telemetry.RATES)}'})
+        return
+    _leave_telemetry_rooms(bus_id)
+    record = bool(data.get('record'))
+    telemetry_watchers.watch(request.sid, bus_id, rate, record)
+    join_room(client_room(request.sid, telemetry.telemetry_room(bus_id, rate)))
+    emit('telemetry_watching', {'bus_id': bus_id, 'rate': rate, 'interval_ms': 1000 // rate,
+                                'fields': telemetry.FIELDS, 'record': record})
+
+
+@socketio.on('unwatch_telemetry')
+def handle_unwatch_telemetry(data=None):
+    """Stop live telemetry for one bus ({bus_id}) or for all of them."""
+    bus_id = (data or {}).get('bus_id')
+    try:
+        bus_id = int(bus_id) if bus_id is not None else None
+    except (ValueError, TypeError):
+        emit('error', {'error': 'bus_id must be an integer'})
+        return
+    _leave_telemetry_rooms(bus_id)
+    telemetry_watchers.unwatch(request.sid, bus_id)
+
+
+def _leave_telemetry_rooms(bus_id=None):
+    prefix = 'telemetry:' if bus_id is None else f'telemetry:{bus_id}:'
+    for room in rooms():
+        if room.startswith(prefix):
+            leave_room(room)
+
+
+def _leave_scoped_rooms():
+    for room in rooms():
+        if room.startswith(('bus:', 'route:', 'driver:')):
+            leave_room(room)
+
+
+def broadcast_alert(event_data, bus=None):
+    """
+    Send a new driving event to the fleet room and the event's bus, route
+    and driver rooms. Called from the events API when a new event is received.
+    """
+    if bus is None and event_data.get('bus_id') is not None:
+        from models import Bus
+        bus = db.session.get(Bus, event_data['bus_id'])
+    emit_alert(event_data, bus)
 
 
 # Make broadcast function available to routes (backward compatibility)
 app.broadcast_alert = broadcast_alert
-app.broadcast_bus_update = None # Deprecated, buses.py uses socketio directly
 
 
 # ==================== PI AUTO-DISCOVERY ====================
-# In-memory store: { bus_registration: { pi_ip, gps_port, demo_port, last_seen } }
-_pi_registry = {}
+# Shared, TTL-expiring store of Pi heartbeats (pi_registry.py)
 
 @app.route('/api/pi/heartbeat', methods=['POST'])
 def pi_heartbeat():
@@ -116,19 +293,13 @@ def pi_heartbeat():
     if not bus_reg:
         return jsonify({'error': 'bus_registration required'}), 400
 
-    pi_ip = data.get('pi_ip') or request.remote_addr
-    gps_port = data.get('gps_port', 8081)
-    demo_port = data.get('demo_port', 8082)
-    tunnel_url = data.get('tunnel_url')
-
-    _pi_registry[bus_reg] = {
-        'pi_ip': pi_ip,
-        'gps_port': gps_port,
-        'demo_port': demo_port,
-        'tunnel_url': tunnel_url,
-        'bus_registration': bus_reg,
-        'last_seen': datetime.utcnow().isoformat(),
-    }
+    pi_registry.heartbeat(
+        bus_reg,
+        pi_ip=data.get('pi_ip') or request.remote_addr,
+        gps_port=data.get('gps_port', 8081),
+        demo_port=data.get('demo_port', 8082),
+        tunnel_url=data.get('tunnel_url'),
+    )
     return jsonify({'status': 'ok'})
 
 
@@ -137,28 +308,31 @@ def pi_discover():
     """
     Called by the driver app to look up a Pi's IP by bus registration.
     Query: ?bus=KL-01-AB-1234
-    Returns the Pi info or 404.
+    Returns the Pi info or 404. Pis silent for PI_REGISTRY_TTL seconds are not returned.
     """
     bus_reg = request.args.get('bus')
     if not bus_reg:
-        # If only one Pi is registered, return that one (demo convenience)
-        if len(_pi_registry) == 1:
-            return jsonify(list(_pi_registry.values())[0])
+        # If only one Pi is online, return that one (demo convenience)
+        only = pi_registry.only()
+        if only:
+            return jsonify(only)
         return jsonify({'error': 'bus query param required'}), 400
 
-    info = _pi_registry.get(bus_reg)
+    info = pi_registry.get(bus_reg)
     if not info:
-        # Fallback: if only one Pi is registered, return it regardless of bus
-        if len(_pi_registry) == 1:
-            return jsonify(list(_pi_registry.values())[0])
+        # Fallback: if only one Pi is online, return it regardless of bus
+        only = pi_registry.only()
+        if only:
+            return jsonify(only)
         return jsonify({'error': f'No Pi registered for {bus_reg}'}), 404
     return jsonify(info)
 
 
 @app.route('/api/pi/all', methods=['GET'])
 def pi_list_all():
-    """List all registered Pi endpoints (for debugging / dashboard)."""
-    return jsonify({'count': len(_pi_registry), 'devices': list(_pi_registry.values())})
+    """List all online Pi endpoints (for debugging / dashboard)."""
+    devices = pi_registry.all()
+    return jsonify({'count': len(devices), 'devices': devices})
 
 
 @app.route('/api/tunnel', methods=['GET'])
@@ -233,6 +407,9 @@ def init_db():
     with app.app_context():
         db.create_all()
         
+        from models import upgrade_schema
+        upgrade_schema()
+        
         # Add sample buses if none exist
         from models import Bus
         if Bus.query.count() == 0:
@@ -249,16 +426,38 @@ def init_db():
         print("Database initialized!")
 
 
+# ==================== BACKGROUND JOBS ====================
+
+def start_background_jobs():
+    """
+    Schema setup plus the periodic jobs (retention, archive, shard merge,
+    SQLite maintenance, reports, driver scores). Run in exactly one process:
+    the dev server, or the elected worker under gunicorn (see gunicorn.conf.py).
+    """
+    init_db()
+    from jobs import start_archive_scheduler, start_driver_score_scheduler, start_retention_scheduler
+    from reports import start_report_scheduler
+    start_retention_scheduler(app)
+    start_archive_scheduler(app)
+    start_driver_score_scheduler(app)
+    from shards import start_shard_merger
+    start_shard_merger(app)
+    from db_profile import start_sqlite_maintenance
+    start_sqlite_maintenance(app)
+    start_report_scheduler(app)
+
+
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
-    init_db()
+    start_background_jobs()
     print("\n============================================================")
     print("BUS RASH DRIVING DETECTION SYSTEM")
     print("============================================================")
     print("Server starting on http://localhost:5000")
     print("Dashboard: http://localhost:5000")
     print("API Docs: POST /api/events, GET /api/events, GET /api/buses")
+    print("Production: gunicorn -c gunicorn.conf.py wsgi:app")
     
     # Try to see if ngrok is running
     try:
@@ -0,0 +1,245 @@
+"""
+Monthly event archives for the Rash Driving Detection System.
+Events older than ARCHIVE_AFTER_DAYS are moved out of driving_events into one
+SQLite file per month (archive/events_YYYY-MM.db). Only a thin catalogue row
+per month (event_archives: counts, id and time range) stays in the main
+database, so the hot table and its indexes stay small while list and export
+queries can still reach archived months when their date range asks for them.
+
+Readers that reach the archives: the event list and single-event lookup,
+bus event history, bulk acknowledge, CSV/Parquet exports and the daily and
+weekly reports. Everything else (/api/stats, timeseries, hotspots, insights,
+dashboard snapshots, trip and driver views) covers the live table only, so
+ARCHIVE_AFTER_DAYS should stay longer than the windows those views show.
+An archive run drops the cached timeseries, dashboard snapshots and report
+artefacts of the days it moved, so none of them keeps serving stale counts.
+"""
+import heapq
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import MetaData, create_engine, func, insert, select, update
+
+from extensions import db
+from models import Bus, DetachedEvent, EventArchive, standalone_event_table
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 0))   # 0 = never archive
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', 24))
+ARCHIVE_CHUNK_SIZE = int(os.getenv('ARCHIVE_CHUNK_SIZE', 1000))
+
+_metadata = MetaData()
+archived_events = standalone_event_table(_metadata, 'archived_events')
+ARCHIVE_COLUMNS = [c.name for c in archived_events.columns]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def month_key(ts):
+    return ts.strftime('%Y-%m')
+
+
+def _engine(filename):
+    with _engines_lock:
+        engine = _engines.get(filename)
+        if engine is None:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            engine = create_engine(f"sqlite:///{os.path.join(ARCHIVE_DIR, filename)}")
+            _metadata.create_all(engine)
+            _engines[filename] = engine
+        return engine
+
+
+# ==================== WRITING ====================
+
+def _refresh_catalogue(entry, conn):
+    """Recompute a catalogue entry from its partition's rows."""
+    count, min_id, max_id, first_ts, last_ts = conn.execute(select(
+        func.count(), func.min(archived_events.c.id), func.max(archived_events.c.id),
+        func.min(archived_events.c.timestamp), func.max(archived_events.c.timestamp)
+    )).one()
+    entry.event_count = count
+    entry.min_id, entry.max_id = min_id, max_id
+    entry.first_timestamp, entry.last_timestamp = first_ts, last_ts
+    entry.bus_ids = sorted(conn.execute(select(archived_events.c.bus_id).distinct()).scalars())
+
+
+def archive_rows(month, rows):
+    """
+    Copy event rows (dicts of ARCHIVE_COLUMNS) into a month's partition and
+    refresh its catalogue entry. Re-archiving a row replaces it, so a run that
+    died between copy and delete is safe to repeat. Caller commits the catalogue.
+    """
+    filename = f"events_{month}.db"
+    entry = db.session.get(EventArchive, month)
+    if entry is None:
+        entry = EventArchive(month=month, filename=filename)
+        db.session.add(entry)
+    with _engine(filename).begin() as conn:
+        conn.execute(insert(archived_events).prefix_with('OR REPLACE'), rows)
+        _refresh_catalogue(entry, conn)
+    return entry
+
+
+def _drop_partition(entry):
+    with _engines_lock:
+        engine = _engines.pop(entry.filename, None)
+    if engine is not None:
+        engine.dispose()
+    try:
+        os.remove(os.path.join(ARCHIVE_DIR, entry.filename))
+    except OSError:
+        pass
+    db.session.delete(entry)
+
+
+def purge(before=None, bus_id=None):
+    """
+    Delete archived events older than `before` and/or of `bus_id` (all if
+    neither). Partitions the scope covers entirely are dropped as files;
+    the others lose just the matching rows. Caller commits the catalogue.
+
+    Returns:
+        (events deleted, their media URLs, [(first, last) timestamp of the
+        deleted events in each partition])
+    """
+    c = archived_events.c
+    scope = []
+    if before is not None:
+        scope.append(c.timestamp < before)
+    if bus_id is not None:
+        scope.append(c.bus_id == bus_id)
+    deleted = 0
+    media = []
+    spans = []
+    for entry in partitions(until=before, bus_id=bus_id):
+        whole = bus_id is None and (before is None or entry.last_timestamp < before)
+        with _engine(entry.filename).begin() as conn:
+            rows = conn.execute(select(c.timestamp, c.snapshot_url, c.video_url).where(*scope)).all()
+            if rows and not whole:
+                conn.execute(archived_events.delete().where(*scope))
+                _refresh_catalogue(entry, conn)
+        if whole or not entry.event_count:
+            _drop_partition(entry)
+        deleted += len(rows)
+        media.extend(url for r in rows for url in (r.snapshot_url, r.video_url) if url)
+        timestamps = [r.timestamp for r in rows if r.timestamp]
+        if timestamps:
+            spans.append((min(timestamps), max(timestamps)))
+    return deleted, media, spans
+
+
+def acknowledge(acknowledged_at, ids=None, bus_id=None, event_type=None, severity=None, before=None):
+    """
+    Mark archived events acknowledged, by id list or by the bulk-acknowledge
+    filters (same semantics as the live table). Returns the number of rows updated.
+    """
+    c = archived_events.c
+    stmt = update(archived_events).where(c.acknowledged.isnot(True)) \
+        .values(acknowledged=True, acknowledged_at=acknowledged_at)
+    if ids is not None:
+        if not ids:
+            return 0
+        entries = EventArchive.query.filter(
+            EventArchive.event_count > 0,
+            EventArchive.min_id <= max(ids), EventArchive.max_id >= min(ids)
+        ).all()
+        stmt = stmt.where(c.id.in_(ids))
+    else:
+        entries = partitions(until=before, bus_id=bus_id)
+        if bus_id is not None:
+            stmt = stmt.where(c.bus_id == int(bus_id))
+        if event_type:
+            stmt = stmt.where(c.event_type == event_type)
+        if severity:
+            stmt = stmt.where(c.severity == severity)
+        if before is not None:
+            stmt = stmt.where(c.timestamp < before)
+    updated = 0
+    for entry in entries:
+        with _engine(entry.filename).begin() as conn:
+            updated += conn.execute(stmt).rowcount
+    return updated
+
+
+# ==================== READING ====================
+
+def partitions(since=None, until=None, bus_id=None):
+    """Catalogue entries overlapping [since, until] (and holding bus_id's events), newest first."""
+    query = EventArchive.query.filter(EventArchive.event_count > 0)
+    if since is not None:
+        query = query.filter(EventArchive.last_timestamp >= since)
+    if until is not None:
+        query = query.filter(EventArchive.first_timestamp <= until)
+    entries = query.order_by(EventArchive.month.desc()).all()
+    if bus_id is not None:
+        entries = [e for e in entries if e.bus_ids is None or int(bus_id) in e.bus_ids]
+    return entries
+
+
+def spans(since=None, until=None, bus_id=None):
+    """True if any archived month falls inside the requested range (with events of bus_id)."""
+    return bool(partitions(since, until, bus_id))
+
+
+def filtered_statement(table, since=None, until=None, bus_id=None, event_type=None,
+                       severity=None, after_id=None):
+    """Newest-first SELECT over a standalone event table with the list filters applied."""
+    c = table.c
+    stmt = select(table)
+    if since is not None:
+        stmt = stmt.where(c.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(c.timestamp <= until)
+    if bus_id is not None:
+        stmt = stmt.where(c.bus_id == int(bus_id))
+    if event_type:
+        stmt = stmt.where(c.event_type == event_type)
+    if severity:
+        stmt = stmt.where(c.severity == severity)
+    if after_id is not None:
+        stmt = stmt.where(c.id > int(after_id))
+    return stmt.order_by(c.timestamp.desc(), c.id.desc())
+
+
+def iter_events(since=None, until=None, bus_id=None, event_type=None, severity=None,
+                after_id=None, limit=None, chunk_size=1000):
+    """
+    Archived events matching the filters as DetachedEvent objects, newest first,
+    streamed partition by partition. Needs an app context (bus lookup, catalogue).
+    """
+    buses = {bus.id: bus for bus in Bus.query.all()}
+    stmt = filtered_statement(archived_events, since, until, bus_id, event_type, severity, after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    remaining = limit
+    for entry in partitions(since, until, bus_id):
+        with _engine(entry.filename).connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            for rows in result.mappings().partitions(chunk_size):
+                for row in rows:
+                    yield DetachedEvent(row, buses.get(row['bus_id']))
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining <= 0:
+                            return
+
+
+def get_event(event_id):
+    """Look up one archived event by id, or None."""
+    candidates = EventArchive.query.filter(
+        EventArchive.min_id <= event_id, EventArchive.max_id >= event_id
+    ).all()
+    for entry in candidates:
+        with _engine(entry.filename).connect() as conn:
+            row = conn.execute(select(archived_events).where(archived_events.c.id == event_id)).mappings().first()
+        if row is not None:
+            return DetachedEvent(row, db.session.get(Bus, row['bus_id']))
+    return None
+
+
+def merge_newest_first(*streams, key=None):
+    """Merge streams that are each sorted newest first into one such stream."""
+    return heapq.merge(*streams, key=key or (lambda e: e.timestamp or datetime.min), reverse=True)
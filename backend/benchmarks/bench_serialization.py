@@ -0,0 +1,101 @@
+"""
+Serialization benchmark for a 500-event /api/events response.
+
+Compares Flask's default JSON provider with the orjson provider on the same
+to_dict() payloads, and shows how much of the response time to_dict() itself
+takes. Runs against an in-memory SQLite DB.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--events 500] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from extensions import db
+from json_provider import OrjsonProvider, orjson
+from models import Bus, DrivingEvent
+
+
+def build_app(n_events):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        buses = [Bus(registration_number=f'KL-01-XX-{i:04d}', driver_name=f'Driver {i}') for i in range(10)]
+        db.session.add_all(buses)
+        db.session.flush()
+        now = datetime.utcnow()
+        for i in range(n_events):
+            db.session.add(DrivingEvent(
+                bus_id=random.choice(buses).id,
+                event_type=random.choice(['HARSH_BRAKE', 'HARSH_ACCEL', 'AGGRESSIVE_TURN', 'TAILGATING']),
+                severity=random.choice(['LOW', 'MEDIUM', 'HIGH']),
+                acceleration_x=random.uniform(-2, 2),
+                acceleration_y=random.uniform(-2, 2),
+                acceleration_z=random.uniform(0.8, 1.2),
+                speed=random.uniform(0, 80),
+                location_lat=9.9 + random.random() / 10,
+                location_lng=76.2 + random.random() / 10,
+                timestamp=now - timedelta(seconds=i * 30),
+                alert_sent=True,
+            ))
+        db.session.commit()
+    return app
+
+
+def time_it(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app(args.events)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = OrjsonProvider(app) if orjson else default_provider
+    fast_provider.sort_keys = False
+
+    with app.test_request_context():
+        events = DrivingEvent.query.order_by(DrivingEvent.timestamp.desc()).limit(args.events).all()
+
+        def dicts():
+            return {'count': len(events), 'events': [e.to_dict() for e in events]}
+
+        def default_response():
+            default_provider.response(dicts())
+
+        def fast_response():
+            fast_provider.response(dicts())
+
+        results = [
+            ('to_dict only', time_it(dicts, args.repeat)),
+            ('full response (default json)', time_it(default_response, args.repeat)),
+            ('full response (%s)' % ('orjson' if orjson else 'json'), time_it(fast_response, args.repeat)),
+        ]
+
+    print(f"{len(events)} events, best of {args.repeat} runs")
+    for label, ms in results:
+        print(f"  {label:<50} {ms:8.2f} ms")
+    print(f"  speedup (full response): {results[1][1] / results[2][1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent ingest benchmark: single database vs sharded ingest files.
+
+Several writer processes (like several server workers taking Pi uploads)
+commit one event per transaction, first straight into the main SQLite file,
+then through shards.store_event() with --shards files. Runs against temporary
+on-disk databases so commit and lock costs are real.
+
+Usage (from backend/):
+    python benchmarks/bench_sharded_ingest.py [--writers 8] [--events 200] [--shards 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+
+from extensions import db
+import shards
+from models import Bus, DrivingEvent
+
+
+def build_app(path, n_buses):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    if n_buses:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Bus(registration_number=f'KL-01-XX-{i:04d}') for i in range(n_buses)])
+            db.session.commit()
+    return app
+
+
+def new_event(bus_id, i):
+    return DrivingEvent(bus_id=bus_id, event_type='HARSH_BRAKE', severity='HIGH',
+                        acceleration_x=-0.5, speed=40.0, location_lat=9.9, location_lng=76.2,
+                        alert_sent=True)
+
+
+def _writer(db_path, shard_dir, n_shards, bus_id, events, sharded, barrier):
+    app = build_app(db_path, 0)
+    shards.SHARD_DIR = shard_dir
+    shards.EVENT_SHARDS = n_shards
+    with app.app_context():
+        bus = db.session.get(Bus, bus_id)
+        barrier.wait()
+        for i in range(events):
+            event = new_event(bus_id, i)
+            if sharded:
+                shards.store_event(event, bus)
+            else:
+                db.session.add(event)
+                db.session.commit()
+
+
+def run(db_path, shard_dir, n_shards, writers, events, sharded):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(writers + 1)
+    procs = [ctx.Process(target=_writer, args=(db_path, shard_dir, n_shards, bus_id, events, sharded, barrier))
+             for bus_id in range(1, writers + 1)]
+    for p in procs:
+        p.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for p in procs:
+        p.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--events', type=int, default=200, help='events per writer')
+    parser.add_argument('--shards', type=int, default=4)
+    args = parser.parse_args()
+    total = args.writers * args.events
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'main.db')
+    shard_dir = os.path.join(workdir, 'shards')
+    app = build_app(db_path, args.writers)
+    shards.SHARD_DIR = shard_dir
+    shards.EVENT_SHARDS = args.shards
+    for shard in range(args.shards):
+        shards._engine(shard)  # create the files up front
+
+    single = run(db_path, shard_dir, args.shards, args.writers, args.events, sharded=False)
+    sharded = run(db_path, shard_dir, args.shards, args.writers, args.events, sharded=True)
+    with app.app_context():
+        merge_start = time.perf_counter()
+        merged = shards.drain()
+        merge = time.perf_counter() - merge_start
+
+    print(f"{args.writers} writers x {args.events} events, one commit per event")
+    print(f"  single database : {single:7.2f} s  ({total / single:8.0f} events/s)")
+    print(f"  {args.shards} shards        : {sharded:7.2f} s  ({total / sharded:8.0f} events/s)")
+    print(f"  merge into main : {merge:7.2f} s  ({merged} events in batches of {shards.SHARD_MERGE_BATCH})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Realtime frame size and codec cost: JSON vs MessagePack with short field codes.
+
+Builds a bus_updates frame for --buses moving buses and a new_alert payload
+shaped like the real to_dict() output, then reports the encoded size (as
+sent in a WebSocket frame) and encode/decode time for both encodings.
+
+Usage (from backend/):
+    python benchmarks/bench_socket_codec.py [--buses 200] [--repeat 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import socket_codec
+
+
+def bus_payload(i):
+    return {
+        'bus_id': i,
+        'bus_registration': f'KL-01-AB-{i:04d}',
+        'driver_name': 'Rajesh Kumar',
+        'latitude': 9.9 + random.random() / 10,
+        'longitude': 76.2 + random.random() / 10,
+        'speed': round(random.uniform(0, 80), 1),
+        'heading': round(random.uniform(0, 360), 1),
+        'updated_at': datetime.utcnow().isoformat(),
+    }
+
+
+def alert_payload():
+    return {
+        'id': 123456, 'bus_id': 7, 'bus_registration': 'KL-01-AB-0007',
+        'event_type': 'HARSH_BRAKE', 'severity': 'HIGH',
+        'acceleration_x': -0.62, 'acceleration_y': 0.05, 'acceleration_z': 0.98, 'speed': 42.0,
+        'location': {'lat': 9.9312, 'lng': 76.2673, 'address': None},
+        'timestamp': datetime.utcnow().isoformat(), 'alert_sent': True, 'acknowledged': False,
+        'has_video': False, 'has_snapshot': True, 'snapshot_url': '/api/media/snapshots/123456.jpg',
+        'video_url': None,
+    }
+
+
+def measure(name, obj, repeat):
+    names = {code: field for field, code in socket_codec.FIELD_CODES.items()}
+
+    def expand(value):
+        if isinstance(value, dict):
+            return {names.get(k, k): expand(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [expand(v) for v in value]
+        return value
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        as_json = json.dumps(obj, separators=(',', ':')).encode()
+    json_encode = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(as_json)
+    json_decode = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        as_msgpack = socket_codec.encode(obj)
+    msgpack_encode = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        expand(socket_codec.msgpack.unpackb(as_msgpack))
+    msgpack_decode = (time.perf_counter() - start) / repeat
+
+    print(f"{name}")
+    print(f"  json    : {len(as_json):7d} bytes   encode {json_encode * 1e6:8.1f} us   decode {json_decode * 1e6:8.1f} us")
+    print(f"  msgpack : {len(as_msgpack):7d} bytes   encode {msgpack_encode * 1e6:8.1f} us   "
+          f"decode+expand {msgpack_decode * 1e6:8.1f} us   ({100 * (1 - len(as_msgpack) / len(as_json)):.0f}% smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buses', type=int, default=200, help='moving buses in one bus_updates frame')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    if socket_codec.msgpack is None:
+        sys.exit("msgpack is not installed (pip install msgpack)")
+
+    measure(f"bus_updates, {args.buses} buses", [bus_payload(i) for i in range(args.buses)], max(1, args.repeat // 20))
+    measure("new_alert", alert_payload(), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
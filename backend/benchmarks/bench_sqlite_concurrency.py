@@ -0,0 +1,150 @@
+"""
+Read/write concurrency benchmark for the SQLite engine profile.
+
+One writer process ingests events (one commit per event, like POST /api/events)
+while reader processes run the dashboard's "latest 100 events" query in a
+loop. Runs once with SQLite defaults (rollback journal) and once with the
+production profile from db_profile.py, on fresh on-disk databases, and
+reports reader latency, lock errors and ingest rate for both.
+
+Usage (from backend/):
+    python benchmarks/bench_sqlite_concurrency.py [--seconds 5] [--readers 3] [--rows 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db_profile import PRODUCTION_PRAGMAS, configure_sqlite_connection
+
+READ_SQL = """
+    SELECT e.*, b.registration_number FROM driving_events e
+    LEFT JOIN buses b ON b.id = e.bus_id
+    WHERE e.timestamp >= ? ORDER BY e.timestamp DESC LIMIT 100
+"""
+WRITE_SQL = """
+    INSERT INTO driving_events (bus_id, event_type, severity, acceleration_x, speed,
+                                location_lat, location_lng, timestamp, created_at, alert_sent, acknowledged)
+    VALUES (?, 'HARSH_BRAKE', 'HIGH', -0.6, 42.0, 9.93, 76.26, ?, ?, 1, 0)
+"""
+
+
+def connect(path, profile):
+    # timeout=5 is the sqlite3 module default the app had before the profile
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if profile == 'production':
+        configure_sqlite_connection(conn)
+    return conn
+
+
+def build_db(path, rows):
+    """Create the schema through the app's models and fill it with `rows` events."""
+    from flask import Flask
+    from extensions import db
+    import models  # noqa: F401  (registers the tables)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO buses (registration_number, is_active) VALUES (?, 1)',
+                     [(f'KL-01-XX-{i:04d}',) for i in range(20)])
+    now = datetime.utcnow()
+    conn.executemany(WRITE_SQL, [
+        (random.randint(1, 20), now - timedelta(seconds=random.randint(0, 7 * 86400)), now)
+        for _ in range(rows)
+    ])
+    conn.commit()
+    conn.close()
+
+
+def _writer(path, profile, seconds, results):
+    conn = connect(path, profile)
+    written = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        now = datetime.utcnow()
+        try:
+            conn.execute('BEGIN')
+            conn.execute(WRITE_SQL, (random.randint(1, 20), now, now))
+            conn.execute('COMMIT')
+            written += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    results.put(('writer', written, errors, []))
+
+
+def _reader(path, profile, seconds, results):
+    conn = connect(path, profile)
+    latencies, errors = [], 0
+    since = datetime.utcnow() - timedelta(days=1)
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.execute(READ_SQL, (since,)).fetchall()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('reader', len(latencies), errors, latencies))
+
+
+def run(profile, args):
+    path = os.path.join(tempfile.mkdtemp(), f'{profile}.db')
+    build_db(path, args.rows)
+    if profile == 'production':
+        conn = sqlite3.connect(path)
+        configure_sqlite_connection(conn, PRODUCTION_PRAGMAS[:1])  # WAL is persistent
+        conn.close()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_writer, args=(path, profile, args.seconds, results))]
+    procs += [ctx.Process(target=_reader, args=(path, profile, args.seconds, results))
+              for _ in range(args.readers)]
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    writes = sum(r[1] for r in collected if r[0] == 'writer')
+    write_errors = sum(r[2] for r in collected if r[0] == 'writer')
+    reads = sum(r[1] for r in collected if r[0] == 'reader')
+    read_errors = sum(r[2] for r in collected if r[0] == 'reader')
+    latencies = sorted(l for r in collected for l in r[3])
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    print(f"{profile:>10}: writes {writes / args.seconds:7.0f}/s ({write_errors} locked)   "
+          f"reads {reads / args.seconds:7.0f}/s ({read_errors} locked)   "
+          f"read p50 {pct(0.5):6.2f} ms  p99 {pct(0.99):6.2f} ms  max {pct(1.0):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=20000, help='events pre-loaded before the run')
+    args = parser.parse_args()
+
+    print(f"1 writer + {args.readers} readers for {args.seconds}s on {args.rows} pre-loaded events")
+    for profile in ('default', 'production'):
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
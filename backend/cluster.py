@@ -0,0 +1,127 @@
+"""
+Cross-worker cache sync for the Rash Driving Detection System.
+With several server processes, each one keeps its own in-memory indexes
+(hot events, cached event payloads, live positions, timeseries buckets,
+AI insights, dashboard snapshots, shard pending counts). When
+SOCKETIO_MESSAGE_QUEUE points at Redis, changes made in one worker are
+published on a Redis channel and replayed in every other worker, next to
+the Socket.IO traffic on the same server. Without a queue everything stays
+local.
+Messages are JSON, and a worker only runs methods marked @replicated on a
+registered object, so nothing else on the channel can execute code.
+"""
+import functools
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from extensions import SOCKETIO_MESSAGE_QUEUE, socketio
+
+CLUSTER_CHANNEL = os.getenv('CLUSTER_CHANNEL', 'rash-driving-cluster')
+
+_targets = {}          # name -> registered object
+_redis = None
+_worker_id = None
+_start_lock = threading.Lock()
+_DATETIME_TAG = '__datetime__'
+
+
+def _encode_default(obj):
+    if isinstance(obj, datetime):
+        return {_DATETIME_TAG: obj.isoformat()}
+    raise TypeError(f"{type(obj).__name__} cannot be sent to other workers")
+
+
+def _decode_hook(obj):
+    if len(obj) == 1 and _DATETIME_TAG in obj:
+        return datetime.fromisoformat(obj[_DATETIME_TAG])
+    return obj
+
+
+def encode_message(origin, name, method, args, kwargs):
+    return json.dumps([origin, name, method, list(args), kwargs],
+                      separators=(',', ':'), default=_encode_default)
+
+
+def decode_message(message):
+    origin, name, method, args, kwargs = json.loads(message, object_hook=_decode_hook)
+    if not (isinstance(name, str) and isinstance(method, str)
+            and isinstance(args, list) and isinstance(kwargs, dict)):
+        raise ValueError("Malformed cluster message")
+    return origin, name, method, args, kwargs
+
+
+def register(name, obj):
+    """Make `obj`'s @replicated methods replay on the object of the same name in other workers."""
+    obj._cluster_name = name
+    _targets[name] = obj
+    return obj
+
+
+def publish(obj, method, *args, **kwargs):
+    """Run obj.<method>(*args, **kwargs) in every other worker (not this one)."""
+    name = getattr(obj, '_cluster_name', None)
+    if _redis is None or name is None:
+        return
+    try:
+        _redis.publish(CLUSTER_CHANNEL, encode_message(_worker_id, name, method, args, kwargs))
+    except Exception as e:
+        print(f"  ⚠️  Cluster publish failed: {e}")
+
+
+def replicated(method):
+    """Method decorator: after running locally, replay the call in the other workers."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        publish(self, method.__name__, *args, **kwargs)
+        return result
+    wrapper.local = method
+    return wrapper
+
+
+def _replicated_method(target, method):
+    """The undecorated body of target's @replicated `method`, or None for anything else."""
+    func = getattr(type(target), method, None)
+    return getattr(func, 'local', None)
+
+
+def _apply(message):
+    origin, name, method, args, kwargs = decode_message(message)
+    if origin == _worker_id or name not in _targets:
+        return
+    target = _targets[name]
+    local = _replicated_method(target, method)
+    if local is None:
+        raise ValueError(f"{name}.{method} is not @replicated")
+    local(target, *args, **kwargs)
+
+
+def _listen(pubsub):
+    for message in pubsub.listen():
+        if message.get('type') != 'message':
+            continue
+        try:
+            _apply(message['data'])
+        except Exception as e:
+            print(f"  ⚠️  Cluster message failed: {e}")
+
+
+def start_cluster_sync():
+    """Subscribe this worker to the cluster channel (no-op without a Redis message queue)."""
+    global _redis, _worker_id
+    if not SOCKETIO_MESSAGE_QUEUE.startswith(('redis://', 'rediss://')):
+        return
+    with _start_lock:
+        if _redis is not None:
+            return
+        import redis
+        # Generated here rather than at import so forked workers never share an id
+        _worker_id = f'{os.getpid()}-{uuid.uuid4().hex}'
+        client = redis.Redis.from_url(SOCKETIO_MESSAGE_QUEUE)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CLUSTER_CHANNEL)
+        _redis = client
+    socketio.start_background_task(_listen, pubsub)
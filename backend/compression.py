@@ -0,0 +1,123 @@
+"""
+HTTP response compression for the Rash Driving Detection System.
+Negotiates brotli (if the brotli module is installed) or gzip from the
+client's Accept-Encoding. Buffered responses are compressed in one go when
+they exceed COMPRESS_MIN_SIZE; streamed responses (CSV exports etc.) are
+compressed chunk by chunk, flushing after each chunk so nothing is buffered.
+"""
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') not in ('0', 'false', 'False')
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))     # bytes
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+}
+
+
+def _is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def choose_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header (honours q=0)."""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.strip().lower()] = q
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+class _GzipStream:
+    def __init__(self):
+        # wbits=31 -> gzip container
+        self._compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compress_stream(chunks, encoder):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield encoder.compress(chunk)
+    yield encoder.finish()
+
+
+def compress_response(response, accept_encoding):
+    """Compress a Flask response in place if the client and content allow it."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not _is_compressible(response.mimetype)):
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    encoder = _BrotliStream() if encoding == 'br' else _GzipStream()
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoder)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(encoder.compress(body) + encoder.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Register the compression hook on the app."""
+    if not COMPRESS_ENABLED:
+        return
+
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.headers.get('Accept-Encoding'))
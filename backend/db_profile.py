@@ -0,0 +1,209 @@
+"""
+Database engine profiles for the Rash Driving Detection System.
+The SQLite production profile is applied to every SQLite connection through a
+connect hook: WAL so readers never wait for the ingest writer, relaxed fsync
+(synchronous=NORMAL is durable across application crashes in WAL mode),
+a busy timeout instead of immediate "database is locked" errors, and larger
+page cache / memory-mapped I/O. A background task checkpoints the WAL and
+refreshes planner statistics periodically.
+
+The Postgres profile tunes the connection pool and provides COPY-based bulk
+loading; models.py switches to ON CONFLICT upserts when it is active.
+"""
+import io
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from extensions import db, socketio
+
+# ==================== SQLITE ====================
+
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'production')          # 'production' or 'off'
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))   # bytes
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_CHECKPOINT_MINUTES = float(os.getenv('SQLITE_CHECKPOINT_MINUTES', 5))
+SQLITE_ANALYZE_HOURS = float(os.getenv('SQLITE_ANALYZE_HOURS', 6))
+
+PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}',
+    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+    f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',   # negative = KiB rather than pages
+    'PRAGMA temp_store=MEMORY',
+]
+
+
+def configure_sqlite_connection(dbapi_connection, pragmas=None):
+    """Run the profile pragmas on a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in PRODUCTION_PRAGMAS if pragmas is None else pragmas:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _on_connect(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        configure_sqlite_connection(dbapi_connection)
+
+
+def init_db_profile():
+    """
+    Install the SQLite connect hook for every engine (main DB, archive
+    partitions, ingest shards). Call before the first connection is opened.
+    """
+    if SQLITE_PROFILE == 'production' and not event.contains(Engine, 'connect', _on_connect):
+        event.listen(Engine, 'connect', _on_connect)
+
+
+def sqlite_maintenance(app, analyze=False):
+    """Checkpoint the main DB's WAL (and refresh planner statistics if `analyze`)."""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return None
+        with db.engine.connect() as conn:
+            # PASSIVE never blocks readers or writers; the WAL is reused from the start afterwards
+            busy, wal_pages, checkpointed = conn.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)').one()
+            if analyze:
+                conn.exec_driver_sql('ANALYZE')
+                conn.commit()
+        return {'busy': busy, 'wal_pages': wal_pages, 'checkpointed': checkpointed}
+
+
+def _maintenance_loop(app):
+    interval = SQLITE_CHECKPOINT_MINUTES * 60
+    runs_per_analyze = max(1, int(SQLITE_ANALYZE_HOURS * 3600 / interval))
+    runs = 0
+    while True:
+        socketio.sleep(interval)
+        runs += 1
+        try:
+            sqlite_maintenance(app, analyze=runs % runs_per_analyze == 0)
+        except Exception as e:
+            print(f"  ⚠️  SQLite maintenance failed: {e}")
+
+
+def start_sqlite_maintenance(app):
+    """Checkpoint every SQLITE_CHECKPOINT_MINUTES and ANALYZE every SQLITE_ANALYZE_HOURS."""
+    if SQLITE_PROFILE != 'production':
+        return
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+    sqlite_maintenance(app, analyze=True)
+    socketio.start_background_task(_maintenance_loop, app)
+
+
+# ==================== POSTGRES ====================
+
+PG_POOL_SIZE = int(os.getenv('PG_POOL_SIZE', 10))
+PG_MAX_OVERFLOW = int(os.getenv('PG_MAX_OVERFLOW', 20))
+PG_POOL_TIMEOUT = int(os.getenv('PG_POOL_TIMEOUT', 30))          # seconds to wait for a free connection
+PG_POOL_RECYCLE = int(os.getenv('PG_POOL_RECYCLE', 1800))        # seconds
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv('PG_STATEMENT_TIMEOUT_MS', 0))  # 0 = no limit
+
+
+def normalize_database_url(url):
+    """Accept the 'postgres://' scheme many hosts hand out (SQLAlchemy needs 'postgresql://')."""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URL."""
+    if not url.startswith('postgresql'):
+        return {}
+    connect_args = {'application_name': 'rash-driving-backend'}
+    if PG_STATEMENT_TIMEOUT_MS:
+        connect_args['options'] = f'-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}'
+    return {
+        'pool_size': PG_POOL_SIZE,
+        'max_overflow': PG_MAX_OVERFLOW,
+        'pool_timeout': PG_POOL_TIMEOUT,
+        'pool_recycle': PG_POOL_RECYCLE,
+        'pool_pre_ping': True,   # replace connections the server or a proxy has closed
+        'connect_args': connect_args,
+    }
+
+
+def is_postgres():
+    """True if the app's database is Postgres. Needs an app context."""
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _copy_field(value):
+    """One COPY csv field. Only an unquoted empty field is NULL; "" stays an empty string."""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat(' ')
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(table_name, columns, rows):
+    """
+    Bulk-load rows (sequences in `columns` order) with COPY ... FROM STDIN
+    inside the current session transaction. Postgres only.
+    """
+    # Not csv.writer: QUOTE_NONNUMERIC quotes None too, and COPY would load it as ''
+    buffer = io.StringIO(''.join(','.join(_copy_field(v) for v in row) + '\n' for row in rows))
+    sql = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):      # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:                                   # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def bulk_insert(table, rows):
+    """Insert many row dicts: COPY on Postgres, one executemany elsewhere. Caller commits."""
+    if not rows:
+        return
+    if not is_postgres():
+        db.session.execute(table.insert(), rows)
+        return
+    columns = list(rows[0])
+    copy_rows(table.name, columns, [[row[c] for c in columns] for row in rows])
+
+
+def bulk_update(table, key, column, pairs):
+    """
+    Set `column` on many rows from (key value, new value) pairs. On Postgres the
+    pairs are COPYed into a temp table and applied with a single UPDATE ... FROM.
+    Caller commits.
+    """
+    if not pairs:
+        return
+    if not is_postgres():
+        db.session.execute(
+            table.update().where(table.c[key] == db.bindparam('_key')).values({column: db.bindparam('_value')}),
+            [{'_key': k, '_value': v} for k, v in pairs]
+        )
+        return
+    dialect = db.engine.dialect
+    db.session.execute(db.text(
+        f"CREATE TEMP TABLE IF NOT EXISTS _bulk_update "
+        f"(k {table.c[key].type.compile(dialect=dialect)}, v {table.c[column].type.compile(dialect=dialect)}) "
+        f"ON COMMIT DROP"
+    ))
+    copy_rows('_bulk_update', ['k', 'v'], pairs)
+    db.session.execute(db.text(
+        f"UPDATE {table.name} SET {column} = _bulk_update.v FROM _bulk_update "
+        f"WHERE {table.name}.{key} = _bulk_update.k"
+    ))
+    db.session.execute(db.text("TRUNCATE _bulk_update"))
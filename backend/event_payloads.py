@@ -0,0 +1,120 @@
+"""
+Cache of serialized DrivingEvent payloads.
+Each event's canonical JSON bytes are produced once (at ingest, or the first
+time it is listed) and kept in a bounded LRU. List endpoints then build their
+response by joining cached fragments instead of calling to_dict() per row.
+Entries are replaced whenever the event changes (acknowledge, evidence upload)
+and dropped when events are deleted.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+from cluster import publish, register, replicated
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+EVENT_PAYLOAD_CACHE_SIZE = int(os.getenv('EVENT_PAYLOAD_CACHE_SIZE', 20000))
+
+
+def dumps(obj):
+    """Compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class EventPayloadCache:
+    """Bounded LRU of event id -> JSON bytes."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._payloads = OrderedDict()
+
+    def put(self, event_dict):
+        """
+        Serialize and cache a new or changed event dict (replacing any older
+        payload here; other workers drop their copy and rebuild it lazily).
+        """
+        payload = self._store(event_dict)
+        publish(self, 'invalidate', [event_dict['id']])
+        return payload
+
+    def _store(self, event_dict):
+        payload = dumps(event_dict)
+        with self._lock:
+            self._payloads[event_dict['id']] = payload
+            self._payloads.move_to_end(event_dict['id'])
+            while len(self._payloads) > self.max_size:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def get(self, event_id):
+        with self._lock:
+            payload = self._payloads.get(event_id)
+            if payload is not None:
+                self._payloads.move_to_end(event_id)
+            return payload
+
+    @replicated
+    def invalidate(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._payloads.pop(event_id, None)
+
+    @replicated
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+
+    def fragment(self, event_dict):
+        """Cached bytes for an already-serialized event dict."""
+        return self.get(event_dict['id']) or self._store(event_dict)
+
+    def render(self, events):
+        """Cached bytes for a list of DrivingEvent rows, in order."""
+        return [self.get(e.id) or self._store(e.to_dict()) for e in events]
+
+    def render_ids(self, event_ids, load):
+        """
+        Cached bytes for event ids, in order.
+        `load(missing_ids)` must return the DrivingEvent rows not in the cache.
+        """
+        fragments = {}
+        missing = []
+        for event_id in event_ids:
+            payload = self.get(event_id)
+            if payload is None:
+                missing.append(event_id)
+            else:
+                fragments[event_id] = payload
+        if missing:
+            for event in load(missing):
+                fragments[event.id] = self._store(event.to_dict())
+        return [fragments[i] for i in event_ids if i in fragments]
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+def events_response(fields, fragments, key='events', status=200):
+    """
+    JSON response of `fields` plus a `key` array spliced in from payload bytes.
+    """
+    head = dumps(fields)
+    array = b'[' + b','.join(fragments) + b']'
+    if head == b'{}':
+        body = b'{"' + key.encode() + b'":' + array + b'}'
+    else:
+        body = head[:-1] + b',"' + key.encode() + b'":' + array + b'}'
+    return Response(body + b'\n', status=status, mimetype='application/json')
+
+
+event_payloads = register('event_payloads', EventPayloadCache(EVENT_PAYLOAD_CACHE_SIZE))
@@ -1,12 +1,23 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
 from flask_jwt_extended import JWTManager
 
+# Socket.IO server mode. The defaults suit `python app.py`: the Werkzeug dev
+# server cannot handle WebSocket upgrades in threading mode, so it is
+# polling-only. The production entrypoint (gunicorn.conf.py) switches to
+# WebSocket-only transport, which needs no sticky sessions across workers,
+# and a message queue so an emit from any worker reaches every client.
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+SOCKETIO_TRANSPORTS = [t.strip() for t in os.getenv('SOCKETIO_TRANSPORTS', 'polling').split(',') if t.strip()]
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')   # e.g. redis://localhost:6379/0
+SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'rash-driving-socketio')
+
 # Initialize extensions
 db = SQLAlchemy()
-socketio = SocketIO(cors_allowed_origins="*", async_mode='threading',
-                    # Werkzeug dev server cannot handle WebSocket upgrades in
-                    # threading mode, so we restrict to polling for local dev.
-                    # Switch to ['polling', 'websocket'] with gunicorn+eventlet.
-                    transports=['polling'])
+socketio = SocketIO(cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE,
+                    transports=SOCKETIO_TRANSPORTS,
+                    message_queue=SOCKETIO_MESSAGE_QUEUE or None,
+                    channel=SOCKETIO_CHANNEL)
 jwt = JWTManager()
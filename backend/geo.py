@@ -0,0 +1,96 @@
+"""
+Geospatial helpers for the Rash Driving Detection System.
+Geohash encoding used to bucket event locations into grid cells.
+"""
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+# Precision stored on each event (~38m x 19m cells); coarser levels are prefixes
+GEOHASH_PRECISION = 8
+
+# Map zoom level (web-mercator tiles) -> geohash length used for aggregation
+_ZOOM_PRECISION = [
+    (2, 1), (4, 2), (6, 3), (8, 4), (11, 5), (13, 6), (15, 7),
+]
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def decode_bounds(geohash):
+    """Return (south, west, north, east) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def precision_for_zoom(zoom):
+    """Geohash length whose cells roughly match a map tile at this zoom."""
+    for max_zoom, precision in _ZOOM_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def parse_bbox(raw):
+    """
+    Parse 'south,west,north,east' into a tuple of floats.
+    Raises ValueError on malformed input.
+    """
+    parts = [float(p) for p in raw.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be south,west,north,east')
+    south, west, north, east = parts
+    if south > north:
+        raise ValueError('bbox south must be <= north')
+    return south, west, north, east
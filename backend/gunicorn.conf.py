@@ -0,0 +1,83 @@
+"""
+Gunicorn settings for the production server of the Rash Driving Detection System.
+
+Several worker processes, each running threads (Socket.IO threading mode with
+simple-websocket). Socket.IO is WebSocket-only here, so a client stays on the
+worker that accepted its connection and no sticky-session load balancer is
+needed; emits from any worker reach every client through the message queue
+(SOCKETIO_MESSAGE_QUEUE, e.g. a local Redis:
+`docker run --rm -d -p 6379:6379 redis:7`). The same queue keeps each
+worker's in-memory caches in step (cluster.py). One worker, elected with a
+file lock, runs the schema setup and the background jobs. Workers share
+their /metrics numbers through snapshot files in METRICS_DIR (metrics.py).
+
+Worker and concurrency settings (environment or .env):
+    WEB_BIND=0.0.0.0:5000
+    WEB_WORKERS=4          processes; more than 1 requires SOCKETIO_MESSAGE_QUEUE
+    WEB_THREADS=100        threads per worker; each open WebSocket holds one,
+                           so WEB_WORKERS * WEB_THREADS bounds live dashboard/app
+                           connections plus in-flight HTTP requests
+    WEB_TIMEOUT=60         seconds before a silent worker is restarted
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import fcntl
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Must be set before the workers import extensions.py
+os.environ.setdefault('SOCKETIO_TRANSPORTS', 'websocket')
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', 4))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 100))
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+if workers > 1 and not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+    raise SystemExit("WEB_WORKERS > 1 needs SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0)")
+if workers > 1 and 'polling' in os.environ['SOCKETIO_TRANSPORTS']:
+    print("⚠️  Polling across several workers needs a sticky-session load balancer in front")
+
+JOBS_LOCK = os.path.join(tempfile.gettempdir(), f"rash-driving-jobs-{bind.replace(':', '_')}.lock")
+_jobs_lock = None
+if workers > 1:
+    os.environ.setdefault('METRICS_DIR', os.path.join(
+        tempfile.gettempdir(), f"rash-driving-metrics-{bind.replace(':', '_')}"))
+
+
+def on_starting(server):
+    """Forget the worker snapshots of a previous run."""
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('worker-'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    """A stopped worker's numbers leave /metrics with it (counters restart in its replacement)."""
+    from metrics import remove_snapshot
+    remove_snapshot(worker.pid)
+
+
+def post_worker_init(worker):
+    """Let the first worker to take the lock run the background jobs; the lock dies with it."""
+    global _jobs_lock
+    handle = open(JOBS_LOCK, 'w')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return
+    _jobs_lock = handle
+    from app import start_background_jobs
+    start_background_jobs()
+    worker.log.info("Background jobs running in worker %s", os.getpid())
@@ -0,0 +1,181 @@
+"""
+In-process index of recent driving events.
+Keeps the last HOT_EVENTS_HOURS of serialized events ordered by time, with
+secondary indexes by bus, type and severity, so the default /api/events
+window and the alert feed are answered without touching the database.
+Older windows fall back to SQL.
+"""
+import bisect
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from extensions import db
+from cluster import register, replicated
+
+HOT_EVENTS_HOURS = float(os.getenv('HOT_EVENTS_HOURS', 25))  # 0 disables the index
+_PRUNE_EVERY = 500
+
+
+def naive_utc(ts):
+    """Drop tzinfo after converting to UTC (stored timestamps are naive UTC)."""
+    if ts is not None and ts.tzinfo:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _parse_ts(value):
+    return naive_utc(datetime.fromisoformat(value)) if value else datetime.min
+
+
+class HotEventIndex:
+    """Recent events keyed by (timestamp, id), newest last."""
+
+    def __init__(self, hours):
+        self.window = timedelta(hours=hours)
+        self.enabled = hours > 0
+        self._lock = threading.RLock()
+        self._keys = []          # sorted (timestamp, id)
+        self._events = {}        # id -> event dict (DrivingEvent.to_dict())
+        self._by = {'bus_id': {}, 'event_type': {}, 'severity': {}}  # field -> value -> sorted keys
+        self._loaded = False
+        self._inserts = 0
+
+    @property
+    def window_start(self):
+        return datetime.utcnow() - self.window
+
+    def load(self):
+        """Fill from the database (needs an app context). Safe to call repeatedly."""
+        if not self.enabled or self._loaded:
+            return
+        from models import DrivingEvent
+        events = DrivingEvent.query.options(db.joinedload(DrivingEvent.bus)).filter(
+            DrivingEvent.timestamp >= self.window_start
+        ).all()
+        with self._lock:
+            if self._loaded:
+                return
+            for event in events:
+                self._remove(event.id)
+                self._insert(event.to_dict())
+            self._loaded = True
+
+    @replicated
+    def add(self, event_dict):
+        """Insert or replace a serialized event."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remove(event_dict['id'])
+            if _parse_ts(event_dict['timestamp']) >= self.window_start:
+                self._insert(event_dict)
+            self._inserts += 1
+            if self._inserts % _PRUNE_EVERY == 0:
+                self._prune()
+
+    @replicated
+    def remove(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._remove(event_id)
+
+    @replicated
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._events.clear()
+            for index in self._by.values():
+                index.clear()
+
+    @replicated
+    def acknowledge(self, ids=None, filters=None):
+        """Mirror a (bulk) acknowledge onto cached events."""
+        with self._lock:
+            if ids is not None:
+                matches = [self._events[i] for i in ids if i in self._events]
+            else:
+                before = naive_utc(filters.get('before'))
+                matches = [
+                    e for e in self._events.values()
+                    if all(str(e[k]) == str(filters[k]) for k in ('bus_id', 'event_type', 'severity') if filters.get(k))
+                    and (not before or _parse_ts(e['timestamp']) < before)
+                ]
+            for event in matches:
+                self._events[event['id']] = dict(event, acknowledged=True)
+
+    def covers(self, since):
+        """True if every event at or after `since` is held by the index."""
+        return self.enabled and self._loaded and since >= self.window_start
+
+    def query(self, since=None, limit=100, **filters):
+        """
+        Newest-first events at or after `since` matching equality filters
+        (bus_id, event_type, severity).
+        """
+        with self._lock:
+            keys = self._keys
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                candidate = self._by[field].get(_normalize(field, value), [])
+                if len(candidate) < len(keys):
+                    keys = candidate
+            result = []
+            for ts, event_id in reversed(keys):
+                if since is not None and ts < since:
+                    break
+                event = self._events[event_id]
+                if any(v is not None and str(event[f]) != str(v) for f, v in filters.items()):
+                    continue
+                result.append(event)
+                if len(result) >= limit:
+                    break
+            return result
+
+    def _insert(self, event_dict):
+        key = (_parse_ts(event_dict['timestamp']), event_dict['id'])
+        self._events[event_dict['id']] = event_dict
+        bisect.insort(self._keys, key)
+        for field, index in self._by.items():
+            bisect.insort(index.setdefault(event_dict[field], []), key)
+
+    def _remove(self, event_id):
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return
+        key = (_parse_ts(event['timestamp']), event_id)
+        _discard(self._keys, key)
+        for field, index in self._by.items():
+            bucket = index.get(event[field])
+            if bucket is not None:
+                _discard(bucket, key)
+                if not bucket:
+                    del index[event[field]]
+
+    def _prune(self):
+        cutoff = self.window_start
+        expired = [event_id for ts, event_id in self._keys[:bisect.bisect_left(self._keys, (cutoff, -1))]]
+        for event_id in expired:
+            self._remove(event_id)
+
+    def __len__(self):
+        return len(self._events)
+
+
+def _normalize(field, value):
+    if field == 'bus_id':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return value
+    return value
+
+
+def _discard(keys, key):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+hot_events = register('hot_events', HotEventIndex(HOT_EVENTS_HOURS))
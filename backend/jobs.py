@@ -0,0 +1,353 @@
+"""
+Background maintenance jobs for the Rash Driving Detection System.
+Purges old events in bounded chunks so ingest is never blocked for long,
+and removes the evidence files that belonged to the deleted rows.
+Archival moves old events into monthly partitions the same way (see archive.py).
+Purges drain the ingest shards first, so no event waiting in a shard is
+merged back after its scope was deleted.
+Job status lives in the maintenance_jobs table, so any worker can report or
+cancel a job that another worker runs.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from extensions import db, socketio
+from models import DrivingEvent, MaintenanceJob, refresh_last_30d_scores
+from hot_events import hot_events
+from event_payloads import event_payloads
+import archive
+import reports
+import shards
+from routes.media import get_upload_folder
+
+# Defaults (overridable per job / via environment)
+PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', 500))
+PURGE_PAUSE_SECONDS = float(os.getenv('PURGE_PAUSE_SECONDS', 0.05))
+EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', 0))  # 0 = keep forever
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 6))
+DRIVER_SCORE_REFRESH_HOURS = float(os.getenv('DRIVER_SCORE_REFRESH_HOURS', 1))
+
+_MAX_FINISHED_JOBS = 20
+
+
+def _remove_media(urls):
+    """Delete evidence files referenced by /api/media/<filename> URLs."""
+    removed = 0
+    folder = get_upload_folder()
+    for url in urls:
+        if not url or not url.startswith('/api/media/'):
+            continue
+        filename = os.path.basename(url)
+        try:
+            os.remove(os.path.join(folder, filename))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _purge_filters(older_than_days=None, bus_id=None):
+    filters = []
+    if older_than_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        filters.append(DrivingEvent.timestamp < cutoff)
+    if bus_id is not None:
+        filters.append(DrivingEvent.bus_id == bus_id)
+    return filters
+
+
+# ==================== JOB STATE ====================
+
+def _create_job(kind, scope, progress):
+    """Insert a queued job (needs an app context) and return its id."""
+    job_id = uuid.uuid4().hex[:12]
+    db.session.add(MaintenanceJob(id=job_id, kind=kind, status='queued', scope=scope, progress=progress))
+    _prune_finished_jobs()
+    db.session.commit()
+    return job_id
+
+
+def _update_job(job_id, progress=None, **fields):
+    """
+    Save a running job's status/progress (needs an app context). Returns True
+    if the job was asked to stop, from whichever worker.
+    """
+    job = db.session.get(MaintenanceJob, job_id, populate_existing=True)
+    if progress is not None:
+        job.progress = dict(progress)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job.cancel_requested
+
+
+def _prune_finished_jobs():
+    stale = MaintenanceJob.query.with_entities(MaintenanceJob.id) \
+        .filter(MaintenanceJob.finished_at.isnot(None)) \
+        .order_by(MaintenanceJob.finished_at.desc()).offset(_MAX_FINISHED_JOBS).all()
+    if stale:
+        MaintenanceJob.query.filter(MaintenanceJob.id.in_([j.id for j in stale])) \
+            .delete(synchronize_session=False)
+
+
+def get_job(job_id):
+    """Return a job's status dict, or None (needs an app context)."""
+    job = db.session.get(MaintenanceJob, job_id)
+    return job.to_dict() if job else None
+
+
+def list_jobs():
+    return [job.to_dict() for job in MaintenanceJob.query.order_by(MaintenanceJob.created_at).all()]
+
+
+def cancel_job(job_id):
+    """Ask a running job to stop after its current chunk (whichever worker runs it)."""
+    job = db.session.get(MaintenanceJob, job_id)
+    if not job:
+        return None
+    if job.status in ('queued', 'running'):
+        job.cancel_requested = True
+        db.session.commit()
+    return job.to_dict()
+
+
+def _finish_job(app, job_id, progress, status, error=None):
+    with app.app_context():
+        _update_job(job_id, progress, status=status, error=error, finished_at=datetime.utcnow())
+        db.session.remove()
+
+
+# ==================== PURGE ====================
+
+def _run_purge(app, job_id, scope, filters, chunk_size, pause):
+    progress = {'deleted_count': 0, 'media_removed': 0, 'chunks': 0}
+    days = set()   # report periods that lost events
+    status, error = 'completed', None
+    try:
+        with app.app_context():
+            cancelled = _update_job(job_id, status='running', started_at=datetime.utcnow())
+            # Shard rows in scope join the chunked delete (and lose their media) with the rest
+            shards.drain()
+            db.session.remove()
+        while not cancelled:
+            with app.app_context():
+                rows = db.session.query(
+                    DrivingEvent.id, DrivingEvent.timestamp, DrivingEvent.snapshot_url, DrivingEvent.video_url
+                ).filter(*filters).order_by(DrivingEvent.id).limit(chunk_size).all()
+                if not rows:
+                    db.session.remove()
+                    break
+
+                ids = [r.id for r in rows]
+                DrivingEvent.query.filter(DrivingEvent.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                hot_events.remove(ids)
+                event_payloads.invalidate(ids)
+                days.update(r.timestamp.date() for r in rows if r.timestamp)
+
+                progress['deleted_count'] += len(ids)
+                progress['chunks'] += 1
+                progress['media_removed'] += _remove_media(
+                    [r.snapshot_url for r in rows] + [r.video_url for r in rows]
+                )
+                cancelled = _update_job(job_id, progress)
+                db.session.remove()
+            # Release the write lock between chunks so ingest can get in
+            socketio.sleep(pause)
+
+        # The same scope applies to archived events
+        if not cancelled:
+            older_than_days = scope['older_than_days']
+            with app.app_context():
+                deleted, media, spans = archive.purge(
+                    before=datetime.utcnow() - timedelta(days=older_than_days)
+                    if older_than_days is not None else None,
+                    bus_id=scope['bus_id'])
+                db.session.commit()
+                db.session.remove()
+            progress['deleted_count'] += deleted
+            progress['media_removed'] += _remove_media(media)
+            for first, last in spans:
+                day = first.date()
+                while day <= last.date():
+                    days.add(day)
+                    day += timedelta(days=1)
+
+        status = 'cancelled' if cancelled else 'completed'
+    except Exception as e:
+        status, error = 'failed', str(e)
+        print(f"  ⚠️  Purge job {job_id} failed: {e}")
+    finally:
+        if progress['deleted_count']:
+            from routes.analytics import invalidate_timeseries
+            from routes.dashboard import snapshot_cache
+            invalidate_timeseries()
+            snapshot_cache.clear()
+            for day in days:
+                reports.invalidate_reports(datetime.combine(day, datetime.min.time()))
+        _finish_job(app, job_id, progress, status, error)
+
+
+def start_purge(app, older_than_days=None, bus_id=None, chunk_size=None, pause=None, kind='purge'):
+    """
+    Start a chunked purge in the background.
+
+    Args:
+        app: Flask app (the job opens its own app context per chunk)
+        older_than_days: Only delete events older than this many days
+        bus_id: Only delete events for this bus
+        chunk_size: Rows deleted per transaction
+        pause: Seconds to sleep between chunks
+        kind: Label shown in job status ('purge', 'reset', 'retention')
+
+    Returns:
+        Public status dict of the new job
+    """
+    scope = {'older_than_days': older_than_days, 'bus_id': bus_id}
+    with app.app_context():
+        job_id = _create_job(kind, scope, {'deleted_count': 0, 'media_removed': 0, 'chunks': 0})
+        job = get_job(job_id)
+
+    socketio.start_background_task(
+        _run_purge, app, job_id, scope,
+        _purge_filters(older_than_days, bus_id),
+        chunk_size or PURGE_CHUNK_SIZE,
+        PURGE_PAUSE_SECONDS if pause is None else pause,
+    )
+    return job
+
+
+# ==================== ARCHIVAL ====================
+
+def _run_archive(app, job_id, cutoff, chunk_size, pause):
+    progress = {'archived_count': 0, 'months': [], 'chunks': 0}
+    columns = [getattr(DrivingEvent, name) for name in archive.ARCHIVE_COLUMNS]
+    months = set()
+    days = set()   # report periods whose events moved out of the live table
+    status, error = 'completed', None
+    try:
+        with app.app_context():
+            cancelled = _update_job(job_id, status='running', started_at=datetime.utcnow())
+            db.session.remove()
+        while not cancelled:
+            with app.app_context():
+                rows = db.session.query(*columns).filter(
+                    DrivingEvent.timestamp < cutoff
+                ).order_by(DrivingEvent.id).limit(chunk_size).all()
+                if not rows:
+                    db.session.remove()
+                    break
+
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(archive.month_key(row.timestamp), []).append(row._asdict())
+                # Copy into the partitions first; the delete only commits once they hold the rows
+                for month, month_rows in by_month.items():
+                    archive.archive_rows(month, month_rows)
+                ids = [r.id for r in rows]
+                DrivingEvent.query.filter(DrivingEvent.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                hot_events.remove(ids)
+                event_payloads.invalidate(ids)
+                days.update(r.timestamp.date() for r in rows if r.timestamp)
+
+                months.update(by_month)
+                progress['archived_count'] += len(ids)
+                progress['chunks'] += 1
+                progress['months'] = sorted(months)
+                cancelled = _update_job(job_id, progress)
+                db.session.remove()
+            socketio.sleep(pause)
+
+        status = 'cancelled' if cancelled else 'completed'
+    except Exception as e:
+        status, error = 'failed', str(e)
+        print(f"  ⚠️  Archive job {job_id} failed: {e}")
+    finally:
+        if progress['archived_count']:
+            from routes.analytics import invalidate_timeseries
+            from routes.dashboard import snapshot_cache
+            invalidate_timeseries()
+            snapshot_cache.clear()
+        for day in days:
+            reports.invalidate_reports(datetime.combine(day, datetime.min.time()))
+        _finish_job(app, job_id, progress, status, error)
+
+
+def start_archive(app, older_than_days=None, chunk_size=None, pause=None):
+    """
+    Start moving events older than `older_than_days` (default ARCHIVE_AFTER_DAYS)
+    into monthly archive partitions in the background.
+
+    Returns:
+        Public status dict of the new job
+    """
+    older_than_days = archive.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    with app.app_context():
+        job_id = _create_job('archive', {'older_than_days': older_than_days},
+                             {'archived_count': 0, 'months': [], 'chunks': 0})
+        job = get_job(job_id)
+
+    socketio.start_background_task(
+        _run_archive, app, job_id,
+        datetime.utcnow() - timedelta(days=older_than_days),
+        chunk_size or archive.ARCHIVE_CHUNK_SIZE,
+        PURGE_PAUSE_SECONDS if pause is None else pause,
+    )
+    return job
+
+
+def _archive_loop(app):
+    while True:
+        socketio.sleep(archive.ARCHIVE_INTERVAL_HOURS * 3600)
+        start_archive(app)
+
+
+def start_archive_scheduler(app):
+    """Archive old events every ARCHIVE_INTERVAL_HOURS if ARCHIVE_AFTER_DAYS is set."""
+    if archive.ARCHIVE_AFTER_DAYS <= 0:
+        return
+    start_archive(app)
+    socketio.start_background_task(_archive_loop, app)
+    print(f"Archive: moving events older than {archive.ARCHIVE_AFTER_DAYS} days "
+          f"into monthly partitions every {archive.ARCHIVE_INTERVAL_HOURS}h")
+
+
+# ==================== RETENTION ====================
+
+def _retention_loop(app):
+    while True:
+        socketio.sleep(RETENTION_INTERVAL_HOURS * 3600)
+        start_purge(app, older_than_days=EVENT_RETENTION_DAYS, kind='retention')
+
+
+def start_retention_scheduler(app):
+    """Run a retention purge every RETENTION_INTERVAL_HOURS if EVENT_RETENTION_DAYS is set."""
+    if EVENT_RETENTION_DAYS <= 0:
+        return
+    start_purge(app, older_than_days=EVENT_RETENTION_DAYS, kind='retention')
+    socketio.start_background_task(_retention_loop, app)
+    print(f"Retention: purging events older than {EVENT_RETENTION_DAYS} days "
+          f"every {RETENTION_INTERVAL_HOURS}h")
+
+
+# ==================== DRIVER SCORES ====================
+
+def _driver_score_loop(app):
+    while True:
+        with app.app_context():
+            try:
+                refresh_last_30d_scores()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"  ⚠️  Driver score refresh failed: {e}")
+            finally:
+                db.session.remove()
+        socketio.sleep(DRIVER_SCORE_REFRESH_HOURS * 3600)
+
+
+def start_driver_score_scheduler(app):
+    """Refresh every driver's 30-day leaderboard score every DRIVER_SCORE_REFRESH_HOURS."""
+    socketio.start_background_task(_driver_score_loop, app)
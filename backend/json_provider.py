@@ -0,0 +1,51 @@
+"""
+Fast JSON provider for the Rash Driving Detection System.
+Uses orjson when it is installed (native datetime/date support, bytes output),
+and falls back to Flask's default provider otherwise.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson.
+    datetimes are emitted as ISO 8601 (same as .isoformat()); anything orjson
+    cannot handle natively goes through Flask's default() hook.
+    """
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        option = self.option
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        body = orjson.dumps(obj, default=self.default, option=option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the orjson provider on the app if orjson is available."""
+    if orjson is None:
+        return
+    app.json_provider_class = OrjsonProvider
+    app.json = OrjsonProvider(app)
+    # Key sorting costs a full dict walk per response and no client relies on it
+    app.json.sort_keys = False
@@ -0,0 +1,323 @@
+"""
+In-memory index of current bus positions for the live map, and Socket.IO
+fan-out for live data.
+Positions are bucketed into a coarse lat/lng grid so viewport (bbox) queries
+only touch nearby cells. Position changes are sent as one batched
+bus_updates frame per client every BUS_UPDATE_INTERVAL, holding only the
+buses that moved and that the client subscribed to (whole fleet, viewport,
+buses or routes). Alerts go to rooms by bus, route and driver. Clients
+that negotiated MessagePack (socket_codec.py) get the same frames in binary.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from extensions import db, socketio
+from cluster import register, replicated
+import socket_codec
+
+CELL_DEGREES = 0.05          # ~5.5 km cells
+ACTIVE_WINDOW = timedelta(minutes=10)
+ALL_BUSES_ROOM = 'all_buses'  # fleet-wide alerts; joined on connect
+BUS_UPDATE_INTERVAL = float(os.getenv('BUS_UPDATE_INTERVAL', 1.0))   # seconds between bus_updates frames
+
+
+def _cell(lat, lng):
+    return int(lat // CELL_DEGREES), int(lng // CELL_DEGREES)
+
+
+def _in_bbox(lat, lng, bbox):
+    south, west, north, east = bbox
+    if not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lng <= east
+    return lng >= west or lng <= east  # crosses the antimeridian
+
+
+def _bbox_cells(bbox):
+    """Grid rows and columns covered by a (south, west, north, east) bbox."""
+    south, west, north, east = bbox
+    lat_lo, lng_lo = _cell(south, west)
+    lat_hi, lng_hi = _cell(north, east)
+    if west <= east:
+        lng_cells = range(lng_lo, lng_hi + 1)
+    else:
+        lng_cells = list(range(lng_lo, _cell(0, 180)[1] + 1)) + \
+            list(range(_cell(0, -180)[1], lng_hi + 1))
+    return range(lat_lo, lat_hi + 1), lng_cells
+
+
+class PositionGrid:
+    """Latest position per bus, indexed by grid cell."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}   # bus_id -> (payload dict, updated_at datetime)
+        self._cells = {}       # (ilat, ilng) -> set of bus_id
+        self._bus_cell = {}    # bus_id -> (ilat, ilng)
+        self._changed = {}     # bus_id -> payload, moved since the last take_changed()
+        self._loaded = False
+
+    def load(self):
+        """Populate from bus_locations (needs an app context). Safe to call repeatedly."""
+        if self._loaded:
+            return
+        from models import BusLocation
+        locations = BusLocation.query.options(db.joinedload(BusLocation.bus)).filter(
+            BusLocation.updated_at >= datetime.utcnow() - ACTIVE_WINDOW
+        ).all()
+        with self._lock:
+            if self._loaded:
+                return
+            for loc in locations:
+                self._put(loc.to_dict(), loc.updated_at)
+            self._loaded = True
+
+    @replicated
+    def update(self, payload):
+        """Record a BusLocation.to_dict() payload."""
+        with self._lock:
+            previous = self._positions.get(payload['bus_id'])
+            if previous is None or (previous[0]['latitude'], previous[0]['longitude']) != \
+                    (payload['latitude'], payload['longitude']):
+                self._changed[payload['bus_id']] = payload
+            self._put(payload, datetime.utcnow())
+
+    def take_changed(self):
+        """Payloads of buses that moved since the previous call."""
+        with self._lock:
+            changed, self._changed = self._changed, {}
+        return list(changed.values())
+
+    def _put(self, payload, updated_at):
+        bus_id = payload['bus_id']
+        cell = _cell(payload['latitude'], payload['longitude'])
+        old_cell = self._bus_cell.get(bus_id)
+        if old_cell != cell:
+            if old_cell is not None:
+                self._cells[old_cell].discard(bus_id)
+                if not self._cells[old_cell]:
+                    del self._cells[old_cell]
+            self._cells.setdefault(cell, set()).add(bus_id)
+            self._bus_cell[bus_id] = cell
+        self._positions[bus_id] = (payload, updated_at)
+
+    @replicated
+    def remove(self, bus_id):
+        with self._lock:
+            cell = self._bus_cell.pop(bus_id, None)
+            if cell is not None:
+                self._cells[cell].discard(bus_id)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+            self._positions.pop(bus_id, None)
+
+    def query(self, bbox=None):
+        """Active positions, optionally limited to a (south, west, north, east) bbox."""
+        cutoff = datetime.utcnow() - ACTIVE_WINDOW
+        with self._lock:
+            if bbox is None:
+                candidates = list(self._positions)
+            else:
+                lat_cells, lng_cells = _bbox_cells(bbox)
+                lat_lo, lat_hi = lat_cells[0], lat_cells[-1]
+                if len(lat_cells) * len(lng_cells) > len(self._cells):
+                    # Viewport spans more cells than are occupied: scan occupied ones
+                    candidates = [b for c, ids in self._cells.items()
+                                  if lat_lo <= c[0] <= lat_hi for b in ids]
+                else:
+                    candidates = [b for ilat in lat_cells for ilng in lng_cells
+                                  for b in self._cells.get((ilat, ilng), ())]
+            result = []
+            for bus_id in candidates:
+                payload, updated_at = self._positions[bus_id]
+                if updated_at < cutoff:
+                    continue
+                if bbox is not None and not _in_bbox(payload['latitude'], payload['longitude'], bbox):
+                    continue
+                result.append(payload)
+            return result
+
+    def __len__(self):
+        return len(self._positions)
+
+
+position_grid = register('position_grid', PositionGrid())
+
+# ==================== SUBSCRIPTIONS ====================
+# Position subscriptions of the clients connected to this worker. Every
+# worker sees every position change (PositionGrid updates are replicated by
+# cluster.py), so each one batches frames for its own clients only.
+
+class Subscription:
+    """What one client receives in bus_updates frames."""
+
+    def __init__(self, encoding=socket_codec.JSON):
+        self.encoding = encoding   # socket_codec.JSON or MSGPACK, negotiated on connect
+        self.fleet = True          # every bus
+        self.bbox = None           # (south, west, north, east)
+        self.bus_ids = set()       # explicit buses, including those of subscribed routes
+
+    def wants(self, payload):
+        if self.fleet or payload['bus_id'] in self.bus_ids:
+            return True
+        return self.bbox is not None and _in_bbox(payload['latitude'], payload['longitude'], self.bbox)
+
+
+_subscriptions = {}    # sid -> Subscription
+_subscriptions_lock = threading.Lock()
+_flusher_started = False
+
+
+def add_client(sid, encoding=socket_codec.JSON):
+    with _subscriptions_lock:
+        _subscriptions[sid] = Subscription(encoding)
+    _ensure_flusher()
+
+
+def remove_client(sid):
+    with _subscriptions_lock:
+        _subscriptions.pop(sid, None)
+
+
+def client_count():
+    """Socket.IO clients connected to this worker."""
+    with _subscriptions_lock:
+        return len(_subscriptions)
+
+
+def _subscription(sid):
+    with _subscriptions_lock:
+        return _subscriptions.setdefault(sid, Subscription())
+
+
+def set_viewport(sid, bbox):
+    sub = _subscription(sid)
+    sub.bbox = bbox
+    sub.fleet = False
+
+
+def clear_viewport(sid):
+    sub = _subscription(sid)
+    sub.bbox = None
+    sub.fleet = not sub.bus_ids
+
+
+def set_buses(sid, bus_ids):
+    """Limit position updates to these buses (plus any viewport)."""
+    sub = _subscription(sid)
+    sub.bus_ids = set(bus_ids)
+    sub.fleet = False
+
+
+def clear_buses(sid):
+    sub = _subscription(sid)
+    sub.bus_ids = set()
+    sub.fleet = sub.bbox is None
+
+
+def flush_bus_updates():
+    """
+    Send one bus_updates frame to each local client with at least one
+    relevant moved bus. Returns the number of frames sent.
+    """
+    changed = position_grid.take_changed()
+    if not changed:
+        return 0
+    with _subscriptions_lock:
+        subscriptions = list(_subscriptions.items())
+    frames = 0
+    fleet_binary = None
+    for sid, sub in subscriptions:
+        payloads = changed if sub.fleet else [p for p in changed if sub.wants(p)]
+        if not payloads:
+            continue
+        if sub.encoding == socket_codec.MSGPACK:
+            if sub.fleet:
+                fleet_binary = fleet_binary or socket_codec.encode(changed)
+                data = fleet_binary
+            else:
+                data = socket_codec.encode(payloads)
+        else:
+            data = payloads
+        # Local delivery only: other workers flush to their own clients
+        socketio.emit('bus_updates', data, to=sid, ignore_queue=True)
+        frames += 1
+    return frames
+
+
+def _flush_loop():
+    while True:
+        socketio.sleep(BUS_UPDATE_INTERVAL)
+        try:
+            flush_bus_updates()
+        except Exception as e:
+            print(f"  ⚠️  bus_updates flush failed: {e}")
+
+
+def _ensure_flusher():
+    global _flusher_started
+    with _subscriptions_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    socketio.start_background_task(_flush_loop)
+
+
+def publish_bus_update(payload):
+    """Record a new position; it goes out with the next bus_updates frame."""
+    position_grid.update(payload)
+
+
+# ==================== ROOMS ====================
+
+def bus_room(bus_id):
+    return f'bus:{bus_id}'
+
+
+def route_room(route):
+    return f'route:{route}'
+
+
+def driver_room(driver_id):
+    return f'driver:{driver_id}'
+
+
+def alert_rooms(bus):
+    """Rooms interested in an alert for `bus`: fleet, the bus, its route and its current driver."""
+    from models import Trip
+    rooms = [ALL_BUSES_ROOM]
+    if bus is None:
+        return rooms
+    rooms.append(bus_room(bus.id))
+    if bus.route:
+        rooms.append(route_room(bus.route))
+    trip = Trip.query.with_entities(Trip.driver_id).filter(
+        Trip.bus_id == bus.id, Trip.ended_at.is_(None)
+    ).order_by(Trip.started_at.desc()).first()
+    if trip is not None:
+        rooms.append(driver_room(trip.driver_id))
+    return rooms
+
+
+MSGPACK_ROOM_SUFFIX = '#msgpack'
+
+
+def client_room(sid, room):
+    """Name of `room` for this client: MessagePack clients join a parallel room."""
+    if _subscription(sid).encoding == socket_codec.MSGPACK:
+        return room + MSGPACK_ROOM_SUFFIX
+    return room
+
+
+def emit_to_rooms(event, data, rooms):
+    """Emit to rooms once per encoding (one frame per client, encoded once)."""
+    socketio.emit(event, data, to=rooms)
+    if socket_codec.msgpack is not None:
+        socketio.emit(event, socket_codec.encode(data), to=[r + MSGPACK_ROOM_SUFFIX for r in rooms])
+
+
+def emit_alert(event_dict, bus):
+    """new_alert to every room interested in the event (one frame per client)."""
+    emit_to_rooms('new_alert', event_dict, alert_rooms(bus))
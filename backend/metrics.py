@@ -0,0 +1,369 @@
+"""
+Prometheus metrics for the Rash Driving Detection System.
+GET /metrics serves the text exposition format (no client library needed):
+
+- http_request_duration_seconds / http_requests_total by blueprint and route
+  (the URL rule, e.g. /api/buses/<int:bus_id>/location, not the raw path)
+- db_queries_total / db_query_duration_seconds by statement type, plus
+  db_queries_per_request and db_time_per_request_seconds by route
+- events_ingested_total by event type (unknown types as OTHER),
+  bus_locations_ingested_total
+- socketio_emits_total by event, socketio_connected_clients
+- pi_registry_devices and simulator_running
+
+Request durations stop when the view returns its response, so streamed
+bodies (CSV exports) only count their setup time.
+
+Under gunicorn each worker keeps its own numbers and writes a snapshot to
+METRICS_DIR every METRICS_SNAPSHOT_INTERVAL seconds; whichever worker
+answers the scrape adds up its live numbers and the other workers'
+snapshots, so the totals cover the whole server (a few seconds behind).
+"""
+import glob
+import json
+import os
+import threading
+import time
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')            # shared by the workers of one server
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# events_ingested_total labels; any other client-supplied type counts as OTHER
+EVENT_TYPES = ('HARSH_BRAKE', 'HARSH_ACCEL', 'AGGRESSIVE_TURN', 'TAILGATING', 'CLOSE_OVERTAKING')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of series keyed by label values. Summed across workers."""
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}    # label values tuple -> value
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): self._copy(value) for key, value in self._series.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def _merge(self, into, value):
+        return (into or 0) + value
+
+    def collect(self, snapshots=()):
+        """Series of this worker plus those in other workers' snapshots."""
+        merged = self.snapshot()
+        for snapshot in snapshots:
+            for key, value in snapshot.get(self.name, {}).items():
+                merged[key] = self._merge(merged.get(key), value)
+        return sorted((tuple(json.loads(k)), v) for k, v in merged.items())
+
+    def render(self, snapshots=()):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, value in self.collect(snapshots):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_labels(self.label_names, key)} {_number(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._series[labels] = value
+
+    def add(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def _merge(self, into, value):
+        if into is None:
+            return list(value)
+        return [a + b for a, b in zip(into, value)]
+
+    def _render_series(self, key, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            le = (('le', _number(float(bound))),)
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}')
+        labels = _labels(self.label_names, key)
+        lines.append(f'{self.name}_bucket{_labels(self.label_names, key, (("le", "+Inf"),))} {value[-1]}')
+        lines.append(f'{self.name}_sum{labels} {_number(value[-2])}')
+        lines.append(f'{self.name}_count{labels} {value[-1]}')
+        return lines
+
+
+# ==================== METRICS ====================
+
+http_requests = Counter('http_requests_total', 'HTTP requests by route and status.',
+                        ('blueprint', 'route', 'method', 'status'))
+http_duration = Histogram('http_request_duration_seconds', 'HTTP request latency by route.',
+                          ('blueprint', 'route', 'method'))
+http_in_flight = Gauge('http_requests_in_flight', 'HTTP requests being handled.')
+db_queries = Counter('db_queries_total', 'SQL statements executed, by statement type.', ('statement',))
+db_duration = Histogram('db_query_duration_seconds', 'SQL statement duration by statement type.',
+                        ('statement',), QUERY_BUCKETS)
+db_queries_per_request = Histogram('db_queries_per_request', 'SQL statements per HTTP request by route.',
+                                   ('blueprint', 'route', 'method'), COUNT_BUCKETS)
+db_time_per_request = Histogram('db_time_per_request_seconds', 'Time in SQL per HTTP request by route.',
+                                ('blueprint', 'route', 'method'))
+events_ingested = Counter('events_ingested_total', 'Driving events received, by event type.', ('event_type',))
+locations_ingested = Counter('bus_locations_ingested_total', 'Bus location updates received.')
+socketio_emits = Counter('socketio_emits_total', 'Socket.IO emits (one per call, not per recipient), by event.',
+                         ('event',))
+socketio_clients = Gauge('socketio_connected_clients', 'Socket.IO clients connected.')
+simulator_running = Gauge('simulator_running', '1 while the fleet simulator process runs.')
+
+_METRICS = [http_requests, http_duration, http_in_flight, db_queries, db_duration,
+            db_queries_per_request, db_time_per_request, events_ingested, locations_ingested,
+            socketio_emits, socketio_clients, simulator_running]
+
+_request = threading.local()   # per-request SQL count and time
+
+
+def count_event(event_type):
+    """Count an ingested event, keeping the event_type label set bounded."""
+    events_ingested.inc(event_type if event_type in EVENT_TYPES else 'OTHER')
+
+
+# ==================== INSTRUMENTATION ====================
+
+def _route_labels(request):
+    route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    return request.blueprint or 'app', route
+
+
+def _instrument_requests(app):
+    from flask import request
+
+    @app.before_request
+    def _start_timer():
+        _request.started = time.perf_counter()
+        _request.queries = 0
+        _request.db_time = 0.0
+        http_in_flight.add(amount=1)
+
+    @app.after_request
+    def _record(response):
+        started = getattr(_request, 'started', None)
+        if started is None:
+            return response
+        blueprint, route = _route_labels(request)
+        http_duration.observe(blueprint, route, request.method, value=time.perf_counter() - started)
+        http_requests.inc(blueprint, route, request.method, str(response.status_code))
+        db_queries_per_request.observe(blueprint, route, request.method, value=_request.queries)
+        db_time_per_request.observe(blueprint, route, request.method, value=_request.db_time)
+        return response
+
+    @app.teardown_request
+    def _finish(exc=None):
+        if getattr(_request, 'started', None) is not None:
+            _request.started = None
+            http_in_flight.add(amount=-1)
+
+
+def _instrument_db():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    # The start time rides on the statement's execution context, so a statement
+    # that raises (no after_cursor_execute) leaves nothing behind
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        if kind not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY'):
+            kind = 'OTHER'
+        db_queries.inc(kind)
+        db_duration.observe(kind, value=elapsed)
+        if getattr(_request, 'started', None) is not None:
+            _request.queries += 1
+            _request.db_time += elapsed
+
+
+def _instrument_socketio(socketio):
+    """Count emits, including flask_socketio.emit() in handlers (it calls socketio.emit)."""
+    original = socketio.emit
+
+    def emit(event, *args, **kwargs):
+        socketio_emits.inc(event)
+        return original(event, *args, **kwargs)
+
+    socketio.emit = emit
+
+
+# ==================== WORKER SNAPSHOTS ====================
+
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f'worker-{pid or os.getpid()}.json')
+
+
+def write_snapshot():
+    """Save this worker's numbers for the other workers' scrapes."""
+    _update_local_gauges()
+    data = {m.name: m.snapshot() for m in _METRICS}
+    path = _snapshot_path()
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def remove_snapshot(pid):
+    """Drop a stopped worker's snapshot (gunicorn child_exit)."""
+    if METRICS_DIR:
+        try:
+            os.remove(_snapshot_path(pid))
+        except OSError:
+            pass
+
+
+def _other_snapshots():
+    if not METRICS_DIR:
+        return []
+    own = _snapshot_path()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, 'worker-*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue   # being replaced, or the worker just exited
+    return snapshots
+
+
+def _snapshot_loop(socketio):
+    while True:
+        socketio.sleep(METRICS_SNAPSHOT_INTERVAL)
+        try:
+            write_snapshot()
+        except Exception as e:
+            print(f"  ⚠️  Metrics snapshot failed: {e}")
+
+
+# ==================== EXPOSITION ====================
+
+def _update_local_gauges():
+    from live_positions import client_count
+    from routes.simulation import simulator_status
+    socketio_clients.set(value=client_count())
+    # The simulator is a child of the worker that started it
+    simulator_running.set(value=int(simulator_status()['running']))
+
+
+def _global_gauges():
+    """Gauges that are the same for every worker, read once per scrape."""
+    from pi_registry import pi_registry
+    try:
+        devices = len(pi_registry.all())
+    except Exception:
+        from extensions import db
+        db.session.rollback()
+        return []   # registry backend unreachable; leave the series out
+    return ['# HELP pi_registry_devices Pis with a live heartbeat.',
+            '# TYPE pi_registry_devices gauge',
+            f'pi_registry_devices {devices}']
+
+
+def render():
+    """The whole exposition text."""
+    _update_local_gauges()
+    snapshots = _other_snapshots()
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render(snapshots))
+    lines.extend(_global_gauges())
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app, socketio):
+    """Instrument requests, SQL and Socket.IO, and serve GET /metrics."""
+    from flask import Response
+
+    _instrument_requests(app)
+    _instrument_db()
+    _instrument_socketio(socketio)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def start_metrics_snapshots(socketio):
+    """With METRICS_DIR set, share this worker's numbers with the others (needs socketio.init_app)."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    socketio.start_background_task(_snapshot_loop, socketio)
@@ -2,8 +2,12 @@
 Database models for the Rash Driving Detection System.
 Uses Flask-SQLAlchemy for ORM.
 """
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from extensions import db
+from db_profile import bulk_update, is_postgres
+import geo
 
 # db = SQLAlchemy() # Moved to extensions.py
 
@@ -54,6 +58,7 @@ class DrivingEvent(db.Model):
     location_lat = db.Column(db.Float, nullable=True)
     location_lng = db.Column(db.Float, nullable=True)
     location_address = db.Column(db.String(200), nullable=True)
+    geohash = db.Column(db.String(12), nullable=True, index=True)  # Grid cell, set at ingest
     
     # Timestamps
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -126,6 +131,109 @@ class BusLocation(db.Model):
         }
 
 
+class EventArchive(db.Model):
+    """Catalogue entry for one monthly partition of archived events (see archive.py)."""
+    __tablename__ = 'event_archives'
+
+    month = db.Column(db.String(7), primary_key=True)      # 'YYYY-MM'
+    filename = db.Column(db.String(200), nullable=False)   # SQLite file in ARCHIVE_DIR
+    event_count = db.Column(db.Integer, default=0, nullable=False)
+    min_id = db.Column(db.Integer, nullable=True)
+    max_id = db.Column(db.Integer, nullable=True)
+    first_timestamp = db.Column(db.DateTime, nullable=True)
+    last_timestamp = db.Column(db.DateTime, nullable=True)
+    bus_ids = db.Column(db.JSON, nullable=True)            # Buses with events in the month; None = unknown
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'month': self.month,
+            'event_count': self.event_count,
+            'min_id': self.min_id,
+            'max_id': self.max_id,
+            'first_timestamp': self.first_timestamp.isoformat() if self.first_timestamp else None,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class MaintenanceJob(db.Model):
+    """
+    Status of a background purge / retention / archive job (see jobs.py).
+    Kept in the database so any worker can report or cancel a job another
+    worker is running.
+    """
+    __tablename__ = 'maintenance_jobs'
+
+    id = db.Column(db.String(12), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)        # purge, reset, retention, archive
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    scope = db.Column(db.JSON, nullable=False, default=dict)
+    progress = db.Column(db.JSON, nullable=False, default=dict)   # counters of the job's kind
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'scope': self.scope,
+            **(self.progress or {}),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+
+
+class PiDevice(db.Model):
+    """Last heartbeat of a bus's Raspberry Pi, for driver-app discovery (see pi_registry.py)."""
+    __tablename__ = 'pi_devices'
+
+    bus_registration = db.Column(db.String(20), primary_key=True)
+    pi_ip = db.Column(db.String(64), nullable=True)
+    gps_port = db.Column(db.Integer, nullable=True)
+    demo_port = db.Column(db.Integer, nullable=True)
+    tunnel_url = db.Column(db.String(255), nullable=True)
+    last_seen = db.Column(db.DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'pi_ip': self.pi_ip,
+            'gps_port': self.gps_port,
+            'demo_port': self.demo_port,
+            'tunnel_url': self.tunnel_url,
+            'bus_registration': self.bus_registration,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+
+
+def standalone_event_table(metadata, index_prefix):
+    """
+    driving_events columns without the bus foreign key, for event rows kept in
+    side databases (archive partitions, ingest shards) where buses don't exist.
+    """
+    return db.Table(
+        'driving_events', metadata,
+        *[db.Column(c.name, c.type, primary_key=c.primary_key) for c in DrivingEvent.__table__.columns],
+        db.Index(f'ix_{index_prefix}_timestamp', 'timestamp'),
+        db.Index(f'ix_{index_prefix}_bus_id', 'bus_id'),
+    )
+
+
+class DetachedEvent:
+    """Read-only DrivingEvent stand-in for a row from a standalone event table."""
+    to_dict = DrivingEvent.to_dict
+
+    def __init__(self, row, bus):
+        self.__dict__.update(row)
+        self.bus = bus
+
+
 # ==================== HELPER FUNCTIONS ====================
 
 def update_bus_location(bus_id, lat, lng, speed=None, heading=None):
@@ -142,6 +250,17 @@ def update_bus_location(bus_id, lat, lng, speed=None, heading=None):
     Returns:
         BusLocation object
     """
+    if is_postgres():
+        # One round trip and no race between two Pis reporting for the same bus
+        values = dict(latitude=lat, longitude=lng, speed=speed, heading=heading, updated_at=datetime.utcnow())
+        stmt = pg_insert(BusLocation).values(bus_id=bus_id, **values).on_conflict_do_update(
+            index_elements=[BusLocation.bus_id], set_=values
+        ).returning(BusLocation)
+        return db.session.execute(
+            db.select(BusLocation).from_statement(stmt),
+            execution_options={'populate_existing': True}
+        ).scalar_one()
+
     location = BusLocation.query.filter_by(bus_id=bus_id).first()
     if location:
         location.latitude = lat
@@ -178,7 +297,13 @@ def get_or_create_bus(bus_id=None, registration_number=None):
         bus = Bus.query.get(bus_id)
     elif registration_number:
         bus = Bus.query.filter_by(registration_number=registration_number).first()
-        if not bus:
+        if not bus and is_postgres():
+            # Concurrent first uploads for a new registration must not both insert
+            db.session.execute(pg_insert(Bus).values(registration_number=registration_number)
+                               .on_conflict_do_nothing(index_elements=[Bus.registration_number]))
+            db.session.commit()
+            bus = Bus.query.filter_by(registration_number=registration_number).first()
+        elif not bus:
             # Auto-create bus if it doesn't exist
             bus = Bus(registration_number=registration_number)
             db.session.add(bus)
@@ -190,6 +315,53 @@ def get_or_create_bus(bus_id=None, registration_number=None):
     return bus, None
 
 
+# Columns added after the first release: (table, column, DDL type).
+# db.create_all() never alters existing tables, so upgrade_schema() adds them.
+ADDED_COLUMNS = [
+    ('driving_events', 'geohash', 'VARCHAR(12)'),
+    ('event_archives', 'bus_ids', 'JSON'),
+]
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models.
+    Adds missing columns and indexes, then backfills derived values.
+    """
+    inspector = db.inspect(db.engine)
+    for table, column, ddl in ADDED_COLUMNS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column not in existing:
+            db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            db.session.commit()
+            print(f"Schema: added {table}.{column}")
+    
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    # Backfill geohash cells for events stored before the column existed
+    batch = 20000 if is_postgres() else 1000   # COPY makes large batches cheap on Postgres
+    while True:
+        rows = db.session.query(
+            DrivingEvent.id, DrivingEvent.location_lat, DrivingEvent.location_lng
+        ).filter(
+            DrivingEvent.geohash.is_(None),
+            DrivingEvent.location_lat.isnot(None),
+            DrivingEvent.location_lng.isnot(None)
+        ).limit(batch).all()
+        if not rows:
+            break
+        bulk_update(DrivingEvent.__table__, 'id', 'geohash',
+                    [(r.id, geo.encode(r.location_lat, r.location_lng)) for r in rows])
+        db.session.commit()
+    
+    # Materialize driver aggregates for databases that predate driver_stats
+    if db.session.query(DriverStats.driver_id).first() is None and Trip.query.first() is not None:
+        rebuild_driver_stats()
+        print("Schema: backfilled driver_stats")
+
+
 def process_event_data(data):
     """
     Process incoming event data and create event in database.
@@ -199,7 +371,8 @@ def process_event_data(data):
         data: Dictionary with event data
     
     Returns:
-        Tuple of (DrivingEvent object or None, error dict or None)
+        Tuple of (DrivingEvent object or None, error dict or None).
+        With sharded ingest the event is a DetachedEvent living in its shard.
     """
     if not data:
         return None, {'error': 'No data provided'}
@@ -221,6 +394,15 @@ def process_event_data(data):
         except:
             pass
     
+    location = dict(data.get('location') or {})
+    cell = None
+    if location.get('lat') is not None and location.get('lng') is not None:
+        try:
+            location['lat'], location['lng'] = float(location['lat']), float(location['lng'])
+        except (TypeError, ValueError):
+            return None, {'error': 'location lat and lng must be numbers'}
+        cell = geo.encode(location['lat'], location['lng'])
+    
     # Create event
     event = DrivingEvent(
         bus_id=bus.id,
@@ -230,17 +412,26 @@ def process_event_data(data):
         acceleration_y=data.get('acceleration_y'),
         acceleration_z=data.get('acceleration_z'),
         speed=data.get('speed'),
-        location_lat=data.get('location', {}).get('lat'),
-        location_lng=data.get('location', {}).get('lng'),
-        location_address=data.get('location', {}).get('address'),
+        location_lat=location.get('lat'),
+        location_lng=location.get('lng'),
+        location_address=location.get('address'),
+        geohash=cell,
         timestamp=timestamp,
         alert_sent=True
     )
     
+    import shards
+    if shards.enabled:
+        # Event (and location) go to the bus's shard; merged into this DB in the background
+        location_update = None
+        if location.get('lat') and location.get('lng'):
+            location_update = {'bus_id': bus.id, 'latitude': location['lat'],
+                               'longitude': location['lng'], 'speed': data.get('speed')}
+        return shards.store_event(event, bus, location_update), None
+    
     db.session.add(event)
     
     # Update bus location if provided
-    location = data.get('location', {})
     if location.get('lat') and location.get('lng'):
         update_bus_location(
             bus_id=bus.id,
@@ -285,8 +476,8 @@ class Trip(db.Model):
     __tablename__ = 'trips'
     
     id = db.Column(db.Integer, primary_key=True)
-    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=False)
-    bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False)
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=False, index=True)
+    bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False, index=True)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     ended_at = db.Column(db.DateTime, nullable=True)
     score = db.Column(db.Float, default=100.0)  # Starts at 100, decreases per event
@@ -294,15 +485,31 @@ class Trip(db.Model):
     # Relationships
     bus = db.relationship('Bus', backref=db.backref('trips', lazy=True))
     
-    def to_dict(self):
+    @staticmethod
+    def event_count_expression():
+        """Correlated COUNT of events on the trip's bus during the trip."""
+        trips = Trip.__table__
+        return db.select(db.func.count(DrivingEvent.id)).where(
+            DrivingEvent.bus_id == trips.c.bus_id,
+            DrivingEvent.timestamp >= trips.c.started_at,
+            db.or_(trips.c.ended_at.is_(None), DrivingEvent.timestamp <= trips.c.ended_at)
+        ).correlate(trips).scalar_subquery()
+    
+    def to_dict(self, event_count=None):
+        """
+        Args:
+            event_count: Precomputed event count (see with_event_counts()).
+                         Counted with one query when omitted.
+        """
         # Count events during this trip
-        event_count = 0
-        if self.started_at:
-            query = DrivingEvent.query.filter_by(bus_id=self.bus_id)
-            query = query.filter(DrivingEvent.timestamp >= self.started_at)
-            if self.ended_at:
-                query = query.filter(DrivingEvent.timestamp <= self.ended_at)
-            event_count = query.count()
+        if event_count is None:
+            event_count = 0
+            if self.started_at:
+                query = DrivingEvent.query.filter_by(bus_id=self.bus_id)
+                query = query.filter(DrivingEvent.timestamp >= self.started_at)
+                if self.ended_at:
+                    query = query.filter(DrivingEvent.timestamp <= self.ended_at)
+                event_count = query.count()
         
         return {
             'id': self.id,
@@ -317,3 +524,125 @@ class Trip(db.Model):
             'is_active': self.ended_at is None,
         }
 
+
+def with_event_counts(query):
+    """
+    Run a Trip query and return (trip, event_count) pairs in one statement,
+    with driver and bus eagerly loaded.
+    """
+    rows = query.options(db.joinedload(Trip.driver), db.joinedload(Trip.bus)) \
+        .add_columns(Trip.event_count_expression()).all()
+    return [(trip, count) for trip, count in rows]
+
+
+
+class DriverStats(db.Model):
+    """Per-driver aggregates, updated as trips start and stop (backs the leaderboard)."""
+    __tablename__ = 'driver_stats'
+    
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), primary_key=True)
+    trip_count = db.Column(db.Integer, default=0, nullable=False)        # Including active trip
+    completed_trips = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Float, default=0.0, nullable=False)
+    avg_score = db.Column(db.Float, nullable=True, index=True)           # None until a trip completes
+    best_score = db.Column(db.Float, nullable=True, index=True)
+    last_30d_score = db.Column(db.Float, nullable=True, index=True)      # Refreshed hourly (jobs.py)
+    events_by_type = db.Column(db.JSON, nullable=True)
+    last_trip_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    driver = db.relationship('Driver', backref=db.backref('stats', uselist=False))
+    
+    def to_dict(self):
+        return {
+            'driver_id': self.driver_id,
+            'driver_name': self.driver.full_name if self.driver else None,
+            'trip_count': self.trip_count,
+            'completed_trips': self.completed_trips,
+            'avg_score': round(self.avg_score, 1) if self.avg_score is not None else None,
+            'best_score': round(self.best_score, 1) if self.best_score is not None else None,
+            'last_30d_score': round(self.last_30d_score, 1) if self.last_30d_score is not None else None,
+            'events_by_type': self.events_by_type or {},
+            'last_trip_at': self.last_trip_at.isoformat() if self.last_trip_at else None,
+        }
+
+
+def get_driver_stats(driver_id):
+    """Get (or create an empty) DriverStats row. Caller commits."""
+    stats = db.session.get(DriverStats, driver_id)
+    if not stats:
+        stats = DriverStats(driver_id=driver_id, trip_count=0, completed_trips=0,
+                            score_sum=0.0, events_by_type={})
+        db.session.add(stats)
+    return stats
+
+
+def record_trip_completed(trip, events):
+    """
+    Fold a just-stopped trip into its driver's aggregates. Caller commits.
+    
+    Args:
+        trip: Trip with ended_at and score set
+        events: DrivingEvents that happened during the trip
+    """
+    stats = get_driver_stats(trip.driver_id)
+    stats.completed_trips += 1
+    stats.score_sum += trip.score
+    stats.avg_score = stats.score_sum / stats.completed_trips
+    stats.best_score = trip.score if stats.best_score is None else max(stats.best_score, trip.score)
+    stats.last_trip_at = trip.ended_at
+    
+    by_type = dict(stats.events_by_type or {})
+    for event in events:
+        by_type[event.event_type] = by_type.get(event.event_type, 0) + 1
+    stats.events_by_type = by_type
+    
+    # Bounded by the driver's trips in the window (uses ix_trips_driver_id)
+    db.session.flush()
+    stats.last_30d_score = db.session.query(db.func.avg(Trip.score)).filter(
+        Trip.driver_id == trip.driver_id, *_last_30d_window()
+    ).scalar()
+    return stats
+
+
+def _last_30d_window():
+    return [Trip.ended_at.isnot(None), Trip.ended_at >= datetime.utcnow() - timedelta(days=30)]
+
+
+def refresh_last_30d_scores():
+    """
+    Recompute every driver's 30-day score in one UPDATE, so drivers without
+    new trips age out of the window too. Caller commits.
+    """
+    recent = db.select(db.func.avg(Trip.score)).where(
+        Trip.driver_id == DriverStats.driver_id, *_last_30d_window()
+    ).scalar_subquery()
+    return db.session.execute(db.update(DriverStats).values(last_30d_score=recent)).rowcount
+
+
+def trip_events(trip):
+    """Events recorded on the trip's bus while the trip was running, newest first."""
+    event_filter = [
+        DrivingEvent.bus_id == trip.bus_id,
+        DrivingEvent.timestamp >= trip.started_at,
+    ]
+    if trip.ended_at:
+        event_filter.append(DrivingEvent.timestamp <= trip.ended_at)
+    return DrivingEvent.query.filter(*event_filter).order_by(DrivingEvent.timestamp.desc()).all()
+
+
+def rebuild_driver_stats(driver_id=None):
+    """Recompute aggregates from trips (backfill for existing databases)."""
+    query = Driver.query if driver_id is None else Driver.query.filter_by(id=driver_id)
+    for driver in query.all():
+        existing = db.session.get(DriverStats, driver.id)
+        if existing:
+            db.session.delete(existing)
+            db.session.flush()
+        stats = get_driver_stats(driver.id)
+        trips = Trip.query.filter_by(driver_id=driver.id).order_by(Trip.started_at).all()
+        stats.trip_count = len(trips)
+        for trip in trips:
+            if trip.ended_at:
+                record_trip_completed(trip, trip_events(trip))
+    db.session.commit()
@@ -0,0 +1,181 @@
+"""
+Raspberry Pi discovery registry for the Rash Driving Detection System.
+Each Pi heartbeats every ~30 s with its address; the driver app looks the Pi
+up by bus registration. Entries expire PI_REGISTRY_TTL seconds after the last
+heartbeat, so a Pi that went offline stops being returned.
+
+Backends (PI_REGISTRY):
+- 'sql' (default): pi_devices table in the main database, one upsert per
+  heartbeat. Survives restarts and is shared by every worker.
+- 'redis': one key per Pi with a native TTL (PI_REGISTRY_URL, defaulting to
+  SOCKETIO_MESSAGE_QUEUE). Expiry costs nothing on the read path.
+- 'memory': a per-process dict, for single-process development.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from extensions import SOCKETIO_MESSAGE_QUEUE, db
+
+PI_REGISTRY = os.getenv('PI_REGISTRY', 'sql')
+PI_REGISTRY_TTL = int(os.getenv('PI_REGISTRY_TTL', 120))   # seconds (4 missed heartbeats)
+PI_REGISTRY_URL = os.getenv('PI_REGISTRY_URL', SOCKETIO_MESSAGE_QUEUE)
+_PRUNE_EVERY = 200   # heartbeats between deletes of expired rows
+
+
+class PiRegistry(ABC):
+    """Heartbeat store keyed by bus registration."""
+
+    def __init__(self, ttl):
+        self.ttl = timedelta(seconds=ttl)
+
+    @abstractmethod
+    def heartbeat(self, bus_registration, pi_ip, gps_port, demo_port, tunnel_url=None):
+        """Record a heartbeat and return the stored entry."""
+
+    @abstractmethod
+    def get(self, bus_registration):
+        """Live entry for a bus, or None."""
+
+    @abstractmethod
+    def all(self):
+        """Every live entry."""
+
+    def only(self):
+        """The single live entry when exactly one Pi is online, else None (demo fallback)."""
+        entries = self.all()
+        return entries[0] if len(entries) == 1 else None
+
+    def _cutoff(self):
+        return datetime.utcnow() - self.ttl
+
+    @staticmethod
+    def _entry(bus_registration, pi_ip, gps_port, demo_port, tunnel_url, last_seen):
+        return {
+            'pi_ip': pi_ip,
+            'gps_port': gps_port,
+            'demo_port': demo_port,
+            'tunnel_url': tunnel_url,
+            'bus_registration': bus_registration,
+            'last_seen': last_seen.isoformat(),
+        }
+
+
+class MemoryPiRegistry(PiRegistry):
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        self._entries = {}   # bus_registration -> (entry, last_seen)
+        self._writes = 0
+
+    def heartbeat(self, bus_registration, pi_ip, gps_port, demo_port, tunnel_url=None):
+        now = datetime.utcnow()
+        entry = self._entry(bus_registration, pi_ip, gps_port, demo_port, tunnel_url, now)
+        with self._lock:
+            self._entries[bus_registration] = (entry, now)
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                cutoff = self._cutoff()
+                for key in [k for k, (_, seen) in self._entries.items() if seen < cutoff]:
+                    del self._entries[key]
+        return entry
+
+    def get(self, bus_registration):
+        with self._lock:
+            item = self._entries.get(bus_registration)
+        if item is None or item[1] < self._cutoff():
+            return None
+        return item[0]
+
+    def all(self):
+        cutoff = self._cutoff()
+        with self._lock:
+            return [entry for entry, seen in self._entries.values() if seen >= cutoff]
+
+
+class SqlPiRegistry(PiRegistry):
+    """pi_devices rows; needs an app context."""
+
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._writes = 0
+
+    def heartbeat(self, bus_registration, pi_ip, gps_port, demo_port, tunnel_url=None):
+        from models import PiDevice
+        now = datetime.utcnow()
+        values = dict(pi_ip=pi_ip, gps_port=gps_port, demo_port=demo_port,
+                      tunnel_url=tunnel_url, last_seen=now)
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # One statement per heartbeat, no read first
+        db.session.execute(
+            insert(PiDevice).values(bus_registration=bus_registration, **values)
+            .on_conflict_do_update(index_elements=[PiDevice.bus_registration], set_=values)
+        )
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            PiDevice.query.filter(PiDevice.last_seen < self._cutoff()).delete(synchronize_session=False)
+        db.session.commit()
+        return self._entry(bus_registration, pi_ip, gps_port, demo_port, tunnel_url, now)
+
+    def get(self, bus_registration):
+        from models import PiDevice
+        device = db.session.get(PiDevice, bus_registration)
+        if device is None or device.last_seen < self._cutoff():
+            return None
+        return device.to_dict()
+
+    def all(self):
+        from models import PiDevice
+        devices = PiDevice.query.filter(PiDevice.last_seen >= self._cutoff()) \
+            .order_by(PiDevice.bus_registration).all()
+        return [d.to_dict() for d in devices]
+
+    def only(self):
+        from models import PiDevice
+        devices = PiDevice.query.filter(PiDevice.last_seen >= self._cutoff()).limit(2).all()
+        return devices[0].to_dict() if len(devices) == 1 else None
+
+
+class RedisPiRegistry(PiRegistry):
+    KEY_PREFIX = 'pi:'
+
+    def __init__(self, ttl, url):
+        super().__init__(ttl)
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._ttl_seconds = int(self.ttl.total_seconds())
+
+    def heartbeat(self, bus_registration, pi_ip, gps_port, demo_port, tunnel_url=None):
+        entry = self._entry(bus_registration, pi_ip, gps_port, demo_port, tunnel_url, datetime.utcnow())
+        self._redis.set(self.KEY_PREFIX + bus_registration, json.dumps(entry), ex=self._ttl_seconds)
+        return entry
+
+    def get(self, bus_registration):
+        raw = self._redis.get(self.KEY_PREFIX + bus_registration)
+        return json.loads(raw) if raw else None
+
+    def all(self):
+        keys = sorted(self._redis.scan_iter(match=self.KEY_PREFIX + '*', count=500))
+        if not keys:
+            return []
+        return [json.loads(raw) for raw in self._redis.mget(keys) if raw]
+
+
+def create_registry(kind=PI_REGISTRY):
+    if kind == 'memory':
+        return MemoryPiRegistry(PI_REGISTRY_TTL)
+    if kind == 'redis':
+        if not PI_REGISTRY_URL:
+            raise ValueError("PI_REGISTRY=redis needs PI_REGISTRY_URL or SOCKETIO_MESSAGE_QUEUE")
+        return RedisPiRegistry(PI_REGISTRY_TTL, PI_REGISTRY_URL)
+    if kind == 'sql':
+        return SqlPiRegistry(PI_REGISTRY_TTL)
+    raise ValueError(f"Unknown PI_REGISTRY '{kind}' (use sql, redis or memory)")
+
+
+pi_registry = create_registry()
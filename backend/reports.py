@@ -0,0 +1,263 @@
+"""
+Periodic fleet reports for the Rash Driving Detection System.
+Daily and weekly reports for closed periods never change, so a background
+scheduler writes them to disk (JSON summary + CSV of events) once the period
+closes and they are served as static files afterwards. Only the current open
+period is computed live.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+from extensions import db, socketio
+from models import DrivingEvent, Bus
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+REPORT_KINDS = ('day', 'week')
+REPORT_CHECK_MINUTES = float(os.getenv('REPORT_CHECK_MINUTES', 10))
+REPORT_BACKFILL_DAYS = int(os.getenv('REPORT_BACKFILL_DAYS', 28))
+CSV_CHUNK_BYTES = 64 * 1024
+
+CSV_HEADER = [
+    'ID', 'Timestamp', 'Bus Registration', 'Driver', 'Event Type',
+    'Severity', 'Acceleration X (g)', 'Acceleration Y (g)',
+    'Speed (km/h)', 'Latitude', 'Longitude', 'Location Address',
+    'Acknowledged'
+]
+
+
+def csv_row(event):
+    """One CSV export row for a DrivingEvent."""
+    return [
+        event.id,
+        event.timestamp.strftime('%Y-%m-%d %H:%M:%S') if event.timestamp else '',
+        event.bus.registration_number if event.bus else '',
+        event.bus.driver_name if event.bus else '',
+        event.event_type,
+        event.severity,
+        event.acceleration_x,
+        event.acceleration_y,
+        event.speed,
+        event.location_lat,
+        event.location_lng,
+        event.location_address or '',
+        'Yes' if event.acknowledged else 'No'
+    ]
+
+
+def other_events(start, end):
+    """
+    Events in [start, end) that are not in the live table (still waiting in
+    an ingest shard, or moved to an archive partition), newest first.
+    """
+    import archive
+    import shards
+    sources = [[e for e in shards.iter_pending(since=start, until=end) if e.timestamp < end]]
+    if archive.spans(start, end):
+        sources.append(e for e in archive.iter_events(since=start, until=end) if e.timestamp < end)
+    return archive.merge_newest_first(*sources)
+
+
+def csv_chunks(events):
+    """The CSV export of `events` (header included) as ~CSV_CHUNK_BYTES text chunks."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    for event in events:
+        writer.writerow(csv_row(event))
+        if output.tell() >= CSV_CHUNK_BYTES:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    yield output.getvalue()
+
+
+def period_events(start, end):
+    """
+    Events in [start, end), newest first, read from a chunked cursor with
+    shard-pending and archived events merged in. Needs an app context.
+    """
+    import archive
+    events = DrivingEvent.query.options(db.joinedload(DrivingEvent.bus)).filter(
+        DrivingEvent.timestamp >= start, DrivingEvent.timestamp < end
+    ).order_by(DrivingEvent.timestamp.desc()).yield_per(1000)
+    return archive.merge_newest_first(events, other_events(start, end))
+
+
+def write_events_csv(f, start, end):
+    """Write the CSV export of events in [start, end) to a text file object."""
+    for chunk in csv_chunks(period_events(start, end)):
+        f.write(chunk)
+
+
+def compute_report(start_date, end_date, period):
+    """
+    Summary of events in [start_date, end_date), aggregated in SQL.
+    Same shape as the /api/export/report response.
+    Events still waiting in an ingest shard or already archived are counted in as well.
+    """
+    in_range = [DrivingEvent.timestamp >= start_date, DrivingEvent.timestamp < end_date]
+    
+    severity_counts = {'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
+    for severity, count in db.session.query(
+        DrivingEvent.severity, db.func.count(DrivingEvent.id)
+    ).filter(*in_range).group_by(DrivingEvent.severity).all():
+        severity_counts[severity] = count
+    
+    event_type_counts = dict(db.session.query(
+        DrivingEvent.event_type, db.func.count(DrivingEvent.id)
+    ).filter(*in_range).group_by(DrivingEvent.event_type).all())
+    
+    # One group per bus, so ranking in Python is cheap and lets shard rows count
+    event_count = db.func.count(DrivingEvent.id).label('events')
+    offenders = dict(db.session.query(Bus.registration_number, event_count)
+                     .select_from(DrivingEvent).outerjoin(Bus, Bus.id == DrivingEvent.bus_id)
+                     .filter(*in_range).group_by(Bus.registration_number).all())
+    
+    for event in other_events(start_date, end_date):
+        severity_counts[event.severity] = severity_counts.get(event.severity, 0) + 1
+        event_type_counts[event.event_type] = event_type_counts.get(event.event_type, 0) + 1
+        bus = event.bus.registration_number if event.bus else None
+        offenders[bus] = offenders.get(bus, 0) + 1
+    top_offenders = sorted(offenders.items(), key=lambda item: item[1], reverse=True)[:5]
+    
+    now = datetime.utcnow()
+    return {
+        'report_period': period,
+        'start_date': start_date.isoformat(),
+        'end_date': min(end_date, now).isoformat(),
+        'summary': {
+            'total_events': sum(severity_counts.values()),
+            'by_severity': severity_counts,
+            'by_type': event_type_counts
+        },
+        'top_offenders': [
+            {'bus': bus or 'Unknown', 'events': count} for bus, count in top_offenders
+        ],
+        'generated_at': now.isoformat()
+    }
+
+
+# ==================== PERIODS ====================
+
+def period_bounds(kind, date):
+    """Start/end datetimes of the day or ISO week (Mon-Sun) containing `date`."""
+    start = datetime(date.year, date.month, date.day)
+    if kind == 'week':
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7)
+    return start, start + timedelta(days=1)
+
+
+def period_key(kind, start):
+    """'2026-01-21' for days, '2026-W04' for ISO weeks."""
+    if kind == 'week':
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime('%Y-%m-%d')
+
+
+def parse_period_key(kind, key):
+    """Inverse of period_key(); raises ValueError on malformed keys."""
+    if kind == 'week':
+        return datetime.strptime(key + '-1', '%G-W%V-%u')
+    return datetime.strptime(key, '%Y-%m-%d')
+
+
+def is_closed(kind, start):
+    return period_bounds(kind, start)[1] <= datetime.utcnow()
+
+
+# ==================== ARTEFACTS ====================
+
+def artefact_path(kind, key, ext):
+    return os.path.join(REPORTS_DIR, kind, f"{key}.{ext}")
+
+
+def write_report(kind, start):
+    """Write the JSON summary and CSV event list of a closed period."""
+    start, end = period_bounds(kind, start)
+    key = period_key(kind, start)
+    os.makedirs(os.path.join(REPORTS_DIR, kind), exist_ok=True)
+
+    report = compute_report(start, end, kind)
+    report['period_key'] = key
+
+    # Write to temp files then rename, so readers never see partial artefacts
+    json_path = artefact_path(kind, key, 'json')
+    with open(json_path + '.tmp', 'w') as f:
+        json.dump(report, f)
+
+    csv_path = artefact_path(kind, key, 'csv')
+    with open(csv_path + '.tmp', 'w', newline='') as f:
+        write_events_csv(f, start, end)
+
+    os.replace(json_path + '.tmp', json_path)
+    os.replace(csv_path + '.tmp', csv_path)
+    return report
+
+
+def ensure_report(kind, start):
+    """Return the artefact key of a closed period, generating it if missing."""
+    start = period_bounds(kind, start)[0]
+    key = period_key(kind, start)
+    if not (os.path.exists(artefact_path(kind, key, 'json')) and
+            os.path.exists(artefact_path(kind, key, 'csv'))):
+        write_report(kind, start)
+    return key
+
+
+def invalidate_reports(ts):
+    """Drop artefacts of closed periods containing ts (late uploads)."""
+    for kind in REPORT_KINDS:
+        key = period_key(kind, period_bounds(kind, ts)[0])
+        for ext in ('json', 'csv'):
+            try:
+                os.remove(artefact_path(kind, key, ext))
+            except OSError:
+                pass
+
+
+def list_reports():
+    """Available artefacts grouped by kind, newest first."""
+    index = {}
+    for kind in REPORT_KINDS:
+        folder = os.path.join(REPORTS_DIR, kind)
+        keys = sorted({name.rsplit('.', 1)[0] for name in os.listdir(folder)
+                       if name.endswith(('.json', '.csv'))}, reverse=True) if os.path.isdir(folder) else []
+        index[kind] = [{
+            'period': key,
+            'json': f"/api/export/reports/{kind}/{key}.json",
+            'csv': f"/api/export/reports/{kind}/{key}.csv",
+        } for key in keys]
+    return index
+
+
+# ==================== SCHEDULER ====================
+
+def generate_due_reports(app):
+    """Write any missing artefacts for recently closed days and weeks."""
+    today = datetime.utcnow()
+    with app.app_context():
+        for days_ago in range(1, REPORT_BACKFILL_DAYS + 1):
+            date = today - timedelta(days=days_ago)
+            for kind in REPORT_KINDS:
+                if is_closed(kind, date):
+                    ensure_report(kind, date)
+        db.session.remove()
+
+
+def _report_loop(app):
+    while True:
+        try:
+            generate_due_reports(app)
+        except Exception as e:
+            print(f"  ⚠️  Report generation failed: {e}")
+        socketio.sleep(REPORT_CHECK_MINUTES * 60)
+
+
+def start_report_scheduler(app):
+    """Generate closed-period reports in the background every REPORT_CHECK_MINUTES."""
+    socketio.start_background_task(_report_loop, app)
@@ -2,12 +2,17 @@
 Analytics routes for AI-powered insights.
 Uses google-genai to generate text insights from fleet database metrics.
 """
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
 from sqlalchemy import func
 import os
 import json
-from datetime import datetime, timedelta
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
 
+from extensions import socketio
+from cluster import register, replicated
 from models import db, DrivingEvent, Bus, Trip, Driver
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -56,85 +61,362 @@ def get_fleet_stats():
         "timestamp": datetime.utcnow().isoformat()
     }
 
-@analytics_bp.route('/api/analytics/insights', methods=['GET'])
-def generate_insights():
+MOCK_INSIGHTS = {
+    "overall_summary": "Overall fleet safety is currently **stable**. There has been a slight increase in typical rush hour anomalies, but nothing requiring immediate emergency intervention.",
+    "key_findings": [
+        "**Hotspot Identified**: 68% of all HIGH severity events (mainly Aggressive Turns) happen near the central junction. This might indicate poor road design rather than bad driving.",
+        "**Time Pattern**: Tailgating incidents spike by 40% between 5:00 PM and 7:00 PM (rush hour).",
+        "**Vehicle Specific**: Bus KL-01-AB-1234 accounts for roughly 30% of all recent harsh braking events."
+    ],
+    "recommendations": [
+        "Schedule a brief refresher on safe braking distances for the driver of KL-01-AB-1234.",
+        "Investigate the central junction area to see if bus stops or routing can be slightly adjusted to avoid the aggressive turn hotspot."
+    ]
+}
+
+
+def call_insights_model(stats):
     """
-    Fetch DB stats and pass them to Gemini API to generate insights.
-    Returns structured JSON containing markdown strings.
+    Turn fleet stats into insights via Gemini.
+    
+    Returns:
+        Tuple of (insight dict, is_mock). Without an API key the mock
+        insights stand in for the model (local dev/demo and tests).
     """
     api_key = os.getenv('GEMINI_API_KEY')
-    
-    # If no API key is provided, return mock insights for local dev/demo
     if not api_key or api_key == 'your_gemini_api_key_here':
-        return jsonify({
-            "status": "success",
-            "is_mock": True,
-            "data": {
-                "overall_summary": "Overall fleet safety is currently **stable**. There has been a slight increase in typical rush hour anomalies, but nothing requiring immediate emergency intervention.",
-                "key_findings": [
-                    "**Hotspot Identified**: 68% of all HIGH severity events (mainly Aggressive Turns) happen near the central junction. This might indicate poor road design rather than bad driving.",
-                    "**Time Pattern**: Tailgating incidents spike by 40% between 5:00 PM and 7:00 PM (rush hour).",
-                    "**Vehicle Specific**: Bus KL-01-AB-1234 accounts for roughly 30% of all recent harsh braking events."
-                ],
-                "recommendations": [
-                    "Schedule a brief refresher on safe braking distances for the driver of KL-01-AB-1234.",
-                    "Investigate the central junction area to see if bus stops or routing can be slightly adjusted to avoid the aggressive turn hotspot."
-                ]
-            }
-        })
+        return MOCK_INSIGHTS, True
+    
+    from google import genai
+    from google.genai import types
+    
+    client = genai.Client(api_key=api_key)
+    
+    prompt = f"""
+    You are an elite AI Fleet Intelligence Analyst for the 'OnboardRash' driving analytics platform. 
+    Your job is to analyze raw fleet telemetry data and provide actionable, executive-level insights.
+    
+    Use the following real-time database statistics to generate your report:
+    {json.dumps(stats, indent=2)}
+    
+    Provide the output as a valid JSON object EXACTLY matching this schema:
+    {{
+        "overall_summary": "A 2-3 sentence high-level summary of the fleet's current safety posture.",
+        "key_findings": [
+            "Finding 1 (can include markdown bolding)",
+            "Finding 2",
+            "Finding 3"
+        ],
+        "recommendations": [
+            "Actionable recommendation 1",
+            "Actionable recommendation 2"
+        ]
+    }}
+    
+    Keep it professional, data-driven, and concise. Do NOT include markdown code blocks around the JSON output, just output the raw JSON.
+    """
+    
+    response = client.models.generate_content(
+        model='gemini-2.5-flash',
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+        ),
+    )
     
     try:
-        from google import genai
-        from google.genai import types
-        
-        client = genai.Client(api_key=api_key)
-        
-        stats = get_fleet_stats()
-        
-        prompt = f"""
-        You are an elite AI Fleet Intelligence Analyst for the 'OnboardRash' driving analytics platform. 
-        Your job is to analyze raw fleet telemetry data and provide actionable, executive-level insights.
-        
-        Use the following real-time database statistics to generate your report:
-        {json.dumps(stats, indent=2)}
-        
-        Provide the output as a valid JSON object EXACTLY matching this schema:
-        {{
-            "overall_summary": "A 2-3 sentence high-level summary of the fleet's current safety posture.",
-            "key_findings": [
-                "Finding 1 (can include markdown bolding)",
-                "Finding 2",
-                "Finding 3"
-            ],
-            "recommendations": [
-                "Actionable recommendation 1",
-                "Actionable recommendation 2"
-            ]
-        }}
-        
-        Keep it professional, data-driven, and concise. Do NOT include markdown code blocks around the JSON output, just output the raw JSON.
-        """
-        
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
+        return json.loads(response.text), False
+    except json.JSONDecodeError:
+        current_app.logger.error(f"Failed to parse Gemini response as JSON: {response.text}")
+        raise ValueError("Failed to parse AI response")
+
+
+# ==================== INSIGHTS CACHE ====================
+# Insights are cached under a fingerprint of the stats that produced them.
+# A fresh entry is served directly; an entry older than INSIGHTS_REFRESH_SECONDS
+# is still served but triggers a background revalidation, which only calls the
+# model again if the stats fingerprint changed. Past INSIGHTS_TTL_SECONDS the
+# entry is dropped and requests wait for a new computation. Concurrent requests
+# share a single in-flight computation, and a computed entry is handed to the
+# other workers (cluster.py) so each one doesn't call the model on its own.
+
+INSIGHTS_REFRESH_SECONDS = float(os.getenv('INSIGHTS_REFRESH_SECONDS', 60))
+INSIGHTS_TTL_SECONDS = float(os.getenv('INSIGHTS_TTL_SECONDS', 3600))
+INSIGHTS_WAIT_SECONDS = 60
+
+_insights_lock = threading.Lock()
+_insights_entry = None     # { fingerprint, data, is_mock, generated_at, computed_at (epoch seconds) }
+_insights_flight = None    # _InsightsFlight while a computation is running
+
+
+class _InsightsStore:
+    """Holder for the current entry, shared with the other workers."""
+
+    @replicated
+    def store(self, entry):
+        global _insights_entry
+        with _insights_lock:
+            current = _insights_entry
+            if current is None or entry['computed_at'] >= current['computed_at']:
+                _insights_entry = entry
+
+
+_insights_store = register('insights', _InsightsStore())
+
+
+class _InsightsFlight:
+    """One in-flight insights computation that other requests can wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+def stats_fingerprint(stats):
+    """Stable hash of the stats, ignoring the generation timestamp."""
+    payload = {k: v for k, v in stats.items() if k != 'timestamp'}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _compute_insights(app, flight):
+    global _insights_entry, _insights_flight
+    try:
+        with app.app_context():
+            stats = get_fleet_stats()
+            fingerprint = stats_fingerprint(stats)
+            previous = _insights_entry
+            if previous and previous['fingerprint'] == fingerprint:
+                # Rollups unchanged: keep the insights, just mark them fresh
+                entry = dict(previous, computed_at=time.time())
+            else:
+                data, is_mock = call_insights_model(stats)
+                entry = {
+                    'fingerprint': fingerprint,
+                    'data': data,
+                    'is_mock': is_mock,
+                    'generated_at': datetime.utcnow().isoformat(),
+                    'computed_at': time.time(),
+                }
+        _insights_store.store(entry)
+        flight.entry = entry
+    except Exception as e:
+        flight.error = e
+    finally:
+        with _insights_lock:
+            _insights_flight = None
+        flight.done.set()
+
+
+def get_cached_insights(app):
+    """
+    Return the current insights entry, computing it at most once at a time.
+    Raises the computation's exception if no usable entry exists.
+    """
+    global _insights_flight
+    with _insights_lock:
+        entry = _insights_entry
+        age = time.time() - entry['computed_at'] if entry else None
+        if entry and age < INSIGHTS_TTL_SECONDS:
+            if age >= INSIGHTS_REFRESH_SECONDS and _insights_flight is None:
+                _insights_flight = _InsightsFlight()
+                socketio.start_background_task(_compute_insights, app, _insights_flight)
+            return entry
         
-        # Parse the JSON response
-        try:
-            insight_data = json.loads(response.text)
-            return jsonify({
-                "status": "success",
-                "is_mock": False,
-                "data": insight_data
-            })
-        except json.JSONDecodeError:
-            current_app.logger.error(f"Failed to parse Gemini response as JSON: {response.text}")
-            return jsonify({"error": "Failed to parse AI response"}), 500
-            
+        flight = _insights_flight
+        leader = flight is None
+        if leader:
+            flight = _insights_flight = _InsightsFlight()
+    
+    if leader:
+        _compute_insights(app, flight)
+    elif not flight.done.wait(INSIGHTS_WAIT_SECONDS):
+        raise TimeoutError('Timed out waiting for insights computation')
+    
+    if flight.error:
+        raise flight.error
+    return flight.entry
+
+
+@analytics_bp.route('/api/analytics/insights', methods=['GET'])
+def generate_insights():
+    """
+    Fetch DB stats and pass them to Gemini API to generate insights.
+    Returns structured JSON containing markdown strings.
+    Results are cached per stats fingerprint (see INSIGHTS CACHE above).
+    """
+    try:
+        entry = get_cached_insights(current_app._get_current_object())
     except Exception as e:
         current_app.logger.error(f"Error communicating with Gemini API: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "status": "success",
+        "is_mock": entry['is_mock'],
+        "data": entry['data'],
+        "generated_at": entry['generated_at'],
+        "fingerprint": entry['fingerprint']
+    })
+
+
+# ==================== TIME SERIES ====================
+# Closed (past) buckets never change except through late uploads from a Pi's
+# offline queue or a purge, both of which invalidate the affected entries in
+# every worker. Only the current open bucket is recomputed on every request.
+
+TIMESERIES_BUCKETS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+TIMESERIES_DEFAULT_SPAN = {'hour': timedelta(days=7), 'day': timedelta(days=90)}
+TIMESERIES_MAX_BUCKETS = 5000
+
+def floor_bucket(ts, bucket):
+    """Truncate a datetime to the start of its hour/day bucket."""
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if bucket == 'day' else ts
+
+
+class TimeseriesCache:
+    """Counts of closed buckets: (bucket, group_by, bucket_start) -> {group: count}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_many(self, bucket, group_by, starts):
+        """Cached counts for the given bucket starts ({start: counts}, misses left out)."""
+        with self._lock:
+            return {b: self._entries[(bucket, group_by, b)] for b in starts
+                    if (bucket, group_by, b) in self._entries}
+
+    def put_many(self, bucket, group_by, counts):
+        with self._lock:
+            for b, value in counts.items():
+                self._entries[(bucket, group_by, b)] = value
+
+    @replicated
+    def invalidate(self, ts=None):
+        """Drop the buckets containing ts (everything when ts is None)."""
+        with self._lock:
+            if ts is None:
+                self._entries.clear()
+                return
+            for bucket in TIMESERIES_BUCKETS:
+                start = floor_bucket(ts, bucket)
+                for key in [k for k in self._entries if k[0] == bucket and k[2] == start]:
+                    del self._entries[key]
+
+
+timeseries_cache = register('timeseries', TimeseriesCache())
+
+
+def invalidate_timeseries(ts=None):
+    """
+    Drop cached buckets containing ts (or everything when ts is None), in
+    every worker. Called when an event lands in an already-closed bucket or
+    events are purged or archived.
+    """
+    timeseries_cache.invalidate(ts)
+
+
+def _bucket_expression(bucket):
+    """SQL expression truncating DrivingEvent.timestamp to the bucket."""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(bucket, DrivingEvent.timestamp)
+    fmt = '%Y-%m-%d %H:00:00' if bucket == 'hour' else '%Y-%m-%d 00:00:00'
+    return func.strftime(fmt, DrivingEvent.timestamp)
+
+
+def _query_buckets(bucket, group_by, start, end):
+    """
+    Count events per (bucket, group) in [start, end) with one GROUP BY.
+    Returns { bucket_start: {group: count} }.
+    """
+    bucket_col = _bucket_expression(bucket).label('bucket')
+    if group_by == 'bus':
+        group_col = Bus.registration_number
+        query = db.session.query(bucket_col, group_col, func.count(DrivingEvent.id)) \
+            .join(Bus, Bus.id == DrivingEvent.bus_id)
+    else:
+        group_col = DrivingEvent.event_type if group_by == 'type' else DrivingEvent.severity
+        query = db.session.query(bucket_col, group_col, func.count(DrivingEvent.id))
+    
+    rows = query.filter(
+        DrivingEvent.timestamp >= start,
+        DrivingEvent.timestamp < end
+    ).group_by(bucket_col, group_col).all()
+    
+    result = {}
+    for bucket_value, group, count in rows:
+        if isinstance(bucket_value, str):
+            bucket_value = datetime.strptime(bucket_value, '%Y-%m-%d %H:%M:%S')
+        result.setdefault(bucket_value.replace(tzinfo=None), {})[group or 'UNKNOWN'] = count
+    return result
+
+
+def _parse_time_arg(value):
+    ts = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+@analytics_bp.route('/api/analytics/timeseries', methods=['GET'])
+def get_timeseries():
+    """
+    Event counts per time bucket, split by a grouping dimension.
+    
+    Query params:
+    - bucket: 'hour' or 'day' (default 'hour')
+    - group_by: 'type', 'severity' or 'bus' (default 'type')
+    - from: Start timestamp (ISO, default 7 days / 90 days ago)
+    - to: End timestamp (ISO, default now)
+    
+    Empty buckets are filled with zeros so every series has one value per bucket.
+    """
+    bucket = request.args.get('bucket', 'hour')
+    group_by = request.args.get('group_by', 'type')
+    if bucket not in TIMESERIES_BUCKETS:
+        return jsonify({'error': 'bucket must be hour or day'}), 400
+    if group_by not in ('type', 'severity', 'bus'):
+        return jsonify({'error': 'group_by must be type, severity or bus'}), 400
+    
+    now = datetime.utcnow()
+    try:
+        end = _parse_time_arg(request.args['to']) if request.args.get('to') else now
+        start = _parse_time_arg(request.args['from']) if request.args.get('from') \
+            else end - TIMESERIES_DEFAULT_SPAN[bucket]
+    except ValueError:
+        return jsonify({'error': 'from/to must be ISO timestamps'}), 400
+    if start > end:
+        return jsonify({'error': 'from must be before to'}), 400
+    
+    step = TIMESERIES_BUCKETS[bucket]
+    first = floor_bucket(start, bucket)
+    open_bucket = floor_bucket(now, bucket)
+    bucket_starts = []
+    cursor = first
+    while cursor <= end:
+        bucket_starts.append(cursor)
+        cursor += step
+        if len(bucket_starts) > TIMESERIES_MAX_BUCKETS:
+            return jsonify({'error': f'Range exceeds {TIMESERIES_MAX_BUCKETS} buckets'}), 400
+    
+    counts = timeseries_cache.get_many(bucket, group_by, [b for b in bucket_starts if b < open_bucket])
+    missing = [b for b in bucket_starts if b not in counts]
+    
+    if missing:
+        # One query spanning the uncached buckets; closed ones are cached until invalidated
+        fetched = _query_buckets(bucket, group_by, missing[0], missing[-1] + step)
+        for b in missing:
+            counts[b] = fetched.get(b, {})
+        timeseries_cache.put_many(bucket, group_by, {b: counts[b] for b in missing if b < open_bucket})
+    
+    groups = sorted({g for c in counts.values() for g in c})
+    return jsonify({
+        'bucket': bucket,
+        'group_by': group_by,
+        'from': first.isoformat(),
+        'to': end.isoformat(),
+        'buckets': [b.isoformat() for b in bucket_starts],
+        'series': {g: [counts[b].get(g, 0) for b in bucket_starts] for g in groups},
+        'totals': [sum(counts[b].values()) for b in bucket_starts],
+    })
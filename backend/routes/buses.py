@@ -5,6 +5,14 @@ Handles bus registration and location tracking.
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from models import db, Bus, BusLocation, DrivingEvent
+from live_positions import position_grid, publish_bus_update
+import geo
+import archive
+import shards
+from itertools import islice
+from event_payloads import event_payloads, events_response
+import telemetry
+import metrics
 
 buses_bp = Blueprint('buses', __name__)
 
@@ -75,6 +83,14 @@ def get_bus(bus_id):
     return jsonify(result)
 
 
+def _unique_ids(events):
+    seen = set()
+    for event in events:
+        if event.id not in seen:
+            seen.add(event.id)
+            yield event
+
+
 @buses_bp.route('/api/buses/<int:bus_id>/events', methods=['GET'])
 def get_bus_events(bus_id):
     """Get all events for a specific bus."""
@@ -84,15 +100,23 @@ def get_bus_events(bus_id):
     limit = min(int(request.args.get('limit', 50)), 200)
     offset = int(request.args.get('offset', 0))
     
-    events = DrivingEvent.query.filter_by(bus_id=bus_id)\
-        .order_by(DrivingEvent.timestamp.desc())\
-        .limit(limit).offset(offset).all()
-    
-    return jsonify({
-        'bus': bus.to_dict(),
-        'count': len(events),
-        'events': [e.to_dict() for e in events]
-    })
+    pending = list(shards.iter_pending(bus_id=bus_id, limit=offset + limit))
+    if pending or archive.spans(bus_id=bus_id):
+        # Page through the live table, its shard and the archived months together
+        live = DrivingEvent.query.filter_by(bus_id=bus_id) \
+            .order_by(DrivingEvent.timestamp.desc()).limit(offset + limit).all()
+        archived = archive.iter_events(bus_id=bus_id, limit=offset + limit)
+        merged = archive.merge_newest_first(pending, live, archived)
+        events = list(islice(_unique_ids(merged), offset, offset + limit))
+        fragments = [event_payloads.fragment(e.to_dict()) for e in events]
+    else:
+        ids = [row.id for row in db.session.query(DrivingEvent.id).filter_by(bus_id=bus_id)
+               .order_by(DrivingEvent.timestamp.desc())
+               .limit(limit).offset(offset)]
+        fragments = event_payloads.render_ids(ids, lambda missing: DrivingEvent.query.options(
+            db.joinedload(DrivingEvent.bus)).filter(DrivingEvent.id.in_(missing)).all())
+    
+    return events_response({'bus': bus.to_dict(), 'count': len(fragments)}, fragments)
 
 
 @buses_bp.route('/api/buses/locations', methods=['GET'])
@@ -100,17 +124,24 @@ def get_all_locations():
     """
     Get current locations of all active buses.
     Used for the live map display.
+    
+    Query params:
+    - bbox: Only buses inside south,west,north,east (optional)
+    
+    Served from the in-memory position grid (see live_positions.py).
     """
-    # Get locations updated in last 10 minutes (considered active)
-    ten_min_ago = datetime.utcnow() - timedelta(minutes=10)
+    try:
+        bbox = geo.parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    locations = BusLocation.query.filter(
-        BusLocation.updated_at >= ten_min_ago
-    ).all()
+    # Locations updated in last 10 minutes are considered active
+    position_grid.load()
+    locations = position_grid.query(bbox)
     
     return jsonify({
         'count': len(locations),
-        'locations': [loc.to_dict() for loc in locations]
+        'locations': locations
     })
 
 
@@ -135,19 +166,68 @@ def update_location(bus_id):
     
     if not data or data.get('lat') is None or data.get('lng') is None:
         return jsonify({'error': 'lat and lng are required'}), 400
-    
-    location = update_bus_location(
-        bus_id=bus_id,
-        lat=data['lat'],
-        lng=data['lng'],
-        speed=data.get('speed'),
-        heading=data.get('heading')
-    )
-    
-    db.session.commit()
-    
-    # Broadcast update directly using socketio
-    from extensions import socketio
-    socketio.emit('bus_update', location.to_dict())
-    
-    return jsonify({'status': 'updated', 'location': location.to_dict()})
+    try:
+        lat, lng = float(data['lat']), float(data['lng'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'lat and lng must be numbers'}), 400
+    
+    if shards.enabled:
+        # Written to the bus's shard; the merger copies it into bus_locations
+        updated_at = datetime.utcnow()
+        shards.store_location({
+            'bus_id': bus_id,
+            'latitude': lat,
+            'longitude': lng,
+            'speed': data.get('speed'),
+            'heading': data.get('heading'),
+            'updated_at': updated_at
+        })
+        payload = {
+            'bus_id': bus_id,
+            'bus_registration': bus.registration_number,
+            'driver_name': bus.driver_name,
+            'latitude': lat,
+            'longitude': lng,
+            'speed': data.get('speed'),
+            'heading': data.get('heading'),
+            'updated_at': updated_at.isoformat()
+        }
+    else:
+        location = update_bus_location(
+            bus_id=bus_id,
+            lat=lat,
+            lng=lng,
+            speed=data.get('speed'),
+            heading=data.get('heading')
+        )
+        db.session.commit()
+        payload = location.to_dict()
+    
+    # Goes out in the next batched bus_updates frame to subscribed clients
+    position_grid.load()
+    publish_bus_update(payload)
+    metrics.locations_ingested.inc()
+    
+    return jsonify({'status': 'updated', 'location': payload})
+
+
+@buses_bp.route('/api/buses/<int:bus_id>/telemetry', methods=['POST'])
+def relay_telemetry(bus_id):
+    """
+    Relay one batch of live 10 Hz telemetry to the bus's Socket.IO watchers.
+    Sent by the Pi about once a second, and only while watched; nothing is
+    stored unless a watcher asked to record. No database access.
+
+    Expected JSON:
+    {
+        "fields": ["ax", "ay", "az", "speed"],
+        "samples": [[1718000000100, 0.02, -0.31, 0.98, 42.5], ...]   # [t_ms, ...fields]
+    }
+    An empty `samples` list just asks whether anyone is watching.
+    Returns {"watched": bool}.
+    """
+    try:
+        samples = telemetry.parse_samples(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'watched': telemetry.relay(bus_id, samples)})
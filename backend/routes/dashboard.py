@@ -0,0 +1,125 @@
+"""
+Dashboard bootstrap route for the Rash Driving Detection System.
+Bundles everything the dashboard needs for first paint into one response.
+"""
+import threading
+import time
+from flask import Blueprint, request, jsonify
+from cluster import register, replicated
+from models import db, Bus, DrivingEvent
+from live_positions import position_grid
+from routes.events import compute_stats, filtered_events_query, query_hot_events, query_other_stores
+import shards
+from routes.simulation import simulator_status
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+# Concurrent dashboards loading within this window share one computation
+SNAPSHOT_TTL_SECONDS = 2.0
+SNAPSHOT_WAIT_SECONDS = 30
+
+
+class _SnapshotFlight:
+    """One in-flight snapshot build that other requests for the same limit wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.snapshot = None
+        self.error = None
+
+
+class SnapshotCache:
+    """
+    Recent snapshots by events_limit, built at most once at a time per limit.
+    The lock only guards the lookup, so builds for different limits run side
+    by side. Cleared in every worker when events are purged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # { events_limit: (computed_at, snapshot dict) }
+        self._flights = {}      # { events_limit: _SnapshotFlight }
+        self._generation = 0    # bumped by clear(), so builds started before it aren't cached
+
+    def get_or_build(self, events_limit):
+        with self._lock:
+            cached = self._entries.get(events_limit)
+            if cached and time.monotonic() - cached[0] < SNAPSHOT_TTL_SECONDS:
+                return cached[1]
+            flight = self._flights.get(events_limit)
+            leader = flight is None
+            if leader:
+                flight = self._flights[events_limit] = _SnapshotFlight()
+                generation = self._generation
+        
+        if not leader:
+            if not flight.done.wait(SNAPSHOT_WAIT_SECONDS):
+                raise TimeoutError('Timed out waiting for dashboard snapshot')
+            if flight.error:
+                raise flight.error
+            return flight.snapshot
+        
+        try:
+            flight.snapshot = build_snapshot(events_limit)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[events_limit]
+                if flight.error is None and generation == self._generation:
+                    self._entries[events_limit] = (time.monotonic(), flight.snapshot)
+            flight.done.set()
+        return flight.snapshot
+
+    @replicated
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+snapshot_cache = register('dashboard_snapshots', SnapshotCache())
+
+
+def build_snapshot(events_limit):
+    """Gather stats, buses, live locations, recent events and simulator state."""
+    events = query_hot_events({}, events_limit)
+    if events is None:
+        events = query_other_stores({}, events_limit)
+    if events is None:
+        events = [e.to_dict() for e in filtered_events_query({}).options(db.joinedload(DrivingEvent.bus))
+                  .order_by(DrivingEvent.timestamp.desc()).limit(events_limit).all()]
+    buses = Bus.query.filter_by(is_active=True).all()
+    position_grid.load()
+    locations = position_grid.query()
+    # Events still waiting in an ingest shard count too, or clients resync from an old cursor
+    latest_event_id = max(db.session.query(db.func.max(DrivingEvent.id)).scalar() or 0,
+                          shards.max_pending_id() or 0)
+    generated_at = time.time()
+    
+    return {
+        # Pass as /api/events?after_id=<events> for incremental updates
+        'version': f"{latest_event_id}:{int(generated_at * 1000)}",
+        'latest_event_id': latest_event_id,
+        'stats': compute_stats(),
+        'buses': {'count': len(buses), 'buses': [b.to_dict() for b in buses]},
+        'locations': {'count': len(locations), 'locations': locations},
+        'events': {'count': len(events), 'events': events},
+        'simulation': simulator_status(),
+    }
+
+
+@dashboard_bp.route('/api/dashboard/snapshot', methods=['GET'])
+def get_snapshot():
+    """
+    One-call dashboard bootstrap.
+    
+    Replaces separate calls to /api/stats, /api/buses, /api/buses/locations,
+    /api/events and /api/simulation/status.
+    
+    Query params:
+    - events_limit: Number of recent events to include (default 20, max 100)
+    """
+    events_limit = min(int(request.args.get('events_limit', 20)), 100)
+    
+    return jsonify(snapshot_cache.get_or_build(events_limit))
@@ -9,6 +9,7 @@ Endpoints:
   POST /api/drivers/me/trip/start — Start a trip
   POST /api/drivers/me/trip/stop  — End current trip
   GET  /api/drivers/me/trips   — Trip history
+  GET  /api/drivers/leaderboard — Drivers ranked by score
 """
 
 from flask import Blueprint, request, jsonify
@@ -17,7 +18,11 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 
 from extensions import db
-from models import Driver, Trip, Bus, DrivingEvent
+from models import (
+    Driver, Trip, Bus, DrivingEvent, DriverStats,
+    get_driver_stats, record_trip_completed, rebuild_driver_stats, trip_events, with_event_counts
+)
+from event_payloads import event_payloads, events_response
 
 drivers_bp = Blueprint('drivers', __name__, url_prefix='/api/drivers')
 
@@ -144,20 +149,22 @@ def get_profile():
         ended_at=None
     ).first()
     
-    # Overall stats
-    total_trips = Trip.query.filter_by(driver_id=driver.id).count()
-    completed_trips = Trip.query.filter(
-        Trip.driver_id == driver.id,
-        Trip.ended_at.isnot(None)
-    ).all()
-    avg_score = sum(t.score for t in completed_trips) / len(completed_trips) if completed_trips else 100.0
+    # Overall stats (materialized in driver_stats)
+    stats = db.session.get(DriverStats, driver.id)
+    if stats is None:
+        rebuild_driver_stats(driver.id)
+        stats = db.session.get(DriverStats, driver.id)
+    avg_score = stats.avg_score if stats.avg_score is not None else 100.0
     
     return jsonify({
         'driver': driver.to_dict(),
         'active_trip': active_trip.to_dict() if active_trip else None,
         'stats': {
-            'total_trips': total_trips,
+            'total_trips': stats.trip_count,
             'avg_score': round(avg_score, 1),
+            'best_score': round(stats.best_score, 1) if stats.best_score is not None else None,
+            'last_30d_score': round(stats.last_30d_score, 1) if stats.last_30d_score is not None else None,
+            'events_by_type': stats.events_by_type or {},
         }
     })
 
@@ -193,10 +200,7 @@ def get_my_events():
         else:
             events = []
     
-    return jsonify({
-        'events': [e.to_dict() for e in events],
-        'count': len(events),
-    })
+    return events_response({'count': len(events)}, event_payloads.render(events))
 
 
 # ==================== TRIP MANAGEMENT ====================
@@ -245,6 +249,7 @@ def start_trip():
     )
     
     db.session.add(trip)
+    get_driver_stats(driver.id).trip_count += 1
     db.session.commit()
     
     return jsonify({
@@ -272,11 +277,7 @@ def stop_trip():
     active_trip.ended_at = datetime.utcnow()
     
     # Calculate score: start at 100, subtract per event severity
-    events = DrivingEvent.query.filter(
-        DrivingEvent.bus_id == active_trip.bus_id,
-        DrivingEvent.timestamp >= active_trip.started_at,
-        DrivingEvent.timestamp <= active_trip.ended_at,
-    ).all()
+    events = trip_events(active_trip)
     
     score = 100.0
     for event in events:
@@ -285,6 +286,11 @@ def stop_trip():
     
     active_trip.score = max(0.0, score)  # Floor at 0
     
+    if db.session.get(DriverStats, driver.id) is None:
+        db.session.flush()
+        rebuild_driver_stats(driver.id)
+    else:
+        record_trip_completed(active_trip, events)
     db.session.commit()
     
     return jsonify({
@@ -302,12 +308,12 @@ def get_trips():
     if not driver:
         return jsonify({'error': 'Driver not authenticated'}), 401
     
-    trips = Trip.query.filter_by(
+    trips = with_event_counts(Trip.query.filter_by(
         driver_id=driver.id
-    ).order_by(Trip.started_at.desc()).limit(50).all()
+    ).order_by(Trip.started_at.desc()).limit(50))
     
     return jsonify({
-        'trips': [t.to_dict() for t in trips],
+        'trips': [t.to_dict(event_count=count) for t, count in trips],
         'count': len(trips),
     })
 
@@ -324,21 +330,9 @@ def get_trip_detail(trip_id):
         return jsonify({'error': 'Trip not found'}), 404
 
     # Fetch events that happened during this trip
-    event_filter = [
-        DrivingEvent.bus_id == trip.bus_id,
-        DrivingEvent.timestamp >= trip.started_at,
-    ]
-    if trip.ended_at:
-        event_filter.append(DrivingEvent.timestamp <= trip.ended_at)
+    events = trip_events(trip)
 
-    events = DrivingEvent.query.filter(
-        *event_filter
-    ).order_by(DrivingEvent.timestamp.desc()).all()
-
-    return jsonify({
-        'trip': trip.to_dict(),
-        'events': [e.to_dict() for e in events],
-    })
+    return events_response({'trip': trip.to_dict(event_count=len(events))}, event_payloads.render(events))
 
 
 # ==================== BUSES LIST (for app dropdown) ====================
@@ -357,12 +351,64 @@ def list_buses():
 @drivers_bp.route('', methods=['GET'])
 def list_drivers():
     """List all registered drivers — for the fleet management dashboard."""
-    drivers = Driver.query.order_by(Driver.created_at.desc()).all()
+    rows = db.session.query(Driver, DriverStats.trip_count) \
+        .outerjoin(DriverStats, DriverStats.driver_id == Driver.id) \
+        .order_by(Driver.created_at.desc()).all()
+    active_ids = {driver_id for (driver_id,) in
+                  db.session.query(Trip.driver_id).filter(Trip.ended_at.is_(None)).all()}
     result = []
-    for d in drivers:
+    for d, trip_count in rows:
         data = d.to_dict()
-        data['trip_count'] = Trip.query.filter_by(driver_id=d.id).count()
-        active = Trip.query.filter_by(driver_id=d.id, ended_at=None).first()
-        data['is_active'] = active is not None
+        data['trip_count'] = trip_count or 0
+        data['is_active'] = d.id in active_ids
         result.append(data)
     return jsonify({'drivers': result, 'count': len(result)})
+
+
+# ==================== LEADERBOARD ====================
+
+LEADERBOARD_SORTS = {
+    'avg_score': DriverStats.avg_score,
+    'best_score': DriverStats.best_score,
+    'last_30d_score': DriverStats.last_30d_score,
+}
+
+
+@drivers_bp.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    """
+    Drivers ranked by materialized score aggregates.
+    
+    Query params:
+    - sort: avg_score (default), best_score or last_30d_score
+    - page: 1-based page number (default 1)
+    - per_page: Page size (default 20, max 100)
+    """
+    sort = request.args.get('sort', 'avg_score')
+    if sort not in LEADERBOARD_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(LEADERBOARD_SORTS)}"}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    
+    column = LEADERBOARD_SORTS[sort]
+    query = DriverStats.query.options(db.joinedload(DriverStats.driver)).filter(column.isnot(None))
+    total = query.count()
+    rows = query.order_by(column.desc(), DriverStats.driver_id) \
+        .offset((page - 1) * per_page).limit(per_page).all()
+    
+    entries = []
+    for rank, stats in enumerate(rows, start=(page - 1) * per_page + 1):
+        entry = stats.to_dict()
+        entry['rank'] = rank
+        entries.append(entry)
+    
+    return jsonify({
+        'sort': sort,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'drivers': entries,
+    })
@@ -4,10 +4,16 @@ Handles receiving events from IoT devices and serving data to dashboard.
 """
 import os
 import base64
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 from models import db, DrivingEvent, Bus, BusLocation
-from extensions import socketio
+import geo
+from live_positions import ALL_BUSES_ROOM, emit_alert, emit_to_rooms, position_grid
+from hot_events import hot_events, naive_utc
+from event_payloads import event_payloads, events_response
+from reports import invalidate_reports
+import shards
+import metrics
 
 events_bp = Blueprint('events', __name__)
 
@@ -24,7 +30,10 @@ def _save_inline_snapshot(event, b64_data):
         with open(filepath, 'wb') as f:
             f.write(image_data)
         event.snapshot_url = f"/api/media/{filename}"
-        db.session.commit()
+        if shards.enabled:
+            shards.update_event(event.id, snapshot_url=event.snapshot_url)
+        else:
+            db.session.commit()
     except Exception as e:
         print(f"  ⚠️  Inline snapshot save failed: {e}")
 
@@ -64,9 +73,32 @@ def receive_event():
     if data.get('snapshot_base64'):
         _save_inline_snapshot(event, data['snapshot_base64'])
     
+    # Keep the live position index in step with update_bus_location()
+    if event.location_lat and event.location_lng:
+        position_grid.update({
+            'bus_id': event.bus_id,
+            'bus_registration': event.bus.registration_number if event.bus else None,
+            'driver_name': event.bus.driver_name if event.bus else None,
+            'latitude': event.location_lat,
+            'longitude': event.location_lng,
+            'speed': data.get('speed'),
+            'heading': None,
+            'updated_at': datetime.utcnow().isoformat()
+        })
+    
+    # Late uploads (e.g. a Pi's offline queue) land in already-closed buckets
+    from routes.analytics import floor_bucket, invalidate_timeseries
+    if event.timestamp and event.timestamp < floor_bucket(datetime.utcnow(), 'hour'):
+        invalidate_timeseries(event.timestamp)
+        if event.timestamp < floor_bucket(datetime.utcnow(), 'day'):
+            invalidate_reports(event.timestamp)
+    
     event_dict = event.to_dict()
-    # Broadcast to dashboard
-    socketio.emit('new_alert', event_dict)
+    hot_events.add(event_dict)
+    event_payloads.put(event_dict)
+    metrics.count_event(event.event_type)
+    # Broadcast to dashboards and the bus's route/driver rooms
+    emit_alert(event_dict, event.bus)
     
     # Return event data for SocketIO broadcast confirmation
     return jsonify({
@@ -76,67 +108,478 @@ def receive_event():
     }), 201
 
 
-@events_bp.route('/api/events', methods=['GET'])
-def get_events():
+# Sparse fieldsets: public field name -> (labelled columns, value builder).
+# Only the columns behind the requested fields are selected from the database.
+EVENT_FIELDS = {
+    'id': ([DrivingEvent.id], None),
+    'bus_id': ([DrivingEvent.bus_id], None),
+    'bus_registration': ([Bus.registration_number.label('bus_registration')], None),
+    'event_type': ([DrivingEvent.event_type], None),
+    'severity': ([DrivingEvent.severity], None),
+    'acceleration_x': ([DrivingEvent.acceleration_x], None),
+    'acceleration_y': ([DrivingEvent.acceleration_y], None),
+    'acceleration_z': ([DrivingEvent.acceleration_z], None),
+    'speed': ([DrivingEvent.speed], None),
+    'location_lat': ([DrivingEvent.location_lat], None),
+    'location_lng': ([DrivingEvent.location_lng], None),
+    'location_address': ([DrivingEvent.location_address], None),
+    'location': (
+        [DrivingEvent.location_lat, DrivingEvent.location_lng, DrivingEvent.location_address],
+        lambda r: {'lat': r.location_lat, 'lng': r.location_lng, 'address': r.location_address}
+    ),
+    'timestamp': ([DrivingEvent.timestamp], lambda r: r.timestamp.isoformat() if r.timestamp else None),
+    'alert_sent': ([DrivingEvent.alert_sent], None),
+    'acknowledged': ([DrivingEvent.acknowledged], None),
+    'has_video': (
+        [DrivingEvent.video_url, DrivingEvent.video_path],
+        lambda r: bool(r.video_url or r.video_path)
+    ),
+    'has_snapshot': (
+        [DrivingEvent.snapshot_url, DrivingEvent.snapshot_path],
+        lambda r: bool(r.snapshot_url or r.snapshot_path)
+    ),
+    'snapshot_url': ([DrivingEvent.snapshot_url], None),
+    'video_url': ([DrivingEvent.video_url], None),
+}
+
+
+def parse_fields(raw):
     """
-    Get list of driving events with optional filters.
+    Parse a comma-separated ?fields= value.
+
+    Returns:
+        Tuple of (list of field names or None, error message or None)
+    """
+    if not raw:
+        return None, None
+    fields = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in EVENT_FIELDS:
+            return None, f'Unknown field: {name}'
+        fields.append(name)
+    return fields or None, None
+
+
+def select_event_fields(query, fields):
+    """
+    Restrict an event query to the columns needed for the given fields.
+
+    Returns a list of (field name, builder) pairs and the rewritten query.
+    """
+    columns = {}
+    for name in fields:
+        for column in EVENT_FIELDS[name][0]:
+            columns.setdefault(column.key, column)
+    if 'bus_registration' in fields:
+        query = query.outerjoin(Bus, Bus.id == DrivingEvent.bus_id)
+    builders = [(name, EVENT_FIELDS[name][1] or (lambda r, key=name: getattr(r, key)))
+                for name in fields]
+    return builders, query.with_entities(*columns.values())
+
+
+def serialize_event_rows(rows, builders, columnar=False):
+    """Serialize selected rows either as objects or as parallel arrays per field."""
+    if columnar:
+        return {name: [build(r) for r in rows] for name, build in builders}
+    return [{name: build(r) for name, build in builders} for r in rows]
+
+
+def _hot_value(event, name):
+    if name.startswith('location_'):
+        return event['location'][name[len('location_'):]]
+    return event[name]
+
+
+def project_event_dicts(events, fields, columnar=False):
+    """Sparse/columnar projection of already-serialized events (hot index path)."""
+    if columnar:
+        return {name: [_hot_value(e, name) for e in events] for name in fields}
+    return [{name: _hot_value(e, name) for name in fields} for e in events]
+
+
+def query_hot_events(args, limit):
+    """
+    Answer a /api/events query from the in-memory hot window.
+    Returns None when the window cannot answer it exactly and SQL must be used.
+    """
+    if not hot_events.enabled or args.get('after_id'):
+        return None
+    hot_events.load()
     
-    Query params:
-    - bus_id: Filter by bus ID
-    - event_type: Filter by event type (HARSH_BRAKE, HARSH_ACCEL, etc.)
-    - severity: Filter by severity (LOW, MEDIUM, HIGH)
-    - since: Get events after this timestamp (ISO format)
-    - limit: Max number of events (default 100)
+    since = None
+    if args.get('since'):
+        try:
+            since = naive_utc(datetime.fromisoformat(args.get('since').replace('Z', '+00:00')))
+        except ValueError:
+            return None  # SQL path ignores an unparseable since
+    elif not args.get('bus_id'):
+        since = datetime.utcnow() - timedelta(days=1)
+    
+    if since is not None and not hot_events.covers(since):
+        return None
+    
+    events = hot_events.query(
+        since=since if since is not None else hot_events.window_start,
+        limit=limit,
+        bus_id=args.get('bus_id') or None,
+        event_type=args.get('event_type') or None,
+        severity=args.get('severity') or None,
+    )
+    # bus_id without since is an all-time query: only exact if the window filled the page
+    if since is None and len(events) < limit:
+        return None
+    return events
+
+
+def query_other_stores(args, limit):
+    """
+    Answer a /api/events query that also needs rows outside the live table:
+    archived months its range reaches, or events still waiting in an ingest
+    shard. Sources are merged newest first. Returns None when neither is
+    involved (the common case) and the plain SQL path should be used.
+    """
+    import archive
+    
+    since = None
+    if args.get('since'):
+        try:
+            since = naive_utc(datetime.fromisoformat(args.get('since').replace('Z', '+00:00')))
+        except ValueError:
+            pass
+    elif not any([args.get('bus_id'), args.get('after_id')]):
+        since = datetime.utcnow() - timedelta(days=1)
+    
+    try:
+        after_id = int(args.get('after_id')) if args.get('after_id') else None
+    except ValueError:
+        after_id = None
+    
+    filters = dict(
+        since=since,
+        bus_id=args.get('bus_id') or None,
+        event_type=args.get('event_type') or None,
+        severity=args.get('severity') or None,
+        after_id=after_id,
+        limit=limit,
+    )
+    sources = []
+    if shards.has_pending():
+        # Read shards before the live table: a row merged in between shows up twice, never zero times
+        sources.append(list(shards.iter_pending(**filters)))
+    if archive.spans(since):
+        sources.append(archive.iter_events(**filters))
+    if not sources:
+        return None
+    
+    live = filtered_events_query(args).options(db.joinedload(DrivingEvent.bus)) \
+        .order_by(DrivingEvent.timestamp.desc()).limit(limit).all()
+    events, seen = [], set()
+    for event in archive.merge_newest_first(live, *sources):
+        if event.id in seen:
+            continue  # mid-merge or interrupted archive run: same row in two stores
+        seen.add(event.id)
+        events.append(event.to_dict())
+        if len(events) >= limit:
+            break
+    return events
+
+
+def filtered_events_query(args):
+    """
+    Build the event query for the /api/events filter parameters.
+    Shared between list, bulk and aggregate endpoints.
     """
     query = DrivingEvent.query
     
     # Apply filters
-    if request.args.get('bus_id'):
-        query = query.filter_by(bus_id=request.args.get('bus_id'))
+    if args.get('bus_id'):
+        query = query.filter_by(bus_id=args.get('bus_id'))
     
-    if request.args.get('event_type'):
-        query = query.filter_by(event_type=request.args.get('event_type'))
+    if args.get('event_type'):
+        query = query.filter_by(event_type=args.get('event_type'))
     
-    if request.args.get('severity'):
-        query = query.filter_by(severity=request.args.get('severity'))
+    if args.get('severity'):
+        query = query.filter_by(severity=args.get('severity'))
     
-    if request.args.get('since'):
+    if args.get('since'):
         try:
-            since = datetime.fromisoformat(request.args.get('since').replace('Z', '+00:00'))
+            since = datetime.fromisoformat(args.get('since').replace('Z', '+00:00'))
             query = query.filter(DrivingEvent.timestamp >= since)
         except:
             pass
     
+    if args.get('after_id'):
+        try:
+            query = query.filter(DrivingEvent.id > int(args.get('after_id')))
+        except ValueError:
+            pass
+    
     # Default: last 24 hours if no filter
-    if not any([request.args.get('bus_id'), request.args.get('since')]):
+    if not any([args.get('bus_id'), args.get('since'), args.get('after_id')]):
         yesterday = datetime.utcnow() - timedelta(days=1)
         query = query.filter(DrivingEvent.timestamp >= yesterday)
     
-    # Order and limit
+    return query
+
+
+@events_bp.route('/api/events', methods=['GET'])
+def get_events():
+    """
+    Get list of driving events with optional filters.
+    
+    Query params:
+    - bus_id: Filter by bus ID
+    - event_type: Filter by event type (HARSH_BRAKE, HARSH_ACCEL, etc.)
+    - severity: Filter by severity (LOW, MEDIUM, HIGH)
+    - since: Get events after this timestamp (ISO format)
+    - after_id: Only events with a higher id (incremental polling after a snapshot)
+    - limit: Max number of events (default 100)
+    - fields: Comma-separated subset of event fields to return (see EVENT_FIELDS)
+    - format: 'columnar' returns {field: [values...]} instead of a list of objects
+    """
+    fields, error = parse_fields(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+    if request.args.get('bus_id') and request.args.get('bus_id', type=int) is None:
+        return jsonify({'error': 'bus_id must be an integer'}), 400
+    columnar = request.args.get('format') == 'columnar'
+    
     limit = min(int(request.args.get('limit', 100)), 500)
-    events = query.order_by(DrivingEvent.timestamp.desc()).limit(limit).all()
+    
+    # Serialized events from the hot window, or a merge of the live table with other stores
+    events = query_hot_events(request.args, limit)
+    if events is None:
+        events = query_other_stores(request.args, limit)
+    if events is not None:
+        if not fields and not columnar:
+            return events_response({'count': len(events)}, [event_payloads.fragment(e) for e in events])
+        fields = fields or list(EVENT_FIELDS)
+        result = {'count': len(events), 'events': project_event_dicts(events, fields, columnar)}
+        if columnar:
+            result['format'] = 'columnar'
+            result['fields'] = fields
+        return jsonify(result)
+    
+    query = filtered_events_query(request.args)
+    
+    if not fields and not columnar:
+        # Page of ids from the index, full payloads from the cache where possible
+        ids = [row.id for row in query.with_entities(DrivingEvent.id)
+               .order_by(DrivingEvent.timestamp.desc()).limit(limit)]
+        fragments = event_payloads.render_ids(ids, lambda missing: DrivingEvent.query.options(
+            db.joinedload(DrivingEvent.bus)).filter(DrivingEvent.id.in_(missing)).all())
+        return events_response({'count': len(fragments)}, fragments)
+    
+    builders, query = select_event_fields(query, fields or list(EVENT_FIELDS))
+    rows = query.order_by(DrivingEvent.timestamp.desc()).limit(limit).all()
+    result = {
+        'count': len(rows),
+        'events': serialize_event_rows(rows, builders, columnar)
+    }
+    if columnar:
+        result['format'] = 'columnar'
+        result['fields'] = [name for name, _ in builders]
+    return jsonify(result)
+
+
+HOTSPOT_DEFAULT_DAYS = 30
+HOTSPOT_MAX_CELLS = 2000
+
+
+@events_bp.route('/api/events/hotspots', methods=['GET'])
+def get_hotspots():
+    """
+    Aggregate events into geohash grid cells for heatmaps and clustered markers.
+    
+    Query params:
+    - bbox: Viewport as south,west,north,east (optional)
+    - zoom: Map zoom level, picks the cell size (default 12)
+    - since: Only events after this timestamp (ISO, default last 30 days)
+    
+    Returns one entry per cell with its event count, severity mix, centroid and bounds.
+    """
+    try:
+        zoom = int(request.args.get('zoom', 12))
+        bbox = geo.parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+        since = datetime.fromisoformat(request.args['since'].replace('Z', '+00:00')) \
+            if request.args.get('since') else datetime.utcnow() - timedelta(days=HOTSPOT_DEFAULT_DAYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    precision = geo.precision_for_zoom(zoom)
+    cell = db.func.substr(DrivingEvent.geohash, 1, precision).label('cell')
+    query = db.session.query(
+        cell,
+        DrivingEvent.severity,
+        db.func.count(DrivingEvent.id),
+        db.func.avg(DrivingEvent.location_lat),
+        db.func.avg(DrivingEvent.location_lng)
+    ).filter(
+        DrivingEvent.geohash.isnot(None),
+        DrivingEvent.timestamp >= since
+    )
+    
+    if bbox:
+        south, west, north, east = bbox
+        query = query.filter(DrivingEvent.location_lat.between(south, north))
+        if west <= east:
+            query = query.filter(DrivingEvent.location_lng.between(west, east))
+        else:
+            # Viewport crosses the antimeridian
+            query = query.filter(db.or_(DrivingEvent.location_lng >= west, DrivingEvent.location_lng <= east))
+    
+    cells = {}
+    for cell_hash, severity, count, lat, lng in query.group_by(cell, DrivingEvent.severity).all():
+        entry = cells.setdefault(cell_hash, {'cell': cell_hash, 'count': 0, 'severity': {}, '_lat': 0.0, '_lng': 0.0})
+        entry['count'] += count
+        entry['severity'][severity] = count
+        entry['_lat'] += lat * count
+        entry['_lng'] += lng * count
+    
+    result = sorted(cells.values(), key=lambda c: c['count'], reverse=True)[:HOTSPOT_MAX_CELLS]
+    for entry in result:
+        entry['lat'] = entry.pop('_lat') / entry['count']
+        entry['lng'] = entry.pop('_lng') / entry['count']
+        entry['bounds'] = geo.decode_bounds(entry['cell'])
     
     return jsonify({
-        'count': len(events),
-        'events': [e.to_dict() for e in events]
+        'zoom': zoom,
+        'precision': precision,
+        'count': len(result),
+        'total_events': sum(c['count'] for c in result),
+        'cells': result
     })
 
 
 @events_bp.route('/api/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
-    """Get a specific event by ID."""
-    event = DrivingEvent.query.get_or_404(event_id)
+    """Get a specific event by ID (live table and ingest shards first, then the archives)."""
+    event = shards.find_event(event_id)
+    if event is None:
+        import archive
+        event = archive.get_event(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
     return jsonify(event.to_dict())
 
 
 @events_bp.route('/api/events/<int:event_id>/acknowledge', methods=['POST'])
 def acknowledge_event(event_id):
     """Mark an event as acknowledged by an authority."""
-    event = DrivingEvent.query.get_or_404(event_id)
+    event = shards.find_event(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
     event.acknowledged = True
     event.acknowledged_at = datetime.utcnow()
     db.session.commit()
-    return jsonify({'status': 'acknowledged', 'event': event.to_dict()})
+    event_dict = event.to_dict()
+    hot_events.add(event_dict)
+    event_payloads.put(event_dict)
+    return jsonify({'status': 'acknowledged', 'event': event_dict})
+
+
+@events_bp.route('/api/events/acknowledge', methods=['POST'])
+def acknowledge_events_bulk():
+    """
+    Acknowledge many events with a single UPDATE.
+    Events still waiting in an ingest shard are merged first, and matching
+    events in archived months are acknowledged in their partitions too.
+    
+    Expected JSON (either form):
+    {
+        "ids": [12, 13, 14]
+    }
+    {
+        "filter": {
+            "bus_id": 1,                        // optional
+            "event_type": "HARSH_BRAKE",        // optional
+            "severity": "HIGH",                 // optional
+            "before": "2026-01-21T18:00:00"     // optional, ISO timestamp
+        }
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    filters = data.get('filter')
+    
+    query = DrivingEvent.query.filter(DrivingEvent.acknowledged.isnot(True))
+    before = None
+    
+    if ids:
+        if not isinstance(ids, list):
+            return jsonify({'error': 'ids must be a list'}), 400
+        try:
+            ids = [int(i) for i in ids]
+        except (ValueError, TypeError):
+            return jsonify({'error': 'ids must be integers'}), 400
+        query = query.filter(DrivingEvent.id.in_(ids))
+    elif isinstance(filters, dict) and any(filters.get(k) for k in ('bus_id', 'event_type', 'severity', 'before')):
+        if filters.get('bus_id'):
+            try:
+                filters['bus_id'] = int(filters['bus_id'])
+            except (ValueError, TypeError):
+                return jsonify({'error': 'bus_id must be an integer'}), 400
+            query = query.filter(DrivingEvent.bus_id == filters['bus_id'])
+        if filters.get('event_type'):
+            query = query.filter(DrivingEvent.event_type == filters['event_type'])
+        if filters.get('severity'):
+            query = query.filter(DrivingEvent.severity == filters['severity'])
+        if filters.get('before'):
+            try:
+                before = naive_utc(datetime.fromisoformat(filters['before'].replace('Z', '+00:00')))
+            except (ValueError, AttributeError):
+                return jsonify({'error': 'before must be an ISO timestamp'}), 400
+            query = query.filter(DrivingEvent.timestamp < before)
+    else:
+        return jsonify({'error': 'Provide a non-empty ids list or filter'}), 400
+    
+    import archive
+    acknowledged_at = datetime.utcnow()
+    try:
+        # Pending shard rows would otherwise be merged later still unacknowledged
+        pending_shards = shards.existing_shards()
+        if ids and pending_shards:
+            pending_shards = sorted({shards.shard_of_event(i) for i in ids} & set(pending_shards))
+        if pending_shards:
+            shards.drain(pending_shards)
+        count = query.update(
+            {'acknowledged': True, 'acknowledged_at': acknowledged_at},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if ids:
+            count += archive.acknowledge(acknowledged_at, ids=ids)
+        else:
+            count += archive.acknowledge(
+                acknowledged_at, bus_id=filters.get('bus_id') or None,
+                event_type=filters.get('event_type'), severity=filters.get('severity'), before=before)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to acknowledge events: {str(e)}'}), 500
+    
+    if ids:
+        hot_events.acknowledge(ids=ids)
+        event_payloads.invalidate(ids)
+    else:
+        hot_events.acknowledge(filters=dict(filters, before=before))
+        event_payloads.clear()  # affected ids are unknown; rebuilt lazily
+    
+    # One compact broadcast instead of one frame per event
+    summary = {
+        'count': count,
+        'acknowledged_at': acknowledged_at.isoformat(),
+    }
+    if ids:
+        summary['ids'] = ids
+    else:
+        summary['filter'] = filters
+    if count:
+        emit_to_rooms('events_acknowledged', summary, [ALL_BUSES_ROOM])
+    
+    return jsonify({'status': 'acknowledged', **summary})
 
 
 @events_bp.route('/api/events/reset', methods=['DELETE'])
@@ -145,27 +588,141 @@ def reset_events():
     Delete all events from the database.
     WARNING: This is a destructive operation and cannot be undone.
     Used by the settings page to reset the database.
+    
+    Runs as a chunked background purge; poll /api/events/purge/<job_id> for progress.
     """
+    from jobs import start_purge
+    job = start_purge(current_app._get_current_object(), kind='reset')
+    return jsonify({
+        'status': 'started',
+        'message': 'Deleting all events in the background',
+        'job': job
+    }), 202
+
+
+@events_bp.route('/api/events/purge', methods=['POST'])
+def purge_events():
+    """
+    Start a chunked background purge of events (and their media files).
+    
+    Expected JSON (all optional, but at least one scope is required):
+    {
+        "older_than_days": 30,
+        "bus_id": 1,
+        "chunk_size": 500
+    }
+    """
+    from jobs import start_purge
+    
+    data = request.get_json(silent=True) or {}
     try:
-        count = DrivingEvent.query.count()
-        DrivingEvent.query.delete()
-        db.session.commit()
-        return jsonify({
-            'status': 'success',
-            'message': f'Successfully deleted {count} events',
-            'deleted_count': count
-        }), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({
-            'status': 'error',
-            'message': f'Failed to reset events: {str(e)}'
-        }), 500
+        older_than_days = data.get('older_than_days')
+        older_than_days = float(older_than_days) if older_than_days is not None else None
+        bus_id = int(data['bus_id']) if data.get('bus_id') is not None else None
+        chunk_size = int(data['chunk_size']) if data.get('chunk_size') else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'older_than_days, bus_id and chunk_size must be numbers'}), 400
+    
+    if older_than_days is None and bus_id is None:
+        return jsonify({'error': 'older_than_days or bus_id required (use /api/events/reset to delete everything)'}), 400
+    if chunk_size is not None and not 1 <= chunk_size <= 10000:
+        return jsonify({'error': 'chunk_size must be between 1 and 10000'}), 400
+    
+    job = start_purge(
+        current_app._get_current_object(),
+        older_than_days=older_than_days,
+        bus_id=bus_id,
+        chunk_size=chunk_size
+    )
+    return jsonify({'status': 'started', 'job': job}), 202
+
+
+@events_bp.route('/api/events/purge', methods=['GET'])
+def list_purge_jobs():
+    """List recent purge/retention/archive jobs with their progress."""
+    from jobs import list_jobs
+    jobs = list_jobs()
+    return jsonify({'count': len(jobs), 'jobs': jobs})
+
+
+@events_bp.route('/api/events/purge/<job_id>', methods=['GET'])
+def get_purge_job(job_id):
+    """Get progress of a purge job."""
+    from jobs import get_job
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@events_bp.route('/api/events/purge/<job_id>', methods=['DELETE'])
+def cancel_purge_job(job_id):
+    """Cancel a running purge job after its current chunk."""
+    from jobs import cancel_job
+    job = cancel_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@events_bp.route('/api/events/archive', methods=['POST'])
+def archive_events():
+    """
+    Start moving old events into monthly archive partitions.
+    Progress is reported through /api/events/purge/<job_id>.
+    
+    Expected JSON (optional):
+    {
+        "older_than_days": 90,      // default ARCHIVE_AFTER_DAYS
+        "chunk_size": 1000
+    }
+    """
+    from jobs import start_archive
+    import archive
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        older_than_days = data.get('older_than_days')
+        older_than_days = float(older_than_days) if older_than_days is not None else None
+        chunk_size = int(data['chunk_size']) if data.get('chunk_size') else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'older_than_days and chunk_size must be numbers'}), 400
+    
+    if older_than_days is None and archive.ARCHIVE_AFTER_DAYS <= 0:
+        return jsonify({'error': 'older_than_days required (ARCHIVE_AFTER_DAYS is not set)'}), 400
+    if older_than_days is not None and older_than_days < 1:
+        return jsonify({'error': 'older_than_days must be at least 1'}), 400
+    if chunk_size is not None and not 1 <= chunk_size <= 10000:
+        return jsonify({'error': 'chunk_size must be between 1 and 10000'}), 400
+    
+    job = start_archive(
+        current_app._get_current_object(),
+        older_than_days=older_than_days,
+        chunk_size=chunk_size
+    )
+    return jsonify({'status': 'started', 'job': job}), 202
+
+
+@events_bp.route('/api/events/archives', methods=['GET'])
+def list_archives():
+    """List archived monthly partitions, newest first."""
+    import archive
+    months = [entry.to_dict() for entry in archive.partitions()]
+    return jsonify({
+        'count': len(months),
+        'archived_events': sum(m['event_count'] for m in months),
+        'archives': months
+    })
 
 
 @events_bp.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get statistics for dashboard summary cards."""
+    return jsonify(compute_stats())
+
+
+def compute_stats():
+    """Dashboard summary-card statistics (shared with the dashboard snapshot)."""
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
     # Today's events
@@ -192,10 +749,10 @@ def get_stats():
         DrivingEvent.timestamp >= today
     ).group_by(DrivingEvent.event_type).all()
     
-    return jsonify({
+    return {
         'today_events': today_events,
         'high_severity': high_severity,
         'active_buses': active_buses,
         'total_buses': total_buses,
         'events_by_type': {t: c for t, c in events_by_type}
-    })
+    }
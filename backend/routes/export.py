@@ -2,89 +2,115 @@
 Export API routes for the Rash Driving Detection System.
 Handles exporting events to CSV and generating reports.
 """
-from flask import Blueprint, request, Response
+from flask import Blueprint, request, Response, jsonify, stream_with_context, send_from_directory
 from datetime import datetime, timedelta
 from models import db, DrivingEvent, Bus
-import csv
+from reports import (
+    REPORT_KINDS, artefact_path, compute_report, csv_chunks, ensure_report,
+    is_closed, list_reports, parse_period_key, period_bounds, period_events, period_key
+)
+import archive
+import shards
 import io
+import os
 
 export_bp = Blueprint('export', __name__)
 
 
-@export_bp.route('/api/export/events', methods=['GET'])
-def export_events_csv():
+def export_range(args):
     """
-    Export events to CSV format.
+    (since, until) datetimes of an export request; since defaults to 7 days ago.
     
     Query params:
-    - bus_id: Filter by bus ID
-    - since: Get events after this date (YYYY-MM-DD)
+    - since: Get events after this date (YYYY-MM-DD, default: last 7 days)
     - until: Get events before this date (YYYY-MM-DD)
     """
-    query = DrivingEvent.query
-    
-    # Apply filters
-    if request.args.get('bus_id'):
-        query = query.filter_by(bus_id=request.args.get('bus_id'))
-    
-    if request.args.get('since'):
+    since = until = None
+    if args.get('since'):
         try:
-            since = datetime.strptime(request.args.get('since'), '%Y-%m-%d')
-            query = query.filter(DrivingEvent.timestamp >= since)
+            since = datetime.strptime(args.get('since'), '%Y-%m-%d')
         except:
             pass
+    else:
+        since = datetime.utcnow() - timedelta(days=7)
     
-    if request.args.get('until'):
+    if args.get('until'):
         try:
-            until = datetime.strptime(request.args.get('until'), '%Y-%m-%d')
+            until = datetime.strptime(args.get('until'), '%Y-%m-%d')
             until = until.replace(hour=23, minute=59, second=59)
-            query = query.filter(DrivingEvent.timestamp <= until)
         except:
             pass
     
-    # Default: last 7 days
-    if not request.args.get('since'):
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        query = query.filter(DrivingEvent.timestamp >= week_ago)
-    
-    events = query.order_by(DrivingEvent.timestamp.desc()).all()
-    
-    # Generate CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        'ID', 'Timestamp', 'Bus Registration', 'Driver', 'Event Type', 
-        'Severity', 'Acceleration X (g)', 'Acceleration Y (g)', 
-        'Speed (km/h)', 'Latitude', 'Longitude', 'Location Address',
-        'Acknowledged'
-    ])
-    
-    # Data rows
-    for event in events:
-        writer.writerow([
-            event.id,
-            event.timestamp.strftime('%Y-%m-%d %H:%M:%S') if event.timestamp else '',
-            event.bus.registration_number if event.bus else '',
-            event.bus.driver_name if event.bus else '',
-            event.event_type,
-            event.severity,
-            event.acceleration_x,
-            event.acceleration_y,
-            event.speed,
-            event.location_lat,
-            event.location_lng,
-            event.location_address or '',
-            'Yes' if event.acknowledged else 'No'
-        ])
-    
-    # Create response
-    output.seek(0)
+    return since, until
+
+
+def apply_export_filters(query, args):
+    """
+    Apply the export date/bus filters shared by the CSV and columnar exports.
+    
+    Query params:
+    - bus_id: Filter by bus ID
+    - since / until: see export_range()
+    """
+    if args.get('bus_id'):
+        query = query.filter(DrivingEvent.bus_id == args.get('bus_id'))
+    
+    since, until = export_range(args)
+    if since is not None:
+        query = query.filter(DrivingEvent.timestamp >= since)
+    if until is not None:
+        query = query.filter(DrivingEvent.timestamp <= until)
+    
+    return query
+
+
+def other_export_events(args):
+    """
+    Events inside the export range that are not in the live table (archived
+    months, rows still in ingest shards), newest first, or None if there are none.
+    """
+    since, until = export_range(args)
+    filters = dict(since=since, until=until, bus_id=args.get('bus_id') or None)
+    sources = []
+    if shards.has_pending():
+        sources.append(list(shards.iter_pending(**filters)))
+    if archive.spans(since, until, filters['bus_id']):
+        sources.append(archive.iter_events(**filters))
+    if not sources:
+        return None
+    return archive.merge_newest_first(*sources)
+
+
+@export_bp.route('/api/export/events', methods=['GET'])
+def export_events_csv():
+    """
+    Export events to CSV format.
+    
+    Query params:
+    - bus_id: Filter by bus ID
+    - since: Get events after this date (YYYY-MM-DD)
+    - until: Get events before this date (YYYY-MM-DD)
+    """
+    if request.args.get('bus_id') and request.args.get('bus_id', type=int) is None:
+        return jsonify({'error': 'bus_id must be an integer'}), 400
+    query = apply_export_filters(DrivingEvent.query, request.args) \
+        .options(db.joinedload(DrivingEvent.bus)) \
+        .order_by(DrivingEvent.timestamp.desc())
+    args = request.args.to_dict()
+    
+    def generate():
+        # Stream in ~64 KB chunks straight from a chunked cursor
+        # (yield_per implies stream_results: a server-side cursor on Postgres)
+        events = query.yield_per(1000)
+        others = other_export_events(args)
+        if others is not None:
+            events = archive.merge_newest_first(events, others)
+        yield from csv_chunks(events)
+    
     filename = f"rash_driving_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={
             'Content-Disposition': f'attachment; filename={filename}',
@@ -93,16 +119,198 @@ def export_events_csv():
     )
 
 
+# ==================== COLUMNAR EXPORT ====================
+
+# Rows per Parquet row group / Arrow record batch (also the DB fetch size)
+COLUMNAR_BATCH_ROWS = 50000
+
+COLUMNAR_COLUMNS = [
+    ('id', DrivingEvent.id),
+    ('timestamp', DrivingEvent.timestamp),
+    ('bus_id', DrivingEvent.bus_id),
+    ('bus_registration', Bus.registration_number),
+    ('driver_name', Bus.driver_name),
+    ('event_type', DrivingEvent.event_type),
+    ('severity', DrivingEvent.severity),
+    ('acceleration_x', DrivingEvent.acceleration_x),
+    ('acceleration_y', DrivingEvent.acceleration_y),
+    ('acceleration_z', DrivingEvent.acceleration_z),
+    ('speed', DrivingEvent.speed),
+    ('location_lat', DrivingEvent.location_lat),
+    ('location_lng', DrivingEvent.location_lng),
+    ('location_address', DrivingEvent.location_address),
+    ('geohash', DrivingEvent.geohash),
+    ('acknowledged', DrivingEvent.acknowledged),
+    ('snapshot_url', DrivingEvent.snapshot_url),
+    ('video_url', DrivingEvent.video_url),
+]
+
+
+def _arrow_schema(pa):
+    category = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        'id': pa.int64(), 'timestamp': pa.timestamp('us'), 'bus_id': pa.int32(),
+        'bus_registration': category, 'driver_name': category,
+        'event_type': category, 'severity': category,
+        'acceleration_x': pa.float64(), 'acceleration_y': pa.float64(),
+        'acceleration_z': pa.float64(), 'speed': pa.float64(),
+        'location_lat': pa.float64(), 'location_lng': pa.float64(),
+        'location_address': pa.string(), 'geohash': pa.string(),
+        'acknowledged': pa.bool_(), 'snapshot_url': pa.string(), 'video_url': pa.string(),
+    }
+    return pa.schema([(name, types[name]) for name, _ in COLUMNAR_COLUMNS])
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after each batch."""
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data):
+        self._position += len(data)
+        return self._buffer.write(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def _columnar_batches(pa, schema, args):
+    """Record batches straight from a chunked DB cursor."""
+    query = db.session.query(*[col for _, col in COLUMNAR_COLUMNS]) \
+        .outerjoin(Bus, Bus.id == DrivingEvent.bus_id)
+    query = apply_export_filters(query, args).order_by(DrivingEvent.timestamp.desc())
+    
+    rows = query.yield_per(COLUMNAR_BATCH_ROWS)
+    others = other_export_events(args)
+    if others is not None:
+        other_rows = (tuple(_columnar_value(e, name) for name, _ in COLUMNAR_COLUMNS) for e in others)
+        ts = [name for name, _ in COLUMNAR_COLUMNS].index('timestamp')
+        rows = archive.merge_newest_first(rows, other_rows, key=lambda r: r[ts] or datetime.min)
+    
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= COLUMNAR_BATCH_ROWS:
+            yield _to_batch(pa, schema, batch)
+            batch = []
+    if batch:
+        yield _to_batch(pa, schema, batch)
+
+
+def _columnar_value(event, name):
+    """COLUMNAR_COLUMNS value of a DetachedEvent (bus columns come from the main DB)."""
+    if name == 'bus_registration':
+        return event.bus.registration_number if event.bus else None
+    if name == 'driver_name':
+        return event.bus.driver_name if event.bus else None
+    return getattr(event, name)
+
+
+def _to_batch(pa, schema, rows):
+    columns = list(zip(*rows))
+    arrays = []
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[i], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[i], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _columnar_export(fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        return jsonify({'error': 'Columnar export requires pyarrow (pip install pyarrow)'}), 501
+    
+    if request.args.get('bus_id') and request.args.get('bus_id', type=int) is None:
+        return jsonify({'error': 'bus_id must be an integer'}), 400
+    schema = _arrow_schema(pa)
+    args = request.args.to_dict()
+    
+    def generate():
+        sink = _ChunkSink()
+        if fmt == 'parquet':
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        for batch in _columnar_batches(pa, schema, args):
+            if fmt == 'parquet':
+                writer.write_batch(batch, row_group_size=COLUMNAR_BATCH_ROWS)
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if fmt == 'parquet':
+        filename, mimetype = f"rash_driving_events_{stamp}.parquet", 'application/vnd.apache.parquet'
+    else:
+        filename, mimetype = f"rash_driving_events_{stamp}.arrows", 'application/vnd.apache.arrow.stream'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@export_bp.route('/api/export/events.parquet', methods=['GET'])
+def export_events_parquet():
+    """
+    Export events as Parquet (typed columns, one row group per batch).
+    Same filters as /api/export/events. Load with pandas.read_parquet().
+    """
+    return _columnar_export('parquet')
+
+
+@export_bp.route('/api/export/events.arrow', methods=['GET'])
+def export_events_arrow():
+    """
+    Export events as an Arrow IPC stream.
+    Same filters as /api/export/events. Load with pyarrow.ipc.open_stream().
+    """
+    return _columnar_export('arrow')
+
+
 @export_bp.route('/api/export/report', methods=['GET'])
 def generate_report():
     """
     Generate a summary report in JSON format.
     
     Query params:
-    - period: 'today', 'week', 'month' (default: 'today')
+    - period: 'today', 'week', 'month' (rolling windows, default: 'today'),
+              or 'day' / 'week' together with date for a calendar period
+    - date: Any date inside the calendar day/ISO week (YYYY-MM-DD)
+    
+    Closed calendar periods are served from the pre-generated report files.
     """
     period = request.args.get('period', 'today')
     
+    if request.args.get('date') and period in REPORT_KINDS:
+        try:
+            date = datetime.strptime(request.args.get('date'), '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+        key = period_key(period, period_bounds(period, date)[0])
+        return serve_report(period, key, 'json')
+    
     # Calculate date range
     now = datetime.utcnow()
     if period == 'today':
@@ -114,36 +322,49 @@ def generate_report():
     else:
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
     
-    # Query events
-    events = DrivingEvent.query.filter(DrivingEvent.timestamp >= start_date).all()
-    
-    # Calculate statistics
-    total_events = len(events)
-    severity_counts = {'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
-    event_type_counts = {}
-    bus_event_counts = {}
-    
-    for event in events:
-        severity_counts[event.severity] = severity_counts.get(event.severity, 0) + 1
-        event_type_counts[event.event_type] = event_type_counts.get(event.event_type, 0) + 1
-        
-        bus_reg = event.bus.registration_number if event.bus else 'Unknown'
-        bus_event_counts[bus_reg] = bus_event_counts.get(bus_reg, 0) + 1
-    
-    # Find top offenders
-    top_offenders = sorted(bus_event_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    return {
-        'report_period': period,
-        'start_date': start_date.isoformat(),
-        'end_date': now.isoformat(),
-        'summary': {
-            'total_events': total_events,
-            'by_severity': severity_counts,
-            'by_type': event_type_counts
-        },
-        'top_offenders': [
-            {'bus': bus, 'events': count} for bus, count in top_offenders
-        ],
-        'generated_at': now.isoformat()
-    }
+    return compute_report(start_date, now, period)
+
+
+@export_bp.route('/api/export/reports', methods=['GET'])
+def list_period_reports():
+    """List pre-generated daily and weekly report files."""
+    return jsonify(list_reports())
+
+
+@export_bp.route('/api/export/reports/<kind>/<key>.<ext>', methods=['GET'])
+def serve_report(kind, key, ext):
+    """
+    Download a daily ('2026-01-21') or weekly ('2026-W04') report as json or csv.
+    Closed periods are static files; the open period is computed live.
+    """
+    if kind not in REPORT_KINDS or ext not in ('json', 'csv'):
+        return jsonify({'error': 'Unknown report'}), 404
+    try:
+        start, end = period_bounds(kind, parse_period_key(kind, key))
+    except ValueError:
+        return jsonify({'error': 'Invalid period'}), 404
+    if key != period_key(kind, start):
+        return jsonify({'error': 'Invalid period'}), 404
+    
+    if start > datetime.utcnow():
+        return jsonify({'error': 'Period has not started'}), 404
+    
+    if is_closed(kind, start):
+        ensure_report(kind, start)
+        path = artefact_path(kind, key, ext)
+        return send_from_directory(os.path.dirname(path), os.path.basename(path),
+                                   as_attachment=(ext == 'csv'))
+    
+    # Open period: compute live
+    if ext == 'json':
+        report = compute_report(start, end, kind)
+        report['period_key'] = key
+        return jsonify(report)
+    return Response(
+        stream_with_context(csv_chunks(period_events(start, end))),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename=report_{kind}_{key}.csv',
+            'Content-Type': 'text/csv; charset=utf-8'
+        }
+    )
@@ -8,7 +8,10 @@ import subprocess
 from flask import Blueprint, request, jsonify, send_from_directory, current_app
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from models import db, DrivingEvent
+from models import db
+from hot_events import hot_events
+from event_payloads import event_payloads
+import shards
 
 media_bp = Blueprint('media', __name__)
 
@@ -63,7 +66,9 @@ def upload_video(event_id):
     
     Expects multipart form with 'video' file.
     """
-    event = DrivingEvent.query.get_or_404(event_id)
+    event = shards.find_event(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
     
     if 'video' not in request.files:
         return jsonify({'error': 'No video file provided'}), 400
@@ -87,6 +92,9 @@ def upload_video(event_id):
     # Update event
     event.video_url = f"/api/media/{filename}"
     db.session.commit()
+    event_dict = event.to_dict()
+    hot_events.add(event_dict)
+    event_payloads.put(event_dict)
     
     return jsonify({
         'status': 'uploaded',
@@ -103,7 +111,9 @@ def upload_snapshot(event_id):
     - Multipart form with 'image' file
     - JSON with 'base64' image data
     """
-    event = DrivingEvent.query.get_or_404(event_id)
+    event = shards.find_event(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"event_{event_id}_{timestamp}.jpg"
@@ -131,6 +141,9 @@ def upload_snapshot(event_id):
     # Update event
     event.snapshot_url = f"/api/media/{filename}"
     db.session.commit()
+    event_dict = event.to_dict()
+    hot_events.add(event_dict)
+    event_payloads.put(event_dict)
     
     return jsonify({
         'status': 'uploaded',
@@ -147,7 +160,9 @@ def serve_media(filename):
 @media_bp.route('/api/events/<int:event_id>/evidence', methods=['GET'])
 def get_evidence(event_id):
     """Get all evidence (video and snapshot) for an event."""
-    event = DrivingEvent.query.get_or_404(event_id)
+    event = shards.find_event(event_id)
+    if event is None:
+        return jsonify({'error': 'Event not found'}), 404
     
     return jsonify({
         'event_id': event_id,
@@ -30,15 +30,16 @@ def find_python():
         
     return venv_py if os.path.exists(venv_py) else sys.executable
 
-@simulation_bp.route('/status', methods=['GET'])
-def get_status():
-    global simulator_process
+def simulator_status():
     is_running = simulator_process is not None and simulator_process.poll() is None
-    
-    return jsonify({
+    return {
         'running': is_running,
         'pid': simulator_process.pid if is_running else None
-    })
+    }
+
+@simulation_bp.route('/status', methods=['GET'])
+def get_status():
+    return jsonify(simulator_status())
 
 @simulation_bp.route('/start', methods=['POST'])
 def start_simulation():
@@ -0,0 +1,359 @@
+"""
+Sharded event ingest for the Rash Driving Detection System.
+With EVENT_SHARDS > 1, incoming events and location updates are written to
+one of N SQLite files (shards/shard_<k>.db) chosen by bus id, so Pis on
+different shards never wait on the same write lock. A background merger moves
+shard rows into the main database in batches; until then, list, report and
+export readers fan out across the shards and merge the pending rows in.
+
+Event ids are allocated per shard as (milliseconds << 6) | shard, so they are
+unique across shards, roughly time-ordered and never collide with the
+autoincrement ids of events stored before sharding was enabled.
+"""
+import glob
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, \
+    create_engine, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db, socketio
+from cluster import register, replicated
+from db_profile import is_postgres
+from models import Bus, BusLocation, DetachedEvent, DrivingEvent, standalone_event_table
+from archive import filtered_statement, merge_newest_first
+
+EVENT_SHARDS = int(os.getenv('EVENT_SHARDS', 0))        # 0 or 1 = single database
+SHARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shards')
+SHARD_MERGE_INTERVAL = float(os.getenv('SHARD_MERGE_INTERVAL', 1.0))   # seconds
+SHARD_MERGE_BATCH = int(os.getenv('SHARD_MERGE_BATCH', 2000))
+BUS_CACHE_SECONDS = 60          # bus names shown on shard rows may lag a rename this long
+
+SHARD_BITS = 6
+MAX_SHARDS = 1 << SHARD_BITS
+ID_EPOCH = datetime(2020, 1, 1)
+
+# Shard ids need 64-bit ids; SQLite INTEGER has them, a Postgres INTEGER column does not.
+# Postgres also has no single-writer lock for sharding to work around.
+enabled = EVENT_SHARDS > 1 and not os.getenv('DATABASE_URL', '').startswith('postgres')
+if EVENT_SHARDS > MAX_SHARDS:
+    raise ValueError(f"EVENT_SHARDS must be at most {MAX_SHARDS}")
+
+_metadata = MetaData()
+shard_events = standalone_event_table(_metadata, 'shard_events')
+shard_locations = Table(
+    'bus_locations', _metadata,
+    Column('bus_id', Integer, primary_key=True),
+    Column('latitude', Float, nullable=False),
+    Column('longitude', Float, nullable=False),
+    Column('speed', Float),
+    Column('heading', Float),
+    Column('updated_at', DateTime),
+)
+shard_meta = Table(
+    'shard_meta', _metadata,
+    Column('key', String(20), primary_key=True),
+    Column('value', Integer, nullable=False),
+)
+
+_engines = {}
+_engines_lock = threading.Lock()
+_leftover_shards = None   # shard files from an older EVENT_SHARDS, found once
+_buses = {}               # bus id -> (id, registration_number, driver_name) row
+_buses_loaded_at = 0.0
+_buses_lock = threading.Lock()
+
+
+class PendingCounts:
+    """
+    Events waiting in each shard, so readers skip empty shards without opening
+    them. Replicated to every worker: writers add, and whoever merges a shard
+    sets the exact count it left behind. A shard with no count yet is treated
+    as pending.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}    # shard -> pending events
+
+    @replicated
+    def add(self, shard, count=1):
+        with self._lock:
+            self._counts[shard] = self._counts.get(shard, 0) + count
+
+    @replicated
+    def set(self, shard, count):
+        with self._lock:
+            self._counts[shard] = count
+
+    def get(self, shard):
+        with self._lock:
+            return self._counts.get(shard)
+
+    def pending(self, shards):
+        """The shards among `shards` that may hold events."""
+        with self._lock:
+            return [s for s in shards if self._counts.get(s, 1) > 0]
+
+
+pending_counts = register('shard_pending', PendingCounts())
+
+
+def shard_for(bus_id):
+    return int(bus_id) % EVENT_SHARDS
+
+
+def shard_of_event(event_id):
+    return event_id & (MAX_SHARDS - 1)
+
+
+def _engine(shard):
+    with _engines_lock:
+        engine = _engines.get(shard)
+        if engine is None:
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            engine = create_engine(
+                f"sqlite:///{os.path.join(SHARD_DIR, f'shard_{shard}.db')}",
+                connect_args={'timeout': 30}
+            )
+            _metadata.create_all(engine)
+            with engine.begin() as conn:
+                if conn.execute(select(shard_meta.c.value).where(shard_meta.c.key == 'last_ms')).first() is None:
+                    conn.execute(insert(shard_meta), {'key': 'last_ms', 'value': 0})
+            _engines[shard] = engine
+        return engine
+
+
+def existing_shards():
+    """Shard indexes that have a file on disk (including ones from an older EVENT_SHARDS)."""
+    global _leftover_shards
+    if _leftover_shards is None:
+        # Only configured shards are ever created, so the directory is listed once
+        found = set()
+        for path in glob.glob(os.path.join(SHARD_DIR, 'shard_*.db')):
+            match = re.search(r'shard_(\d+)\.db$', path)
+            if match:
+                found.add(int(match.group(1)))
+        _leftover_shards = found
+    shards = set(range(EVENT_SHARDS)) if enabled else set()
+    return sorted(shards | _leftover_shards)
+
+
+def _bus_map(bus_ids=()):
+    """Bus rows for shard events, reloaded when stale or when an unknown bus shows up."""
+    global _buses, _buses_loaded_at
+    with _buses_lock:
+        if time.monotonic() - _buses_loaded_at > BUS_CACHE_SECONDS or not set(bus_ids) <= _buses.keys():
+            _buses = {row.id: row for row in db.session.query(
+                Bus.id, Bus.registration_number, Bus.driver_name).all()}
+            _buses_loaded_at = time.monotonic()
+        return _buses
+
+
+# ==================== WRITES ====================
+
+def _lock_shard(conn):
+    """Take the shard's write lock up front (a no-op UPDATE), before any reads."""
+    conn.execute(update(shard_meta).where(shard_meta.c.key == 'last_ms')
+                 .values(value=shard_meta.c.value))
+
+
+def _upsert_location(conn, location):
+    values = {k: location.get(k) for k in ('latitude', 'longitude', 'speed', 'heading')}
+    values['updated_at'] = location.get('updated_at') or datetime.utcnow()
+    if not conn.execute(update(shard_locations).where(
+            shard_locations.c.bus_id == location['bus_id']).values(**values)).rowcount:
+        conn.execute(insert(shard_locations), dict(values, bus_id=location['bus_id']))
+
+
+def store_event(event, bus, location=None):
+    """
+    Write a new (transient) DrivingEvent, and optionally the bus's new location,
+    to the bus's shard in one transaction.
+
+    Returns:
+        DetachedEvent with its allocated id
+    """
+    shard = shard_for(bus.id)
+    values = {c.name: getattr(event, c.name) for c in shard_events.columns if c.name != 'id'}
+    values['created_at'] = values['created_at'] or datetime.utcnow()
+    values['acknowledged'] = bool(values['acknowledged'])
+    now_ms = int((datetime.utcnow() - ID_EPOCH).total_seconds() * 1000)
+
+    with _engine(shard).begin() as conn:
+        # Strictly increasing per shard even if several events land in one millisecond
+        conn.execute(update(shard_meta).where(shard_meta.c.key == 'last_ms').values(
+            value=db.func.max(shard_meta.c.value + 1, now_ms)))
+        ms = conn.execute(select(shard_meta.c.value).where(shard_meta.c.key == 'last_ms')).scalar_one()
+        values['id'] = (ms << SHARD_BITS) | shard
+        conn.execute(insert(shard_events), values)
+        if location:
+            _upsert_location(conn, location)
+    pending_counts.add(shard)
+    return DetachedEvent(values, bus)
+
+
+def store_location(location):
+    """Write a location update ({bus_id, latitude, longitude, speed, heading}) to its shard."""
+    with _engine(shard_for(location['bus_id'])).begin() as conn:
+        _upsert_location(conn, location)
+
+
+def update_event(event_id, **values):
+    """Update an event wherever it currently lives (its shard, or the main table once merged)."""
+    shard = shard_of_event(event_id)
+    if shard in existing_shards():
+        with _engine(shard).begin() as conn:
+            if conn.execute(update(shard_events).where(
+                    shard_events.c.id == event_id).values(**values)).rowcount:
+                return
+    DrivingEvent.query.filter_by(id=event_id).update(values, synchronize_session=False)
+    db.session.commit()
+
+
+# ==================== MERGING ====================
+
+def _upsert_locations(locations):
+    """Apply shard location rows to bus_locations in one statement, newest update wins."""
+    table = BusLocation.__table__
+    stmt = (pg_insert if is_postgres() else sqlite_insert)(table)
+    fields = ('latitude', 'longitude', 'speed', 'heading', 'updated_at')
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.bus_id],
+        set_={name: stmt.excluded[name] for name in fields},
+        where=db.or_(table.c.updated_at.is_(None), table.c.updated_at <= stmt.excluded.updated_at),
+    )
+    db.session.execute(stmt, locations)
+    db.session.commit()
+
+
+def merge_shard(shard, batch=None):
+    """
+    Move pending rows of one shard into the main database.
+    The shard stays write-locked until its events are committed to the main DB,
+    so no update to a row can slip in between copy and delete. Locations are
+    last-write-wins, so they are upserted after the lock is released.
+
+    Returns:
+        Number of events merged
+    """
+    batch = batch or SHARD_MERGE_BATCH
+    with _engine(shard).begin() as conn:
+        _lock_shard(conn)
+        rows = [dict(r) for r in conn.execute(
+            select(shard_events).order_by(shard_events.c.id).limit(batch)).mappings()]
+        locations = [dict(r) for r in conn.execute(select(shard_locations)).mappings()]
+
+        ids = [r['id'] for r in rows]
+        if rows:
+            table = DrivingEvent.__table__
+            # Delete-then-insert keeps a repeated merge (crash after main commit) idempotent
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+            conn.execute(delete(shard_events).where(shard_events.c.id.in_(ids)))
+        if locations:
+            conn.execute(delete(shard_locations))
+        # Published before the lock is released, so it precedes any writer's add()
+        remaining = conn.execute(select(func.count()).select_from(shard_events)).scalar()
+        if pending_counts.get(shard) != remaining:
+            pending_counts.set(shard, remaining)
+    if locations:
+        _upsert_locations(locations)
+    return len(ids)
+
+
+def drain(shards=None):
+    """Merge every pending row of the given (default: all) shards. Needs an app context."""
+    merged = 0
+    for shard in shards if shards is not None else existing_shards():
+        while True:
+            count = merge_shard(shard)
+            merged += count
+            if count < SHARD_MERGE_BATCH:
+                break
+    return merged
+
+
+def find_event(event_id):
+    """
+    DrivingEvent by id for handlers that modify it (acknowledge, evidence upload).
+    An event still waiting in its shard is merged first.
+    """
+    event = db.session.get(DrivingEvent, event_id)
+    if event is None and shard_of_event(event_id) in existing_shards():
+        drain([shard_of_event(event_id)])
+        event = db.session.get(DrivingEvent, event_id)
+    return event
+
+
+def _merge_loop(app):
+    while True:
+        socketio.sleep(SHARD_MERGE_INTERVAL)
+        try:
+            with app.app_context():
+                drain()
+                db.session.remove()
+        except Exception as e:
+            print(f"  ⚠️  Shard merge failed: {e}")
+
+
+def start_shard_merger(app):
+    """
+    Merge shard rows into the main DB every SHARD_MERGE_INTERVAL seconds.
+    Leftover shard files are drained even when sharding has been switched off.
+    """
+    if not existing_shards():
+        return
+    with app.app_context():
+        drain()
+        db.session.remove()
+    if enabled:
+        socketio.start_background_task(_merge_loop, app)
+        print(f"Shards: {EVENT_SHARDS} ingest shards, merged every {SHARD_MERGE_INTERVAL}s")
+
+
+# ==================== FAN-OUT READS ====================
+
+def iter_pending(since=None, until=None, bus_id=None, event_type=None, severity=None,
+                 after_id=None, limit=None):
+    """
+    Not-yet-merged events matching the list filters, newest first, merged
+    across shards (only the bus's own shard when bus_id is given).
+    """
+    shards = existing_shards()
+    if not shards:
+        return iter(())
+    if bus_id is not None and enabled:
+        shards = [s for s in shards if s == shard_for(bus_id) or s >= EVENT_SHARDS]
+    stmt = filtered_statement(shard_events, since, until, bus_id, event_type, severity, after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    streams = []
+    for shard in pending_counts.pending(shards):
+        with _engine(shard).connect() as conn:
+            rows = conn.execute(stmt).mappings().all()
+        if rows:
+            buses = _bus_map({row['bus_id'] for row in rows})
+            streams.append([DetachedEvent(row, buses.get(row['bus_id'])) for row in rows])
+    return merge_newest_first(*streams)
+
+
+def max_pending_id():
+    """Highest id of any not-yet-merged event, or None."""
+    ids = []
+    for shard in pending_counts.pending(existing_shards()):
+        with _engine(shard).connect() as conn:
+            ids.append(conn.execute(select(func.max(shard_events.c.id))).scalar())
+    return max((i for i in ids if i is not None), default=None)
+
+
+def has_pending():
+    """True if any shard may hold events not yet merged into the main DB (without opening them)."""
+    return bool(pending_counts.pending(existing_shards()))
@@ -0,0 +1,74 @@
+"""
+Compact binary encoding for Socket.IO messages of the Rash Driving Detection System.
+Clients that ask for it on connect (auth or query `encoding=msgpack`) get
+new_alert / bus_updates / events_acknowledged as MessagePack binary frames
+with dict keys replaced by short field codes; everyone else keeps JSON.
+The codebook is sent in the `connected` reply so clients never hard-code it.
+"""
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# Field name -> code for DrivingEvent.to_dict() and BusLocation.to_dict() payloads.
+# Keys not listed are sent unchanged.
+FIELD_CODES = {
+    'id': 'i',
+    'bus_id': 'b',
+    'bus_registration': 'r',
+    'driver_name': 'dn',
+    'event_type': 'e',
+    'severity': 'sv',
+    'acceleration_x': 'ax',
+    'acceleration_y': 'ay',
+    'acceleration_z': 'az',
+    'speed': 's',
+    'heading': 'h',
+    'location': 'l',
+    'lat': 'la',
+    'lng': 'ln',
+    'address': 'ad',
+    'latitude': 'y',
+    'longitude': 'x',
+    'timestamp': 't',
+    'updated_at': 'u',
+    'alert_sent': 'as',
+    'acknowledged': 'ak',
+    'acknowledged_at': 'aa',
+    'has_video': 'hv',
+    'has_snapshot': 'hs',
+    'snapshot_url': 'su',
+    'video_url': 'vu',
+}
+if len(set(FIELD_CODES.values())) != len(FIELD_CODES):
+    raise ValueError("FIELD_CODES must be unique")
+
+
+def negotiate(requested):
+    """Encoding for a client that asked for `requested` (falls back to JSON)."""
+    if requested == MSGPACK and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def shorten(obj):
+    """Replace known dict keys with their codes, recursively."""
+    if isinstance(obj, dict):
+        return {FIELD_CODES.get(k, k): shorten(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [shorten(v) for v in obj]
+    return obj
+
+
+def _default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+def encode(obj):
+    """MessagePack bytes of `obj` with short field codes."""
+    return msgpack.packb(shorten(obj), use_bin_type=True, default=_default)
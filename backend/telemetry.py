@@ -0,0 +1,204 @@
+"""
+Live telemetry relay for the Rash Driving Detection System.
+Pis started with TELEMETRY_STREAM=true post their 10 Hz IMU/speed samples
+once per second (hardware/telemetry_stream.py). Each batch is relayed over
+Socket.IO to the clients watching that bus, downsampled to the rate each
+watcher picked: every bucket carries the min and max of each field, so a
+0.1 s braking spike still shows at 1 Hz. Nothing is stored unless a watcher
+asked to record; with no watchers the POST answers {'watched': false} and
+the Pi stops sending samples.
+
+Watch entries are replicated to every worker but only the worker holding
+the client's socket sees its disconnect. That worker refreshes its clients'
+entries every WATCH_TTL/3 seconds; entries of a worker that died expire
+after WATCH_TTL, so its Pis stop streaming and recording stops.
+"""
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+
+from cluster import register, replicated
+from extensions import socketio
+from live_positions import emit_to_rooms
+
+FIELDS = ('ax', 'ay', 'az', 'speed')
+SOURCE_RATE = 10                # Hz sampled on the Pi
+RATES = (1, 2, 5, 10)           # Hz a watcher may pick; each divides one second
+DEFAULT_RATE = int(os.getenv('TELEMETRY_DEFAULT_RATE', 2))
+MAX_BATCH = 600                 # samples per POST (a minute of catch-up after an outage)
+WATCH_TTL = float(os.getenv('TELEMETRY_WATCH_TTL', 60))   # seconds a watch lives without a refresh
+RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry')
+
+if DEFAULT_RATE not in RATES:
+    raise ValueError(f"TELEMETRY_DEFAULT_RATE must be one of {RATES}")
+
+
+def telemetry_room(bus_id, rate):
+    return f'telemetry:{bus_id}:{rate}'
+
+
+def downsample(samples, rate):
+    """
+    Min/max buckets of 1000/rate ms, aligned to the clock:
+    [[bucket_start_ms, [min per field], [max per field]], ...].
+    `samples` are [t_ms, value per field] sorted by time.
+    """
+    interval = 1000 // rate
+    buckets = []
+    current_start = None
+    for t, *values in samples:
+        start = t - t % interval
+        if start != current_start:
+            current_start = start
+            low, high = list(values), list(values)
+            buckets.append([start, low, high])
+            continue
+        for i, value in enumerate(values):
+            if value < low[i]:
+                low[i] = value
+            elif value > high[i]:
+                high[i] = value
+    return buckets
+
+
+class TelemetryWatchers:
+    """
+    Which clients watch which bus, at what rate. Replicated to every worker;
+    each entry expires WATCH_TTL seconds after it was last added or touched.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers = {}    # bus_id -> {sid: (rate, record, expires)}
+        self._owned = set()    # sids connected to this worker
+        self._heartbeat_started = False
+
+    def watch(self, sid, bus_id, rate, record=False):
+        """Add a watch for a client of this worker, which keeps it alive."""
+        with self._lock:
+            self._owned.add(sid)
+        self.add(sid, bus_id, rate, record)
+        self._ensure_heartbeat()
+
+    @replicated
+    def add(self, sid, bus_id, rate, record=False):
+        with self._lock:
+            self._watchers.setdefault(bus_id, {})[sid] = (rate, record, time.monotonic() + WATCH_TTL)
+
+    @replicated
+    def touch(self, sids):
+        """Push back the expiry of every watch of these clients."""
+        sids = set(sids)
+        expires = time.monotonic() + WATCH_TTL
+        with self._lock:
+            for watchers in self._watchers.values():
+                for sid in sids & watchers.keys():
+                    rate, record, _ = watchers[sid]
+                    watchers[sid] = (rate, record, expires)
+
+    @replicated
+    def unwatch(self, sid, bus_id=None):
+        with self._lock:
+            bus_ids = [bus_id] if bus_id is not None else list(self._watchers)
+            for b in bus_ids:
+                watchers = self._watchers.get(b)
+                if watchers and watchers.pop(sid, None) and not watchers:
+                    del self._watchers[b]
+            if bus_id is None or not any(sid in w for w in self._watchers.values()):
+                self._owned.discard(sid)
+
+    def get(self, bus_id):
+        """(rates wanted, any recording) for a bus; (set(), False) when unwatched."""
+        now = time.monotonic()
+        with self._lock:
+            watchers = self._watchers.get(bus_id, {})
+            for sid in [sid for sid, (_, _, expires) in watchers.items() if expires <= now]:
+                del watchers[sid]
+            if not watchers:
+                self._watchers.pop(bus_id, None)
+            live = list(watchers.values())
+        return {rate for rate, _, _ in live}, any(record for _, record, _ in live)
+
+    def refresh_owned(self):
+        """Touch the watches of this worker's clients (the heartbeat)."""
+        with self._lock:
+            owned = list(self._owned)
+        if owned:
+            self.touch(owned)
+
+    def _heartbeat_loop(self):
+        while True:
+            socketio.sleep(WATCH_TTL / 3)
+            try:
+                self.refresh_owned()
+            except Exception as e:
+                print(f"  ⚠️  Telemetry watch refresh failed: {e}")
+
+    def _ensure_heartbeat(self):
+        with self._lock:
+            if self._heartbeat_started:
+                return
+            self._heartbeat_started = True
+        socketio.start_background_task(self._heartbeat_loop)
+
+
+telemetry_watchers = register('telemetry_watchers', TelemetryWatchers())
+_record_lock = threading.Lock()
+
+
+def _record(bus_id, samples):
+    """Append raw samples to telemetry/bus_<id>_<date>.csv (only while a watcher records)."""
+    path = os.path.join(RECORD_DIR, f"bus_{bus_id}_{datetime.utcnow():%Y-%m-%d}.csv")
+    with _record_lock:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        new_file = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(('t_ms',) + FIELDS)
+            writer.writerows(samples)
+
+
+def relay(bus_id, samples):
+    """
+    Send a batch to the bus's watchers, one downsampled frame per requested
+    rate. Returns True when the bus has watchers.
+    """
+    rates, record = telemetry_watchers.get(bus_id)
+    if not rates or not samples:
+        return bool(rates)
+    samples.sort(key=lambda s: s[0])
+    if record:
+        _record(bus_id, samples)
+    for rate in sorted(rates):
+        frame = {
+            'bus_id': bus_id,
+            'rate': rate,
+            'interval_ms': 1000 // rate,
+            'fields': FIELDS,
+            'buckets': downsample(samples, rate),
+        }
+        emit_to_rooms('telemetry', frame, [telemetry_room(bus_id, rate)])
+    return True
+
+
+def parse_samples(data):
+    """Validate a POSTed batch; returns [[t_ms, ax, ay, az, speed], ...] or raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError('JSON body required')
+    if tuple(data.get('fields') or FIELDS) != FIELDS:
+        raise ValueError(f"fields must be {list(FIELDS)}")
+    samples = data.get('samples') or []
+    if not isinstance(samples, list) or len(samples) > MAX_BATCH:
+        raise ValueError(f"samples must be a list of at most {MAX_BATCH} rows")
+    rows = []
+    for sample in samples:
+        if not isinstance(sample, list) or len(sample) != len(FIELDS) + 1:
+            raise ValueError('each sample is [t_ms, ' + ', '.join(FIELDS) + ']')
+        try:
+            rows.append([int(sample[0])] + [float(v) for v in sample[1:]])
+        except (TypeError, ValueError):
+            raise ValueError('sample values must be numbers')
+    return rows
@@ -0,0 +1,75 @@
+"""
+Shared fixtures for the backend tests.
+Every test gets the Flask app on an empty SQLite database (plus the sample
+buses from init_db) and its own archive and report directories.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+import app as app_module  # noqa: E402  (reads DATABASE_URL at import)
+import archive  # noqa: E402
+import reports  # noqa: E402
+from event_payloads import event_payloads  # noqa: E402
+from extensions import db  # noqa: E402
+from hot_events import hot_events  # noqa: E402
+from routes.analytics import invalidate_timeseries  # noqa: E402
+from routes.dashboard import snapshot_cache  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(archive, '_engines', {})
+    monkeypatch.setattr(reports, 'REPORTS_DIR', str(tmp_path / 'reports'))
+    with app_module.app.app_context():
+        db.drop_all()
+    app_module.init_db()
+    hot_events.clear()
+    event_payloads.clear()
+    snapshot_cache.clear()
+    invalidate_timeseries()
+    yield app_module.app
+    with app_module.app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_event(client):
+    """POST an event for bus 1 (fields override the defaults) and return its id."""
+    def add(**fields):
+        data = {'bus_id': 1, 'event_type': 'HARSH_BRAKE', 'severity': 'HIGH'}
+        data.update(fields)
+        if isinstance(data.get('timestamp'), datetime):
+            data['timestamp'] = data['timestamp'].isoformat()
+        response = client.post('/api/events', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['event_id']
+    return add
+
+
+@pytest.fixture
+def wait_for_job(client):
+    """Poll a maintenance job until it finishes and return its status dict."""
+    def wait(job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = client.get(f'/api/events/purge/{job_id}').get_json()
+            if job.get('finished_at'):
+                return job
+            time.sleep(0.05)
+        raise AssertionError(f'job {job_id} did not finish')
+    return wait
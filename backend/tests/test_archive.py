@@ -0,0 +1,92 @@
+"""archive.merge_newest_first() and reading events back from archive partitions."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import archive
+import jobs
+from extensions import db
+from models import EventArchive
+
+BASE = datetime(2026, 1, 1, 12, 0)
+
+
+def _events(*hours):
+    return [SimpleNamespace(id=h, timestamp=BASE + timedelta(hours=h)) for h in hours]
+
+
+def test_merge_newest_first_interleaves_streams():
+    merged = archive.merge_newest_first(_events(9, 5, 1), _events(8, 2), _events(7))
+
+    assert [e.id for e in merged] == [9, 8, 7, 5, 2, 1]
+
+
+def test_merge_newest_first_handles_empty_and_lazy_streams():
+    lazy = iter(_events(6, 3))
+
+    assert [e.id for e in archive.merge_newest_first([], lazy, _events(4))] == [6, 4, 3]
+    assert list(archive.merge_newest_first()) == []
+
+
+def test_merge_newest_first_puts_missing_timestamps_last():
+    undated = SimpleNamespace(id=0, timestamp=None)
+
+    merged = archive.merge_newest_first([_events(2)[0], undated], _events(1))
+
+    assert [e.id for e in merged] == [2, 1, 0]
+
+
+def test_merge_newest_first_custom_key():
+    rows = [{'id': 3, 'ts': 30}, {'id': 1, 'ts': 10}]
+
+    merged = archive.merge_newest_first(rows, [{'id': 2, 'ts': 20}], key=lambda r: r['ts'])
+
+    assert [r['id'] for r in merged] == [3, 2, 1]
+
+
+def _archive(app, rows):
+    by_month = {}
+    for row in rows:
+        full_row = dict(dict.fromkeys(archive.ARCHIVE_COLUMNS), **row)
+        by_month.setdefault(archive.month_key(row['timestamp']), []).append(full_row)
+    with app.app_context():
+        for month, month_rows in by_month.items():
+            archive.archive_rows(month, month_rows)
+        db.session.commit()
+
+
+def test_archived_rows_read_back_by_range_and_bus(app):
+    _archive(app, [
+        {'id': 1, 'bus_id': 1, 'timestamp': datetime(2025, 1, 10), 'event_type': 'HARSH_BRAKE', 'severity': 'HIGH'},
+        {'id': 2, 'bus_id': 2, 'timestamp': datetime(2025, 1, 20), 'event_type': 'HARSH_ACCEL', 'severity': 'LOW'},
+        {'id': 3, 'bus_id': 1, 'timestamp': datetime(2025, 2, 5), 'event_type': 'TAILGATING', 'severity': 'LOW'},
+    ])
+    with app.app_context():
+        assert db.session.get(EventArchive, '2025-01').bus_ids == [1, 2]
+        assert [e.id for e in archive.iter_events()] == [3, 2, 1]
+        assert [e.id for e in archive.iter_events(bus_id=1)] == [3, 1]
+        assert [e.id for e in archive.iter_events(until=datetime(2025, 1, 31))] == [2, 1]
+        assert archive.spans(bus_id=2) and not archive.spans(bus_id=3)
+        assert archive.get_event(2).event_type == 'HARSH_ACCEL'
+        assert archive.get_event(99) is None
+
+
+def test_scoped_purge_reaches_archived_events_and_their_media(app, client, wait_for_job, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'get_upload_folder', lambda: str(tmp_path))
+    (tmp_path / 'snap_1.jpg').write_bytes(b'jpg')
+    _archive(app, [
+        {'id': 1, 'bus_id': 1, 'timestamp': datetime(2025, 1, 10), 'event_type': 'HARSH_BRAKE',
+         'severity': 'HIGH', 'snapshot_url': '/api/media/snap_1.jpg'},
+        {'id': 2, 'bus_id': 2, 'timestamp': datetime(2025, 1, 20), 'event_type': 'HARSH_ACCEL', 'severity': 'LOW'},
+        {'id': 3, 'bus_id': 1, 'timestamp': datetime(2025, 2, 5), 'event_type': 'TAILGATING', 'severity': 'LOW'},
+    ])
+
+    job_id = client.post('/api/events/purge', json={'bus_id': 1}).get_json()['job']['id']
+    job = wait_for_job(job_id)
+
+    assert job['deleted_count'] == 2
+    assert job['media_removed'] == 1
+    assert not (tmp_path / 'snap_1.jpg').exists()
+    with app.app_context():
+        assert [e.id for e in archive.iter_events()] == [2]
+        assert db.session.get(EventArchive, '2025-01').bus_ids == [2]
+        assert db.session.get(EventArchive, '2025-02') is None
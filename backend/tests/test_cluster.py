@@ -0,0 +1,81 @@
+"""cluster message encoding and the replay of @replicated calls."""
+from datetime import datetime
+
+import pytest
+
+import cluster
+
+
+class Counter:
+    def __init__(self):
+        self.values = []
+
+    @cluster.replicated
+    def add(self, value, when=None):
+        self.values.append((value, when))
+
+    def reset(self):
+        self.values.clear()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append(message)
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cluster, '_targets', {})
+    monkeypatch.setattr(cluster, '_worker_id', 'this-worker')
+    monkeypatch.setattr(cluster, '_redis', redis)
+    counter = cluster.register('counter', Counter())
+    counter.published = redis.messages
+    return counter
+
+
+def test_messages_round_trip_datetimes():
+    when = datetime(2026, 1, 21, 18, 0, 5)
+
+    message = cluster.encode_message('w1', 'counter', 'add', (1,), {'when': when})
+
+    assert cluster.decode_message(message) == ('w1', 'counter', 'add', [1], {'when': when})
+
+
+def test_unencodable_arguments_are_rejected():
+    with pytest.raises(TypeError):
+        cluster.encode_message('w1', 'counter', 'add', (object(),), {})
+
+
+def test_replicated_call_runs_locally_then_publishes(counter):
+    counter.add(1)
+
+    assert counter.values == [(1, None)]
+    assert cluster.decode_message(counter.published[0]) == ('this-worker', 'counter', 'add', [1], {})
+
+
+def test_apply_replays_without_republishing(counter):
+    cluster._apply(cluster.encode_message('other-worker', 'counter', 'add', (2,), {}))
+    cluster._apply(cluster.encode_message('this-worker', 'counter', 'add', (3,), {}))   # our own echo
+
+    assert counter.values == [(2, None)]
+    assert counter.published == []
+
+
+def test_apply_only_runs_replicated_methods(counter):
+    counter.add(1)
+    for method in ('reset', '__init__', 'missing'):
+        with pytest.raises(ValueError):
+            cluster._apply(cluster.encode_message('other-worker', 'counter', method, (), {}))
+
+    assert counter.values == [(1, None)]
+
+
+def test_malformed_messages_are_rejected(counter):
+    with pytest.raises(ValueError):
+        cluster.decode_message('["other-worker", "counter", "add", {"not": "a list"}, {}]')
+    with pytest.raises(ValueError):
+        cluster.decode_message('not json')
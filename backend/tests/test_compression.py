@@ -0,0 +1,73 @@
+"""Accept-Encoding negotiation and buffered/streamed response compression."""
+import gzip
+import zlib
+
+import pytest
+
+import compression
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding('gzip, deflate') == 'gzip'
+    assert compression.choose_encoding('gzip;q=0, identity') is None
+    assert compression.choose_encoding('deflate') is None
+    assert compression.choose_encoding(None) is None
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+def test_choose_encoding_prefers_brotli():
+    assert compression.choose_encoding('gzip, br') == 'br'
+    assert compression.choose_encoding('br;q=0, gzip') == 'gzip'
+
+
+def test_large_json_is_gzipped(client, add_event):
+    for _ in range(10):
+        add_event()
+
+    response = client.get('/api/events', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    plain = client.get('/api/events', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+def test_small_responses_are_left_alone(client):
+    response = client.get('/api/events/purge/missing', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_csv_is_compressed_chunk_by_chunk(client, add_event):
+    add_event()
+
+    response = client.get('/api/export/events', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    body = gzip.decompress(response.get_data()).decode()
+    assert body.startswith('ID,Timestamp')
+    assert len(body.splitlines()) == 2
+
+
+def test_stream_flushes_every_chunk():
+    encoder = compression._GzipStream()
+    decoder = zlib.decompressobj(31)
+
+    # Each compressed chunk decodes on its own, before the stream ends
+    chunks = compression._compress_stream(iter(['first,', 'second']), encoder)
+
+    assert [decoder.decompress(chunk) for chunk in chunks] == [b'first,', b'second', b'']
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+def test_brotli_round_trip(client, add_event):
+    for _ in range(10):
+        add_event()
+
+    response = client.get('/api/events', headers={'Accept-Encoding': 'br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert compression.brotli.decompress(response.get_data()).startswith(b'{')
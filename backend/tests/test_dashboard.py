@@ -0,0 +1,77 @@
+"""/api/dashboard/snapshot and its single-flight cache."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from routes import dashboard
+
+
+@pytest.fixture
+def builds(app, monkeypatch):
+    """Count build_snapshot() calls; `gate` holds builds open until set."""
+    calls = []
+    gate = threading.Event()
+    gate.set()
+    real_build = dashboard.build_snapshot
+
+    def build(events_limit):
+        calls.append(events_limit)
+        gate.wait(5)
+        with app.app_context():
+            return real_build(events_limit)
+
+    monkeypatch.setattr(dashboard, 'build_snapshot', build)
+    return SimpleNamespace(calls=calls, gate=gate)
+
+
+def test_snapshot_bundles_the_first_paint(client, add_event):
+    event_id = add_event()
+
+    body = client.get('/api/dashboard/snapshot?events_limit=5').get_json()
+
+    assert body['latest_event_id'] == event_id
+    assert [e['id'] for e in body['events']['events']] == [event_id]
+    assert body['buses']['count'] == len(body['buses']['buses']) > 0
+    assert body['stats']['today_events'] == 1
+    assert {'locations', 'simulation', 'version'} <= body.keys()
+
+
+def test_snapshots_are_cached_per_limit(client, builds):
+    client.get('/api/dashboard/snapshot?events_limit=5')
+    client.get('/api/dashboard/snapshot?events_limit=5')
+    client.get('/api/dashboard/snapshot?events_limit=10')
+
+    assert builds.calls == [5, 10]
+
+
+def test_concurrent_requests_share_one_build(builds):
+    builds.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dashboard.snapshot_cache.get_or_build(20)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    builds.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert builds.calls == [20]
+    assert len(results) == 4 and all(r is results[0] for r in results)
+
+
+def test_clear_during_a_build_keeps_its_result_out_of_the_cache(builds, monkeypatch):
+    real_build = dashboard.build_snapshot
+
+    def build_then_purge(events_limit):
+        snapshot = real_build(events_limit)
+        dashboard.snapshot_cache.clear()    # a purge finished while this build ran
+        return snapshot
+
+    monkeypatch.setattr(dashboard, 'build_snapshot', build_then_purge)
+    dashboard.snapshot_cache.get_or_build(20)
+    dashboard.snapshot_cache.get_or_build(20)
+
+    assert builds.calls == [20, 20]
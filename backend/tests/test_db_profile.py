@@ -0,0 +1,42 @@
+"""The SQLite production profile and its maintenance task."""
+import sqlite3
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+import db_profile
+
+
+def test_pragmas_are_applied_to_a_raw_connection(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'profile.db')
+    try:
+        db_profile.configure_sqlite_connection(conn)
+
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1   # NORMAL
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == db_profile.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2    # MEMORY
+    finally:
+        conn.close()
+
+
+def test_connect_hook_covers_every_engine(app, tmp_path):
+    db_profile.init_db_profile()
+    db_profile.init_db_profile()   # idempotent
+
+    assert event.contains(Engine, 'connect', db_profile._on_connect)
+    engine = create_engine(f'sqlite:///{tmp_path / "partition.db"}')
+    try:
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+    finally:
+        engine.dispose()
+
+
+def test_maintenance_checkpoints_the_main_database(app, add_event):
+    add_event()
+
+    result = db_profile.sqlite_maintenance(app, analyze=True)
+
+    assert result['busy'] == 0
+    assert result['checkpointed'] == result['wal_pages']
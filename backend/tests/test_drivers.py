@@ -0,0 +1,77 @@
+"""Driver trips, with_event_counts() and the materialized leaderboard."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import DriverStats, Trip, refresh_last_30d_scores
+
+
+@pytest.fixture
+def register(client):
+    """Register a driver and return their auth headers."""
+    def register(username):
+        response = client.post('/api/drivers/register', json={
+            'username': username, 'password': 'secret123', 'full_name': username.title()})
+        assert response.status_code == 201, response.get_json()
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return register
+
+
+def _drive(client, add_event, headers, bus_id, severities):
+    """One trip on bus_id with an event of each severity; returns the trip id."""
+    trip_id = client.post('/api/drivers/me/trip/start', json={'bus_id': bus_id},
+                          headers=headers).get_json()['trip']['id']
+    for severity in severities:
+        add_event(bus_id=bus_id, severity=severity)
+    client.post('/api/drivers/me/trip/stop', headers=headers)
+    return trip_id
+
+
+def test_trip_detail_lists_events_newest_first(client, add_event, register):
+    headers = register('asha')
+    trip_id = client.post('/api/drivers/me/trip/start', json={'bus_id': 1},
+                          headers=headers).get_json()['trip']['id']
+    started = datetime.utcnow()
+    ids = [add_event(timestamp=started + timedelta(seconds=s)) for s in (1, 3, 2)]
+
+    body = client.get(f'/api/drivers/me/trips/{trip_id}', headers=headers).get_json()
+
+    assert [e['id'] for e in body['events']] == [ids[1], ids[2], ids[0]]
+    assert body['trip']['event_count'] == 3
+
+
+def test_trip_history_counts_events_per_trip(client, add_event, register):
+    headers = register('asha')
+    first = _drive(client, add_event, headers, 1, ['LOW'])
+    second = _drive(client, add_event, headers, 2, ['HIGH', 'HIGH'])
+
+    trips = client.get('/api/drivers/me/trips', headers=headers).get_json()['trips']
+
+    assert {t['id']: t['event_count'] for t in trips} == {first: 1, second: 2}
+
+
+def test_leaderboard_ranks_by_score(client, add_event, register):
+    careful = register('careful')
+    _drive(client, add_event, careful, 1, [])
+    reckless = register('reckless')
+    _drive(client, add_event, reckless, 2, ['HIGH'])
+
+    body = client.get('/api/drivers/leaderboard').get_json()
+
+    assert [d['driver_name'] for d in body['drivers']] == ['Careful', 'Reckless']
+    assert [d['rank'] for d in body['drivers']] == [1, 2]
+    assert body['drivers'][0]['avg_score'] > body['drivers'][1]['avg_score']
+    assert body['total'] == 2
+    assert client.get('/api/drivers/leaderboard?sort=name').status_code == 400
+    assert client.get('/api/drivers/leaderboard?per_page=1&page=2').get_json()['drivers'][0]['rank'] == 2
+
+
+def test_last_30d_score_ages_out(app, client, add_event, register):
+    _drive(client, add_event, register('asha'), 1, [])
+    with app.app_context():
+        assert DriverStats.query.one().last_30d_score is not None
+        Trip.query.update({'ended_at': datetime.utcnow() - timedelta(days=31)})
+        refresh_last_30d_scores()
+        db.session.commit()
+        assert DriverStats.query.one().last_30d_score is None
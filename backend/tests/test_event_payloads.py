@@ -0,0 +1,65 @@
+"""EventPayloadCache and the list responses spliced from it."""
+import json
+from types import SimpleNamespace
+
+from event_payloads import EventPayloadCache, event_payloads, events_response
+
+
+def _row(event_id):
+    return SimpleNamespace(id=event_id, to_dict=lambda: {'id': event_id, 'severity': 'HIGH'})
+
+
+def test_cache_evicts_least_recently_used():
+    cache = EventPayloadCache(max_size=2)
+    cache.put({'id': 1})
+    cache.put({'id': 2})
+    cache.get(1)
+    cache.put({'id': 3})
+
+    assert cache.get(2) is None
+    assert json.loads(cache.get(1)) == {'id': 1}
+    assert len(cache) == 2
+
+
+def test_render_ids_loads_only_missing_rows_in_order():
+    cache = EventPayloadCache(max_size=10)
+    cache.put({'id': 2, 'severity': 'LOW'})
+    loaded = []
+
+    def load(missing):
+        loaded.extend(missing)
+        return [_row(i) for i in missing if i != 4]   # 4 was deleted meanwhile
+
+    fragments = cache.render_ids([3, 2, 1, 4], load)
+
+    assert loaded == [3, 1, 4]
+    assert [json.loads(f)['id'] for f in fragments] == [3, 2, 1]
+    assert json.loads(fragments[1])['severity'] == 'LOW'
+
+
+def test_events_response_splices_fragments():
+    fragments = [b'{"id":1}', b'{"id":2}']
+
+    assert json.loads(events_response({'count': 2}, fragments).get_data()) == {
+        'count': 2, 'events': [{'id': 1}, {'id': 2}]}
+    assert json.loads(events_response({}, [], key='rows').get_data()) == {'rows': []}
+
+
+def test_acknowledge_replaces_the_cached_payload(client, add_event):
+    event_id = add_event()
+    assert json.loads(event_payloads.get(event_id))['acknowledged'] is False
+
+    client.post(f'/api/events/{event_id}/acknowledge')
+
+    assert json.loads(event_payloads.get(event_id))['acknowledged'] is True
+    listed = client.get('/api/events').get_json()['events']
+    assert [e['acknowledged'] for e in listed] == [True]
+
+
+def test_bulk_acknowledge_by_filter_drops_cached_payloads(client, add_event):
+    event_id = add_event()
+
+    client.post('/api/events/acknowledge', json={'filter': {'bus_id': 1}})
+
+    assert event_payloads.get(event_id) is None
+    assert client.get('/api/events').get_json()['events'][0]['acknowledged'] is True
@@ -0,0 +1,148 @@
+"""Bulk acknowledge and purge flows of the events API."""
+from datetime import datetime, timedelta
+
+
+def _acknowledged(client, event_id):
+    return client.get(f'/api/events/{event_id}').get_json()['acknowledged']
+
+
+# ==================== BULK ACKNOWLEDGE ====================
+
+def test_acknowledge_by_ids(client, add_event):
+    first, second, other = add_event(), add_event(), add_event()
+
+    response = client.post('/api/events/acknowledge', json={'ids': [first, second]})
+
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 2
+    assert _acknowledged(client, first) and _acknowledged(client, second)
+    assert not _acknowledged(client, other)
+
+
+def test_acknowledge_counts_each_event_once(client, add_event):
+    event_id = add_event()
+    client.post('/api/events/acknowledge', json={'ids': [event_id]})
+
+    response = client.post('/api/events/acknowledge', json={'ids': [event_id]})
+
+    assert response.get_json()['count'] == 0
+
+
+def test_acknowledge_by_filter(client, add_event):
+    now = datetime.utcnow()
+    old = add_event(bus_id=1, timestamp=now - timedelta(hours=2))
+    recent = add_event(bus_id=1, timestamp=now)
+    other_bus = add_event(bus_id=2, timestamp=now - timedelta(hours=2))
+
+    response = client.post('/api/events/acknowledge', json={
+        'filter': {'bus_id': 1, 'before': (now - timedelta(hours=1)).isoformat() + 'Z'}
+    })
+
+    assert response.get_json()['count'] == 1
+    assert _acknowledged(client, old)
+    assert not _acknowledged(client, recent)
+    assert not _acknowledged(client, other_bus)
+    # The hot window answers the default list; it must agree with the table
+    listed = {e['id']: e['acknowledged'] for e in client.get('/api/events').get_json()['events']}
+    assert listed[old] and not listed[recent]
+
+
+def test_acknowledge_rejects_bad_input(client):
+    assert client.post('/api/events/acknowledge', json={}).status_code == 400
+    assert client.post('/api/events/acknowledge', json={'ids': 'all'}).status_code == 400
+    assert client.post('/api/events/acknowledge', json={'ids': ['x']}).status_code == 400
+    assert client.post('/api/events/acknowledge', json={'filter': {'before': 'yesterday'}}).status_code == 400
+
+
+def test_acknowledge_reaches_archived_events(client, add_event, wait_for_job):
+    archived = add_event(timestamp=datetime.utcnow() - timedelta(days=40))
+    job = client.post('/api/events/archive', json={'older_than_days': 30}).get_json()['job']
+    assert wait_for_job(job['id'])['archived_count'] == 1
+
+    response = client.post('/api/events/acknowledge', json={'ids': [archived]})
+
+    assert response.get_json()['count'] == 1
+    assert _acknowledged(client, archived)
+
+
+# ==================== PURGE ====================
+
+def test_purge_older_than(client, add_event, wait_for_job):
+    old = add_event(timestamp=datetime.utcnow() - timedelta(days=10))
+    recent = add_event()
+
+    response = client.post('/api/events/purge', json={'older_than_days': 5, 'chunk_size': 1})
+
+    assert response.status_code == 202
+    job = wait_for_job(response.get_json()['job']['id'])
+    assert job['status'] == 'completed'
+    assert job['deleted_count'] == 1
+    assert client.get(f'/api/events/{old}').status_code == 404
+    assert client.get(f'/api/events/{recent}').status_code == 200
+    assert [e['id'] for e in client.get('/api/events').get_json()['events']] == [recent]
+
+
+def test_purge_by_bus(client, add_event, wait_for_job):
+    add_event(bus_id=1)
+    kept = add_event(bus_id=2)
+
+    job_id = client.post('/api/events/purge', json={'bus_id': 1}).get_json()['job']['id']
+
+    assert wait_for_job(job_id)['deleted_count'] == 1
+    assert [e['id'] for e in client.get('/api/events').get_json()['events']] == [kept]
+
+
+def test_purge_requires_a_scope(client):
+    assert client.post('/api/events/purge', json={}).status_code == 400
+
+
+def test_purge_jobs_are_listed_and_unknown_ids_404(client, wait_for_job):
+    job_id = client.post('/api/events/purge', json={'older_than_days': 1}).get_json()['job']['id']
+    wait_for_job(job_id)
+
+    jobs = client.get('/api/events/purge').get_json()['jobs']
+
+    assert job_id in [job['id'] for job in jobs]
+    assert client.get('/api/events/purge/missing').status_code == 404
+
+
+def test_non_numeric_bus_id_is_rejected(client):
+    assert client.get('/api/events?bus_id=abc').status_code == 400
+    assert client.get('/api/export/events?bus_id=abc').status_code == 400
+    response = client.post('/api/events/acknowledge', json={'filter': {'bus_id': 'abc'}})
+    assert response.status_code == 400
+
+
+# ==================== SPARSE FIELDSETS ====================
+
+def test_sparse_fields(client, add_event):
+    first = add_event(severity='LOW', timestamp=datetime.utcnow() - timedelta(minutes=1))
+    second = add_event(severity='HIGH', location={'lat': 9.93, 'lng': 76.26})
+
+    # The hot window answers the first query; after_id forces the SQL path
+    for query in ('', '&after_id=0'):
+        body = client.get(f'/api/events?fields=id,severity,bus_registration{query}').get_json()
+
+        assert body['events'] == [
+            {'id': second, 'severity': 'HIGH', 'bus_registration': 'KL-01-AB-1234'},
+            {'id': first, 'severity': 'LOW', 'bus_registration': 'KL-01-AB-1234'},
+        ]
+
+
+def test_columnar_format(client, add_event):
+    first = add_event(timestamp=datetime.utcnow() - timedelta(minutes=1))
+    second = add_event(location={'lat': 9.93, 'lng': 76.26})
+
+    for query in ('', '&after_id=0'):
+        body = client.get(f'/api/events?fields=id,location_lat&format=columnar{query}').get_json()
+
+        assert body['format'] == 'columnar'
+        assert body['fields'] == ['id', 'location_lat']
+        assert body['events'] == {'id': [second, first], 'location_lat': [9.93, None]}
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get('/api/events?fields=id,password')
+
+    assert response.status_code == 400
+    assert 'password' in response.get_json()['error']
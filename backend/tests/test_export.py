@@ -0,0 +1,60 @@
+"""Parquet and Arrow IPC event exports."""
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+from extensions import db
+from routes import export
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+
+def test_parquet_export_round_trips(client, add_event):
+    older = add_event(severity='LOW', timestamp=datetime.utcnow() - timedelta(hours=1))
+    newer = add_event(severity='HIGH', location={'lat': 9.93, 'lng': 76.26})
+
+    response = client.get('/api/export/events.parquet')
+
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column_names == [name for name, _ in export.COLUMNAR_COLUMNS]
+    assert table.column('id').to_pylist() == [newer, older]
+    assert table.column('severity').to_pylist() == ['HIGH', 'LOW']
+    assert table.column('location_lat').to_pylist() == [9.93, None]
+    assert table.column('bus_registration').to_pylist() == ['KL-01-AB-1234'] * 2
+    assert pa.types.is_dictionary(table.schema.field('event_type').type)
+
+
+def test_arrow_export_streams_one_batch_per_chunk(client, add_event, monkeypatch):
+    monkeypatch.setattr(export, 'COLUMNAR_BATCH_ROWS', 2)
+    ids = [add_event(timestamp=datetime.utcnow() - timedelta(minutes=m)) for m in range(5)]
+
+    response = client.get('/api/export/events.arrow')
+
+    assert response.is_streamed
+    reader = pa.ipc.open_stream(io.BytesIO(response.get_data()))
+    batches = list(reader)
+    assert [b.num_rows for b in batches] == [2, 2, 1]
+    assert pa.Table.from_batches(batches).column('id').to_pylist() == ids
+
+
+def test_export_filters_and_merges_archived_months(app, client, add_event):
+    live = add_event(bus_id=1)
+    add_event(bus_id=2)
+    archived_at = datetime.utcnow() - timedelta(days=400)
+    with app.app_context():
+        row = dict(dict.fromkeys(archive.ARCHIVE_COLUMNS), id=10**6, bus_id=1, timestamp=archived_at,
+                   event_type='HARSH_BRAKE', severity='HIGH')
+        archive.archive_rows(archive.month_key(archived_at), [row])
+        db.session.commit()
+    since = (archived_at - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    response = client.get(f'/api/export/events.parquet?bus_id=1&since={since}')
+
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column('id').to_pylist() == [live, 10**6]
+    assert table.column('bus_registration').to_pylist() == ['KL-01-AB-1234'] * 2
@@ -0,0 +1,92 @@
+"""HotEventIndex.query() and covers()."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from hot_events import HotEventIndex
+
+
+def _event(event_id, minutes_ago, bus_id=1, event_type='HARSH_BRAKE', severity='HIGH'):
+    return {
+        'id': event_id,
+        'bus_id': bus_id,
+        'event_type': event_type,
+        'severity': severity,
+        'timestamp': (datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat(),
+        'acknowledged': False,
+    }
+
+
+@pytest.fixture
+def index(app):
+    index = HotEventIndex(hours=1)
+    with app.app_context():
+        index.load()
+    return index
+
+
+def test_query_returns_newest_first(index):
+    for event_id, minutes_ago in ((1, 30), (2, 10), (3, 20)):
+        index.add(_event(event_id, minutes_ago))
+
+    assert [e['id'] for e in index.query()] == [2, 3, 1]
+
+
+def test_query_filters_and_limits(index):
+    index.add(_event(1, 5, bus_id=1, severity='LOW'))
+    index.add(_event(2, 4, bus_id=2, severity='HIGH'))
+    index.add(_event(3, 3, bus_id=1, severity='HIGH'))
+    index.add(_event(4, 2, bus_id=1, severity='HIGH'))
+
+    assert [e['id'] for e in index.query(bus_id=1, severity='HIGH')] == [4, 3]
+    assert [e['id'] for e in index.query(bus_id='2')] == [2]
+    assert [e['id'] for e in index.query(limit=2)] == [4, 3]
+    assert index.query(event_type='TAILGATING') == []
+
+
+def test_query_since(index):
+    index.add(_event(1, 50))
+    index.add(_event(2, 5))
+
+    since = datetime.utcnow() - timedelta(minutes=10)
+
+    assert [e['id'] for e in index.query(since=since)] == [2]
+
+
+def test_events_outside_the_window_are_not_kept(index):
+    index.add(_event(1, 90))
+
+    assert index.query() == []
+    assert len(index) == 0
+
+
+def test_add_replaces_and_remove_drops(index):
+    index.add(_event(1, 5, severity='LOW'))
+    index.add(_event(1, 5, severity='HIGH'))
+    index.add(_event(2, 4))
+
+    assert [e['severity'] for e in index.query(severity='HIGH')] == ['HIGH', 'HIGH']
+    assert index.query(severity='LOW') == []
+
+    index.remove([1])
+    assert [e['id'] for e in index.query()] == [2]
+
+
+def test_covers_only_the_loaded_window(app):
+    index = HotEventIndex(hours=1)
+    inside = datetime.utcnow() - timedelta(minutes=30)
+    outside = datetime.utcnow() - timedelta(hours=2)
+
+    assert not index.covers(inside)    # nothing loaded yet
+    with app.app_context():
+        index.load()
+    assert index.covers(inside)
+    assert not index.covers(outside)
+
+
+def test_disabled_index_covers_nothing(app):
+    index = HotEventIndex(hours=0)
+    with app.app_context():
+        index.load()
+
+    assert not index.covers(datetime.utcnow())
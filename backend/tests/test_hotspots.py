@@ -0,0 +1,63 @@
+"""Geohash helpers and /api/events/hotspots aggregation."""
+import pytest
+
+import geo
+
+KOCHI = (9.9312, 76.2673)
+KOCHI_NEARBY = (9.9313, 76.2674)
+DELHI = (28.6139, 77.2090)
+
+
+def test_encode_known_geohash():
+    assert geo.encode(42.6, -5.6, 5) == 'ezs42'
+
+
+def test_decode_bounds_contains_the_point():
+    south, west, north, east = geo.decode_bounds(geo.encode(*KOCHI))
+
+    assert south <= KOCHI[0] <= north and west <= KOCHI[1] <= east
+
+
+def test_precision_grows_with_zoom():
+    assert geo.precision_for_zoom(1) == 1
+    assert geo.precision_for_zoom(12) == 6
+    assert geo.precision_for_zoom(18) == geo.GEOHASH_PRECISION
+
+
+def test_parse_bbox():
+    assert geo.parse_bbox('9,76,10,77') == (9.0, 76.0, 10.0, 77.0)
+    with pytest.raises(ValueError):
+        geo.parse_bbox('9,76,10')
+    with pytest.raises(ValueError):
+        geo.parse_bbox('10,76,9,77')
+
+
+def _add_at(add_event, point, severity='HIGH'):
+    return add_event(severity=severity, location={'lat': point[0], 'lng': point[1]})
+
+
+def test_hotspots_group_nearby_events_into_one_cell(client, add_event):
+    _add_at(add_event, KOCHI, 'HIGH')
+    _add_at(add_event, KOCHI_NEARBY, 'LOW')
+    _add_at(add_event, DELHI)
+
+    body = client.get('/api/events/hotspots?zoom=12').get_json()
+
+    assert body['precision'] == 6
+    assert body['total_events'] == 3
+    top = body['cells'][0]
+    assert top['count'] == 2
+    assert top['severity'] == {'HIGH': 1, 'LOW': 1}
+    assert top['lat'] == pytest.approx((KOCHI[0] + KOCHI_NEARBY[0]) / 2)
+    assert top['cell'] == geo.encode(*KOCHI, 6)
+
+
+def test_hotspots_bbox_and_string_coordinates(client, add_event):
+    add_event(location={'lat': str(KOCHI[0]), 'lng': str(KOCHI[1])})
+    _add_at(add_event, DELHI)
+
+    body = client.get('/api/events/hotspots?bbox=9,76,10,77').get_json()
+
+    assert [c['count'] for c in body['cells']] == [1]
+    assert client.get('/api/events/hotspots?bbox=9,76').status_code == 400
+    assert client.post('/api/events', json={'bus_id': 1, 'location': {'lat': 'x', 'lng': 1}}).status_code == 400
@@ -0,0 +1,85 @@
+"""The single-flight, fingerprinted AI insights cache."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from routes import analytics
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Stand-in for the Gemini call that counts calls and can be held open."""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def call(stats):
+        calls.append(stats)
+        release.wait(5)
+        return {'overall_summary': f'call {len(calls)}'}, False
+
+    monkeypatch.setattr(analytics, 'call_insights_model', call)
+    monkeypatch.setattr(analytics, '_insights_entry', None)
+    monkeypatch.setattr(analytics, '_insights_flight', None)
+    return SimpleNamespace(calls=calls, release=release)
+
+
+def test_concurrent_requests_share_one_computation(app, model):
+    model.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(analytics.get_cached_insights(app)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    model.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(model.calls) == 1
+    assert len(results) == 5
+    assert all(entry is results[0] for entry in results)
+
+
+def test_fresh_entry_is_served_from_the_cache(client, model):
+    first = client.get('/api/analytics/insights').get_json()
+    second = client.get('/api/analytics/insights').get_json()
+
+    assert len(model.calls) == 1
+    assert second == first
+    assert first['data'] == {'overall_summary': 'call 1'}
+
+
+def test_unchanged_stats_do_not_call_the_model_again(app, model):
+    entry = analytics.get_cached_insights(app)
+    flight = analytics._InsightsFlight()
+
+    analytics._compute_insights(app, flight)
+
+    assert len(model.calls) == 1
+    assert flight.entry['data'] == entry['data']
+    assert flight.entry['computed_at'] >= entry['computed_at']
+
+
+def test_expired_entry_is_recomputed_with_new_stats(app, add_event, model):
+    analytics.get_cached_insights(app)
+    analytics._insights_entry['computed_at'] -= analytics.INSIGHTS_TTL_SECONDS + 1
+    add_event()
+
+    entry = analytics.get_cached_insights(app)
+
+    assert len(model.calls) == 2
+    assert entry['data'] == {'overall_summary': 'call 2'}
+
+
+def test_model_errors_are_reported(client, model, monkeypatch):
+    def fail(stats):
+        raise ValueError('Failed to parse AI response')
+    monkeypatch.setattr(analytics, 'call_insights_model', fail)
+
+    response = client.get('/api/analytics/insights')
+
+    assert response.status_code == 500
+    assert analytics._insights_flight is None
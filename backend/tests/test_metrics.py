@@ -0,0 +1,69 @@
+"""metrics: series rendering, the event_type label and SQL instrumentation."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+from extensions import db
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('test_seconds', 'Test latency.', ('route',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe('/a', value=value)
+
+    assert histogram.render() == [
+        '# HELP test_seconds Test latency.',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_seconds_bucket{route="/a",le="1.0"} 2',
+        'test_seconds_bucket{route="/a",le="+Inf"} 3',
+        'test_seconds_sum{route="/a"} 5.55',
+        'test_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_collect_adds_other_workers_snapshots():
+    counter = metrics.Counter('test_total', 'Test counter.', ('kind',))
+    counter.inc('a', amount=2)
+    other = {'test_total': {'["a"]': 3, '["b"]': 1}}
+
+    assert counter.collect([other]) == [(('a',), 5), (('b',), 1)]
+
+
+def test_unknown_event_types_are_counted_as_other():
+    before = dict(metrics.events_ingested.collect())
+
+    metrics.count_event('HARSH_BRAKE')
+    metrics.count_event('made-up')
+
+    after = dict(metrics.events_ingested.collect())
+    assert after[('HARSH_BRAKE',)] == before.get(('HARSH_BRAKE',), 0) + 1
+    assert after[('OTHER',)] == before.get(('OTHER',), 0) + 1
+    assert ('made-up',) not in after
+
+
+def test_failed_statement_does_not_skew_later_timings(app):
+    def selects():
+        return dict(metrics.db_duration.collect()).get(('SELECT',), [0.0, 0])[-2:]
+
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        before_sum, before_count = selects()
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        after_sum, after_count = selects()
+
+    assert after_count == before_count + 1
+    assert after_sum - before_sum < 1
+
+
+def test_metrics_endpoint_exposes_requests(client):
+    client.get('/api/buses')
+
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE http_requests_total counter' in body
+    assert 'http_requests_total{blueprint="buses",route="/api/buses",method="GET",status="200"}' in body
@@ -0,0 +1,70 @@
+"""Pi registry backends: heartbeats, lookup and TTL expiry."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import pi_registry
+from extensions import db
+from models import PiDevice
+
+
+@pytest.fixture(params=['memory', 'sql'])
+def registry(request, app):
+    with app.app_context():
+        yield pi_registry.create_registry(request.param)
+
+
+def _expire(registry, bus_registration):
+    """Age a heartbeat past the TTL."""
+    stale = datetime.utcnow() - registry.ttl - timedelta(seconds=1)
+    if isinstance(registry, pi_registry.SqlPiRegistry):
+        db.session.get(PiDevice, bus_registration).last_seen = stale
+        db.session.commit()
+    else:
+        entry, _ = registry._entries[bus_registration]
+        registry._entries[bus_registration] = (entry, stale)
+
+
+def test_heartbeat_then_lookup(registry):
+    registry.heartbeat('KL-01-AB-1234', '10.0.0.5', 8080, 8081)
+    registry.heartbeat('KL-01-AB-1234', '10.0.0.6', 8080, 8081, 'https://pi.example')
+
+    entry = registry.get('KL-01-AB-1234')
+
+    assert entry['pi_ip'] == '10.0.0.6'
+    assert entry['tunnel_url'] == 'https://pi.example'
+    assert registry.get('KL-99') is None
+    assert [e['bus_registration'] for e in registry.all()] == ['KL-01-AB-1234']
+
+
+def test_only_needs_exactly_one_live_pi(registry):
+    assert registry.only() is None
+    registry.heartbeat('KL-01', '10.0.0.5', 8080, 8081)
+    assert registry.only()['bus_registration'] == 'KL-01'
+    registry.heartbeat('KL-02', '10.0.0.6', 8080, 8081)
+    assert registry.only() is None
+
+
+def test_entries_expire_after_the_ttl(registry):
+    registry.heartbeat('KL-01', '10.0.0.5', 8080, 8081)
+    registry.heartbeat('KL-02', '10.0.0.6', 8080, 8081)
+
+    _expire(registry, 'KL-01')
+
+    assert registry.get('KL-01') is None
+    assert [e['bus_registration'] for e in registry.all()] == ['KL-02']
+    assert registry.only()['bus_registration'] == 'KL-02'
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoLookup(pi_registry.PiRegistry):
+        def heartbeat(self, bus_registration, pi_ip, gps_port, demo_port, tunnel_url=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        NoLookup(60)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        pi_registry.create_registry('etcd')
@@ -0,0 +1,70 @@
+"""
+The Postgres profile's URL handling, pool options and bulk loaders.
+No Postgres server is needed: COPY is checked against a fake cursor and the
+bulk helpers' SQLite fallbacks run on the test database.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import db_profile
+from extensions import db
+from models import DrivingEvent
+
+
+def test_normalize_database_url():
+    assert db_profile.normalize_database_url('postgres://u:p@host/db') == 'postgresql://u:p@host/db'
+    assert db_profile.normalize_database_url('postgresql+psycopg://host/db') == 'postgresql+psycopg://host/db'
+    assert db_profile.normalize_database_url('sqlite:///x.db') == 'sqlite:///x.db'
+
+
+def test_engine_options_only_tune_postgres(monkeypatch):
+    assert db_profile.engine_options('sqlite:///x.db') == {}
+
+    options = db_profile.engine_options('postgresql://host/db')
+    assert options['pool_size'] == db_profile.PG_POOL_SIZE
+    assert options['pool_pre_ping'] is True
+    assert 'options' not in options['connect_args']
+
+    monkeypatch.setattr(db_profile, 'PG_STATEMENT_TIMEOUT_MS', 5000)
+    assert db_profile.engine_options('postgresql://host/db')['connect_args']['options'] == \
+        '-c statement_timeout=5000'
+
+
+def test_copy_rows_writes_csv_with_nulls_and_timestamps(monkeypatch):
+    copied = []
+
+    class Cursor:
+        def copy_expert(self, sql, buffer):
+            copied.append((sql, buffer.read()))
+
+        def close(self):
+            pass
+
+    connection = SimpleNamespace(connection=SimpleNamespace(cursor=Cursor))
+    monkeypatch.setattr(db_profile, 'db', SimpleNamespace(session=SimpleNamespace(connection=lambda: connection)))
+
+    db_profile.copy_rows('driving_events', ['id', 'event_type', 'timestamp', 'location_address', 'notes'],
+                         [[1, 'HARSH_BRAKE', datetime(2026, 1, 21, 18, 0, 5), None, 'said "stop"'],
+                          [2, 'SPEEDING', datetime(2026, 1, 21, 18, 1), '', None]])
+
+    # None must stay an unquoted empty field (NULL), distinct from a quoted empty string
+    assert copied == [(
+        'COPY driving_events (id, event_type, timestamp, location_address, notes) FROM STDIN WITH (FORMAT csv)',
+        '1,"HARSH_BRAKE","2026-01-21 18:00:05",,"said ""stop"""\n'
+        '2,"SPEEDING","2026-01-21 18:01:00","",\n',
+    )]
+
+
+def test_bulk_helpers_fall_back_off_postgres(app):
+    table = DrivingEvent.__table__
+    now = datetime.utcnow()
+    with app.app_context():
+        assert not db_profile.is_postgres()
+        db_profile.bulk_insert(table, [
+            {'id': i, 'bus_id': 1, 'event_type': 'HARSH_BRAKE', 'severity': 'HIGH', 'timestamp': now}
+            for i in (1, 2)
+        ])
+        db_profile.bulk_update(table, 'id', 'geohash', [(1, 't9z'), (2, 't9y')])
+        db.session.commit()
+
+        assert dict(db.session.query(DrivingEvent.id, DrivingEvent.geohash).all()) == {1: 't9z', 2: 't9y'}
@@ -0,0 +1,55 @@
+"""Daily/weekly report artefacts and the live open-period report."""
+import os
+from datetime import datetime, timedelta
+
+import reports
+
+
+def _today_key():
+    return reports.period_key('day', datetime.utcnow())
+
+
+def test_period_keys_round_trip():
+    monday = datetime(2026, 1, 19)
+
+    assert reports.period_bounds('week', datetime(2026, 1, 21, 15)) == (monday, monday + timedelta(days=7))
+    assert reports.period_key('week', monday) == '2026-W04'
+    assert reports.parse_period_key('week', '2026-W04') == monday
+    assert reports.parse_period_key('day', '2026-01-21') == datetime(2026, 1, 21)
+
+
+def test_open_period_csv_is_streamed(client, add_event):
+    event_id = add_event()
+
+    response = client.get(f'/api/export/reports/day/{_today_key()}.csv')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('ID,Timestamp')
+    assert [line.split(',')[0] for line in lines[1:]] == [str(event_id)]
+
+
+def test_closed_period_is_written_once_and_dropped_by_a_late_upload(client, add_event):
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    key = reports.period_key('day', yesterday)
+    path = reports.artefact_path('day', key, 'json')
+    add_event(timestamp=yesterday)
+
+    report = client.get(f'/api/export/reports/day/{key}.json').get_json()
+
+    assert report['summary']['total_events'] == 1
+    assert os.path.exists(path)
+    assert key in [r['period'] for r in client.get('/api/export/reports').get_json()['day']]
+
+    add_event(timestamp=yesterday)
+    assert not os.path.exists(path)
+    assert client.get(f'/api/export/reports/day/{key}.json').get_json()['summary']['total_events'] == 2
+
+
+def test_unknown_and_future_periods_404(client):
+    tomorrow = reports.period_key('day', datetime.utcnow() + timedelta(days=1))
+
+    assert client.get('/api/export/reports/month/2026-01.json').status_code == 404
+    assert client.get('/api/export/reports/day/2026-13-40.json').status_code == 404
+    assert client.get(f'/api/export/reports/day/{tomorrow}.json').status_code == 404
@@ -0,0 +1,134 @@
+"""shards.merge_shard() and the pending-row readers around it."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import shards
+from extensions import db
+from models import Bus, BusLocation, DrivingEvent
+
+
+@pytest.fixture
+def sharded(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, 'EVENT_SHARDS', 3)
+    monkeypatch.setattr(shards, 'enabled', True)
+    monkeypatch.setattr(shards, 'SHARD_DIR', str(tmp_path / 'shards'))
+    monkeypatch.setattr(shards, '_engines', {})
+    monkeypatch.setattr(shards, '_leftover_shards', None)
+    monkeypatch.setattr(shards, 'pending_counts', shards.PendingCounts())
+    monkeypatch.setattr(shards, '_buses_loaded_at', 0.0)
+    with app.app_context():
+        yield db.session.get(Bus, 1)
+
+
+def _store(bus, minutes_ago=0, **location):
+    event = DrivingEvent(bus_id=bus.id, event_type='HARSH_BRAKE', severity='HIGH',
+                         timestamp=datetime.utcnow() - timedelta(minutes=minutes_ago))
+    if location:
+        location = dict(location, bus_id=bus.id)
+    return shards.store_event(event, bus, location or None).id
+
+
+def test_merge_moves_events_into_the_main_table(sharded):
+    shard = shards.shard_for(sharded.id)
+    ids = [_store(sharded, minutes_ago=2), _store(sharded, minutes_ago=1)]
+    assert DrivingEvent.query.count() == 0
+    assert shards.has_pending()
+
+    assert shards.merge_shard(shard) == 2
+
+    assert sorted(e.id for e in DrivingEvent.query.all()) == sorted(ids)
+    assert all(shards.shard_of_event(i) == shard for i in ids)
+    assert shards.pending_counts.get(shard) == 0
+    assert list(shards.iter_pending()) == []
+    # Shards never merged have no count yet and still count as pending
+    assert shards.has_pending()
+    shards.drain()
+    assert not shards.has_pending()
+
+
+def test_merge_takes_one_batch_at_a_time(sharded):
+    shard = shards.shard_for(sharded.id)
+    for minutes_ago in (3, 2, 1):
+        _store(sharded, minutes_ago)
+
+    assert shards.merge_shard(shard, batch=2) == 2
+    assert shards.pending_counts.get(shard) == 1
+    assert len(list(shards.iter_pending())) == 1
+
+    assert shards.merge_shard(shard, batch=2) == 1
+    assert DrivingEvent.query.count() == 3
+
+
+def test_merge_is_idempotent_after_a_partial_run(sharded):
+    # A crash after the main commit leaves the row in both places
+    shard = shards.shard_for(sharded.id)
+    event_id = _store(sharded)
+    row = next(shards.iter_pending())
+    db.session.add(DrivingEvent(id=event_id, bus_id=row.bus_id, event_type=row.event_type,
+                                severity=row.severity, timestamp=row.timestamp))
+    db.session.commit()
+
+    assert shards.merge_shard(shard) == 1
+    assert DrivingEvent.query.filter_by(id=event_id).count() == 1
+
+
+def test_pending_events_read_newest_first_with_their_bus(sharded):
+    older = _store(sharded, minutes_ago=5)
+    newer = _store(sharded, minutes_ago=1)
+
+    pending = list(shards.iter_pending(bus_id=sharded.id))
+
+    assert [e.id for e in pending] == [newer, older]
+    assert pending[0].to_dict()['bus_registration'] == sharded.registration_number
+
+
+def test_merge_upserts_the_newest_location(sharded):
+    shard = shards.shard_for(sharded.id)
+    _store(sharded, latitude=10.0, longitude=76.0)
+    shards.merge_shard(shard)
+    assert BusLocation.query.filter_by(bus_id=sharded.id).one().latitude == 10.0
+
+    # A location older than the stored one (late merge from another worker) must not win
+    shards.store_location({'bus_id': sharded.id, 'latitude': 11.0, 'longitude': 76.0,
+                           'updated_at': datetime.utcnow() - timedelta(hours=1)})
+    shards.merge_shard(shard)
+    db.session.expire_all()
+    assert BusLocation.query.filter_by(bus_id=sharded.id).one().latitude == 10.0
+
+    shards.store_location({'bus_id': sharded.id, 'latitude': 12.0, 'longitude': 76.0})
+    shards.merge_shard(shard)
+    db.session.expire_all()
+    assert BusLocation.query.filter_by(bus_id=sharded.id).count() == 1
+    assert BusLocation.query.filter_by(bus_id=sharded.id).one().latitude == 12.0
+
+
+def test_reset_deletes_events_still_waiting_in_a_shard(sharded, client, wait_for_job):
+    shard = shards.shard_for(sharded.id)
+    _store(sharded)
+
+    job_id = client.delete('/api/events/reset').get_json()['job']['id']
+    assert wait_for_job(job_id)['status'] == 'completed'
+    shards.merge_shard(shard)
+
+    assert DrivingEvent.query.count() == 0
+    assert list(shards.iter_pending()) == []
+
+
+def test_sharded_location_update_coerces_coordinates(sharded, client):
+    response = client.post(f'/api/buses/{sharded.id}/location', json={'lat': '9.93', 'lng': '76.26'})
+
+    assert response.status_code == 200
+    assert response.get_json()['location']['latitude'] == 9.93
+    assert client.post(f'/api/buses/{sharded.id}/location', json={'lat': 'north', 'lng': 76.26}).status_code == 400
+    shards.merge_shard(shards.shard_for(sharded.id))
+    assert BusLocation.query.filter_by(bus_id=sharded.id).one().latitude == 9.93
+
+
+def test_dashboard_cursor_includes_events_waiting_in_a_shard(sharded, client):
+    event_id = _store(sharded)
+
+    snapshot = client.get('/api/dashboard/snapshot').get_json()
+
+    assert snapshot['latest_event_id'] == event_id
+    assert snapshot['version'].startswith(f'{event_id}:')
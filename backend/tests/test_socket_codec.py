@@ -0,0 +1,50 @@
+"""socket_codec.encode() and negotiate()."""
+import json
+from datetime import datetime
+
+import pytest
+
+import socket_codec
+
+msgpack = pytest.importorskip('msgpack')
+
+
+def test_encode_shortens_known_keys_recursively():
+    event = {
+        'id': 7,
+        'bus_id': 1,
+        'event_type': 'HARSH_BRAKE',
+        'location': {'lat': 9.93, 'lng': 76.26, 'address': None},
+        'custom': 'kept',
+    }
+
+    decoded = msgpack.unpackb(socket_codec.encode(event))
+
+    assert decoded == {
+        'i': 7,
+        'b': 1,
+        'e': 'HARSH_BRAKE',
+        'l': {'la': 9.93, 'ln': 76.26, 'ad': None},
+        'custom': 'kept',
+    }
+
+
+def test_encode_handles_lists_and_datetimes():
+    when = datetime(2026, 1, 21, 18, 0, 5)
+
+    decoded = msgpack.unpackb(socket_codec.encode({'events': [{'id': 1, 'timestamp': when}]}))
+
+    assert decoded == {'events': [{'i': 1, 't': '2026-01-21T18:00:05'}]}
+
+
+def test_encode_is_smaller_than_json():
+    event = {'id': 123, 'bus_id': 1, 'bus_registration': 'KL-01-AB-1234', 'severity': 'HIGH',
+             'acceleration_x': -0.52, 'acknowledged': False, 'has_video': False}
+
+    assert len(socket_codec.encode(event)) < len(json.dumps(event))
+
+
+def test_negotiate_falls_back_to_json():
+    assert socket_codec.negotiate('msgpack') == socket_codec.MSGPACK
+    assert socket_codec.negotiate('cbor') == socket_codec.JSON
+    assert socket_codec.negotiate(None) == socket_codec.JSON
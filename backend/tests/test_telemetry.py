@@ -0,0 +1,76 @@
+"""telemetry.downsample(), parse_samples() and watch expiry."""
+from types import SimpleNamespace
+
+import pytest
+
+import telemetry
+
+
+def test_downsample_keeps_min_and_max_per_bucket():
+    samples = [
+        [1000, 0.1, 0.0, 1.0, 40.0],
+        [1100, -0.6, 0.2, 1.0, 41.0],   # braking spike
+        [1200, 0.0, -0.1, 1.0, 39.5],
+        [2000, 0.2, 0.0, 1.0, 38.0],
+    ]
+
+    buckets = telemetry.downsample(samples, 1)
+
+    assert buckets == [
+        [1000, [-0.6, -0.1, 1.0, 39.5], [0.1, 0.2, 1.0, 41.0]],
+        [2000, [0.2, 0.0, 1.0, 38.0], [0.2, 0.0, 1.0, 38.0]],
+    ]
+
+
+def test_downsample_aligns_buckets_to_the_clock():
+    samples = [[t, float(t)] for t in range(1050, 2050, 100)]   # 10 Hz, off the boundary
+
+    buckets = telemetry.downsample(samples, 2)
+
+    assert buckets == [[1000, [1050.0], [1450.0]], [1500, [1550.0], [1950.0]]]
+
+
+def test_downsample_at_source_rate_keeps_every_sample():
+    samples = [[t, 1.0, 2.0, 3.0, 4.0] for t in range(0, 1000, 100)]
+
+    buckets = telemetry.downsample(samples, telemetry.SOURCE_RATE)
+
+    assert len(buckets) == len(samples)
+    assert all(low == high for _, low, high in buckets)
+
+
+def test_downsample_empty():
+    assert telemetry.downsample([], 1) == []
+
+
+def test_parse_samples_validates_rows():
+    rows = telemetry.parse_samples({'fields': list(telemetry.FIELDS), 'samples': [['1000', '0.5', 0, 1, 40]]})
+
+    assert rows == [[1000, 0.5, 0.0, 1.0, 40.0]]
+    with pytest.raises(ValueError):
+        telemetry.parse_samples({'fields': ['speed'], 'samples': []})
+    with pytest.raises(ValueError):
+        telemetry.parse_samples({'samples': [[1000, 0.5]]})
+    with pytest.raises(ValueError):
+        telemetry.parse_samples({'samples': [[1000, 'x', 0, 1, 40]]})
+    with pytest.raises(ValueError):
+        telemetry.parse_samples({'samples': [[0, 0, 0, 0, 0]] * (telemetry.MAX_BATCH + 1)})
+
+
+def test_watches_expire_unless_their_worker_refreshes_them(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(telemetry, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    watchers = telemetry.TelemetryWatchers()
+    monkeypatch.setattr(watchers, '_ensure_heartbeat', lambda: None)
+    watchers.watch('local', 1, 2, record=True)
+    watchers.add('remote', 1, 5)           # replayed from another worker
+
+    clock.now = telemetry.WATCH_TTL - 1
+    watchers.refresh_owned()
+    assert watchers.get(1) == ({2, 5}, True)
+
+    clock.now = telemetry.WATCH_TTL + 1    # the other worker stopped refreshing
+    assert watchers.get(1) == ({2}, True)
+
+    watchers.unwatch('local')
+    assert watchers.get(1) == (set(), False)
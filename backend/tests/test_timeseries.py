@@ -0,0 +1,67 @@
+"""/api/analytics/timeseries buckets and their cache."""
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import DrivingEvent
+from routes.analytics import floor_bucket
+
+
+def _series(client, start, end, group_by='severity'):
+    return client.get('/api/analytics/timeseries', query_string={
+        'bucket': 'hour', 'group_by': group_by, 'from': start.isoformat(), 'to': end.isoformat(),
+    }).get_json()
+
+
+def test_counts_per_bucket_with_empty_buckets_filled(client, add_event):
+    hour = floor_bucket(datetime.utcnow(), 'hour') - timedelta(hours=3)
+    add_event(severity='HIGH', timestamp=hour + timedelta(minutes=10))
+    add_event(severity='LOW', timestamp=hour + timedelta(minutes=20))
+    add_event(severity='HIGH', timestamp=hour + timedelta(hours=2, minutes=5))
+
+    body = _series(client, hour, hour + timedelta(hours=2, minutes=30))
+
+    assert body['buckets'] == [(hour + timedelta(hours=h)).isoformat() for h in range(3)]
+    assert body['series'] == {'HIGH': [1, 0, 1], 'LOW': [1, 0, 0]}
+    assert body['totals'] == [2, 0, 1]
+
+
+def test_group_by_bus(client, add_event):
+    hour = floor_bucket(datetime.utcnow(), 'hour') - timedelta(hours=1)
+    add_event(bus_id=2, timestamp=hour + timedelta(minutes=1))
+
+    body = _series(client, hour, hour + timedelta(minutes=30), group_by='bus')
+
+    assert list(body['series']) == ['KL-01-CD-5678']
+
+
+def test_closed_buckets_are_cached_until_a_late_upload(app, client, add_event):
+    hour = floor_bucket(datetime.utcnow(), 'hour') - timedelta(hours=2)
+    add_event(timestamp=hour + timedelta(minutes=5))
+    assert _series(client, hour, hour + timedelta(minutes=30))['totals'] == [1]
+
+    # Written behind the API's back: the cached bucket does not see it
+    with app.app_context():
+        db.session.add(DrivingEvent(bus_id=1, event_type='HARSH_BRAKE', severity='HIGH',
+                                    timestamp=hour + timedelta(minutes=10)))
+        db.session.commit()
+    assert _series(client, hour, hour + timedelta(minutes=30))['totals'] == [1]
+
+    # A late upload through the API drops the bucket
+    add_event(timestamp=hour + timedelta(minutes=15))
+    assert _series(client, hour, hour + timedelta(minutes=30))['totals'] == [3]
+
+
+def test_open_bucket_is_always_recomputed(client, add_event):
+    hour = floor_bucket(datetime.utcnow(), 'hour')
+    add_event()
+    assert _series(client, hour, datetime.utcnow())['totals'] == [1]
+
+    add_event()
+    assert _series(client, hour, datetime.utcnow())['totals'] == [2]
+
+
+def test_invalid_arguments(client):
+    assert client.get('/api/analytics/timeseries?bucket=minute').status_code == 400
+    assert client.get('/api/analytics/timeseries?group_by=driver').status_code == 400
+    assert client.get('/api/analytics/timeseries?from=yesterday').status_code == 400
+    assert client.get('/api/analytics/timeseries?bucket=hour&from=2000-01-01T00:00:00').status_code == 400
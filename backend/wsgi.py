@@ -0,0 +1,13 @@
+"""
+WSGI entrypoint for the production server of the Rash Driving Detection System.
+Loads .env before the app so module-level settings (Socket.IO transport,
+message queue, database profile) see it.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import app  # noqa: E402
@@ -67,7 +67,7 @@ export default function HomeScreen() {
     const [selectedEvent, setSelectedEvent] = useState<DrivingEvent | null>(null);
 
     // Socket.IO for real-time alerts
-    const { isConnected: socketConnected, subscribe } = useSocketIO(api.getApiUrl());
+    const { isConnected: socketConnected, subscribe, emit } = useSocketIO(api.getApiUrl());
 
     // ─── Live Timer ──────────────────────────────────────
     const timerRef = useRef<ReturnType<typeof setInterval> | null>(null);
@@ -93,6 +93,14 @@ export default function HomeScreen() {
     }, [activeTrip?.started_at]);
 
     // ─── Socket.IO real-time events ──────────────────────
+    // Only this driver's alerts and their trip bus's updates, not the whole fleet
+    useEffect(() => {
+        if (!socketConnected) return;
+        api.getToken().then(token => {
+            if (token) emit('subscribe', { token });
+        });
+    }, [socketConnected, emit, activeTrip?.bus_id]);
+
     useEffect(() => {
         const unsubscribe = subscribe('new_alert', (event: DrivingEvent) => {
             // Only add events for our active trip's bus
@@ -7,6 +7,7 @@
 
 import { useEffect, useState, useRef, useCallback } from 'react';
 import { io, type Socket } from 'socket.io-client';
+import { decodeArg, invertCodebook } from '@/services/msgpack';
 
 interface UseSocketIOReturn {
     isConnected: boolean;
@@ -19,18 +20,28 @@ export function useSocketIO(url: string): UseSocketIOReturn {
     const [isConnected, setIsConnected] = useState(false);
     const socketRef = useRef<Socket | null>(null);
     const listenersRef = useRef<Map<string, (...args: any[]) => void>>(new Map());
+    // Binary frame key codes -> field names, from the server's `connected` reply
+    const fieldNamesRef = useRef<Record<string, string>>({});
 
     useEffect(() => {
         if (!url) return;
 
         const socket = io(url, {
-            transports: ['polling', 'websocket'],
+            // WebSocket first (production server); falls back to polling on the dev server
+            transports: ['websocket', 'polling'],
+            tryAllTransports: true,
+            // MessagePack frames with short keys: less data and faster parsing on the phone
+            auth: { encoding: 'msgpack' },
             reconnection: true,
             reconnectionDelay: 1000,
             reconnectionAttempts: 10,
             timeout: 10000,
         });
 
+        socket.on('connected', (data: { fields?: Record<string, string> }) => {
+            fieldNamesRef.current = data?.fields ? invertCodebook(data.fields) : {};
+        });
+
         socket.on('connect', () => {
             setIsConnected(true);
             console.log('[SocketIO] Connected');
@@ -58,11 +69,12 @@ export function useSocketIO(url: string): UseSocketIOReturn {
     const subscribe = useCallback((event: string, callback: (...args: any[]) => void) => {
         if (!socketRef.current) return () => {};
 
-        socketRef.current.on(event, callback);
-        listenersRef.current.set(event, callback);
+        const handler = (...args: any[]) => callback(...args.map(arg => decodeArg(arg, fieldNamesRef.current)));
+        socketRef.current.on(event, handler);
+        listenersRef.current.set(event, handler);
 
         return () => {
-            socketRef.current?.off(event, callback);
+            socketRef.current?.off(event, handler);
             listenersRef.current.delete(event);
         };
     }, []);
@@ -0,0 +1,149 @@
+/**
+ * MessagePack decoding for binary Socket.IO frames.
+ *
+ * The backend sends new_alert / bus_updates as MessagePack with short field
+ * codes when the client asks for it on connect. This is a small decode-only
+ * reader (no ext types, no TextDecoder dependency) plus the key expansion
+ * using the codebook from the `connected` reply, so handlers receive the
+ * same objects as with JSON.
+ */
+
+type Value = unknown;
+
+function utf8(bytes: Uint8Array, start: number, end: number): string {
+    let out = '';
+    let i = start;
+    while (i < end) {
+        const b = bytes[i++];
+        let code: number;
+        if (b < 0x80) {
+            code = b;
+        } else if (b < 0xe0) {
+            code = ((b & 0x1f) << 6) | (bytes[i++] & 0x3f);
+        } else if (b < 0xf0) {
+            code = ((b & 0x0f) << 12) | ((bytes[i++] & 0x3f) << 6) | (bytes[i++] & 0x3f);
+        } else {
+            code = ((b & 0x07) << 18) | ((bytes[i++] & 0x3f) << 12) | ((bytes[i++] & 0x3f) << 6) | (bytes[i++] & 0x3f);
+        }
+        out += String.fromCodePoint(code);
+    }
+    return out;
+}
+
+class Reader {
+    private view: DataView;
+    private bytes: Uint8Array;
+    private pos = 0;
+
+    constructor(bytes: Uint8Array) {
+        this.bytes = bytes;
+        this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    }
+
+    read(): Value {
+        const type = this.view.getUint8(this.pos++);
+        if (type <= 0x7f) return type;
+        if (type <= 0x8f) return this.map(type & 0x0f);
+        if (type <= 0x9f) return this.array(type & 0x0f);
+        if (type <= 0xbf) return this.str(type & 0x1f);
+        if (type >= 0xe0) return type - 0x100;
+        switch (type) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return this.bin(this.uint(1));
+            case 0xc5: return this.bin(this.uint(2));
+            case 0xc6: return this.bin(this.uint(4));
+            case 0xca: return this.num(4, (o) => this.view.getFloat32(o));
+            case 0xcb: return this.num(8, (o) => this.view.getFloat64(o));
+            case 0xcc: return this.uint(1);
+            case 0xcd: return this.uint(2);
+            case 0xce: return this.uint(4);
+            case 0xcf: return this.num(8, (o) => this.view.getUint32(o) * 2 ** 32 + this.view.getUint32(o + 4));
+            case 0xd0: return this.num(1, (o) => this.view.getInt8(o));
+            case 0xd1: return this.num(2, (o) => this.view.getInt16(o));
+            case 0xd2: return this.num(4, (o) => this.view.getInt32(o));
+            case 0xd3: return this.num(8, (o) => this.view.getInt32(o) * 2 ** 32 + this.view.getUint32(o + 4));
+            case 0xd9: return this.str(this.uint(1));
+            case 0xda: return this.str(this.uint(2));
+            case 0xdb: return this.str(this.uint(4));
+            case 0xdc: return this.array(this.uint(2));
+            case 0xdd: return this.array(this.uint(4));
+            case 0xde: return this.map(this.uint(2));
+            case 0xdf: return this.map(this.uint(4));
+        }
+        throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+
+    private num(size: number, get: (offset: number) => number): number {
+        const value = get(this.pos);
+        this.pos += size;
+        return value;
+    }
+
+    private uint(size: 1 | 2 | 4): number {
+        const offset = this.pos;
+        this.pos += size;
+        if (size === 1) return this.view.getUint8(offset);
+        if (size === 2) return this.view.getUint16(offset);
+        return this.view.getUint32(offset);
+    }
+
+    private str(length: number): string {
+        const value = utf8(this.bytes, this.pos, this.pos + length);
+        this.pos += length;
+        return value;
+    }
+
+    private bin(length: number): Uint8Array {
+        const value = this.bytes.slice(this.pos, this.pos + length);
+        this.pos += length;
+        return value;
+    }
+
+    private array(length: number): Value[] {
+        const result: Value[] = [];
+        for (let i = 0; i < length; i++) result.push(this.read());
+        return result;
+    }
+
+    private map(length: number): Record<string, Value> {
+        const result: Record<string, Value> = {};
+        for (let i = 0; i < length; i++) {
+            const key = String(this.read());
+            result[key] = this.read();
+        }
+        return result;
+    }
+}
+
+/** Reverse a { field: code } codebook into { code: field }. */
+export function invertCodebook(fields: Record<string, string>): Record<string, string> {
+    return Object.fromEntries(Object.entries(fields).map(([name, code]) => [code, name]));
+}
+
+function expand(value: Value, names: Record<string, string>): Value {
+    if (Array.isArray(value)) return value.map(v => expand(v, names));
+    if (value && typeof value === 'object' && !(value instanceof Uint8Array)) {
+        return Object.fromEntries(
+            Object.entries(value as Record<string, Value>).map(([k, v]) => [names[k] ?? k, expand(v, names)])
+        );
+    }
+    return value;
+}
+
+/** Decode a binary frame into the object the JSON encoding would have sent. */
+export function decodeFrame(data: ArrayBuffer | ArrayBufferView, names: Record<string, string>): Value {
+    const bytes = data instanceof ArrayBuffer
+        ? new Uint8Array(data)
+        : new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+    return expand(new Reader(bytes).read(), names);
+}
+
+/** Decode binary Socket.IO arguments; other arguments pass through. */
+export function decodeArg(arg: Value, names: Record<string, string>): Value {
+    if (arg instanceof ArrayBuffer || ArrayBuffer.isView(arg)) {
+        return decodeFrame(arg as ArrayBuffer | ArrayBufferView, names);
+    }
+    return arg;
+}
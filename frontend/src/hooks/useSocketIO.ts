@@ -1,6 +1,7 @@
 import { useEffect, useState, useRef, useCallback } from 'react'
 import { io, type Socket } from 'socket.io-client'
 import type { ConnectionQuality, SocketIOHook } from '@/types'
+import { decodeArg, invertCodebook } from '@/utils/msgpack'
 
 export function useSocketIO(url: string): SocketIOHook {
   const [isConnected, setIsConnected] = useState(false)
@@ -8,16 +9,26 @@ export function useSocketIO(url: string): SocketIOHook {
   const socketRef = useRef<Socket | null>(null)
   // eslint-disable-next-line @typescript-eslint/no-unsafe-function-type
   const listenersRef = useRef<Map<string, Function>>(new Map())
+  // Binary frame key codes -> field names, from the server's `connected` reply
+  const fieldNamesRef = useRef<Record<string, string>>({})
 
   useEffect(() => {
     // Create socket connection
     const socket = io(url, {
-      transports: ['polling', 'websocket'],
+      // WebSocket first (production server); falls back to polling on the dev server
+      transports: ['websocket', 'polling'],
+      tryAllTransports: true,
+      // Ask for MessagePack frames; servers without it keep sending JSON
+      auth: { encoding: 'msgpack' },
       reconnection: true,
       reconnectionDelay: 1000,
       reconnectionAttempts: 5
     })
 
+    socket.on('connected', (data: { fields?: Record<string, string> }) => {
+      fieldNamesRef.current = data?.fields ? invertCodebook(data.fields) : {}
+    })
+
     socket.on('connect', () => {
       setIsConnected(true)
       setConnectionQuality('excellent')
@@ -47,11 +58,13 @@ export function useSocketIO(url: string): SocketIOHook {
   const subscribe = useCallback((event: string, callback: Function) => {
     if (!socketRef.current) return () => { /* empty */ }
 
-    socketRef.current.on(event, callback as any) // eslint-disable-line @typescript-eslint/no-explicit-any
-    listenersRef.current.set(event, callback)
+    // eslint-disable-next-line @typescript-eslint/no-explicit-any
+    const handler = (...args: any[]) => callback(...args.map(arg => decodeArg(arg, fieldNamesRef.current)))
+    socketRef.current.on(event, handler)
+    listenersRef.current.set(event, handler)
 
     return () => {
-      socketRef.current?.off(event, callback as any) // eslint-disable-line @typescript-eslint/no-explicit-any
+      socketRef.current?.off(event, handler)
       listenersRef.current.delete(event)
     }
   }, [])
@@ -71,11 +71,8 @@ export default function Dashboard() {
 
     const fetchData = useCallback(async () => {
         try {
-            const [statsData, busData, eventsData] = await Promise.all([
-                api.stats.getStats(),
-                api.buses.getBusLocations(),
-                api.events.getEvents({ limit: 20, sort: 'desc' })
-            ])
+            const snapshot = await api.dashboard.getSnapshot(20)
+            const { stats: statsData, locations: busData, events: eventsData } = snapshot
             setStats(statsData)
             // Only show buses that have sent a location within the last 30 seconds
             const now = Date.now()
@@ -130,27 +127,24 @@ export default function Dashboard() {
             } : prev)
         })
 
+        // One batched frame per second with the buses that moved
         // eslint-disable-next-line @typescript-eslint/no-explicit-any
-        const unsubBus = subscribe('bus_update', (data: any) => {
-            if (Array.isArray(data)) {
-                const now = Date.now()
-                data.forEach((b: any) => busLastSeenRef.current.set(b.bus_id, now))
-                setBuses(data)
-            } else {
-                // Mark this bus as freshly seen
-                busLastSeenRef.current.set(data.bus_id, Date.now())
-                setBuses(prev => {
+        const unsubBus = subscribe('bus_updates', (updates: any[]) => {
+            const now = Date.now()
+            updates.forEach((b: any) => busLastSeenRef.current.set(b.bus_id, now))
+            setBuses(prev => {
+                const next = [...prev]
+                updates.forEach((data: any) => {
                     const mapped = mapBusLocation(data)
-                    const index = prev.findIndex(b => b.bus_id === mapped.bus_id)
+                    const index = next.findIndex(b => b.bus_id === mapped.bus_id)
                     if (index >= 0) {
-                        const newBuses = [...prev]
-                        newBuses[index] = { ...newBuses[index], ...mapped }
-                        return newBuses
+                        next[index] = { ...next[index], ...mapped }
                     } else {
-                        return [...prev, mapped]
+                        next.push(mapped)
                     }
                 })
-            }
+                return next
+            })
         })
 
         // Sweep stale buses every 5 seconds
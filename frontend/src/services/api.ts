@@ -72,6 +72,19 @@ async function apiFetch<T>(
  * ═══════════════════════════════════════════════════
  */
 
+/**
+ * Map raw backend stats to the frontend DashboardStats type
+ */
+export function mapStats(data: any): DashboardStats { // eslint-disable-line @typescript-eslint/no-explicit-any
+  return {
+    total_events_today: data.today_events ?? 0,
+    active_buses: data.active_buses ?? 0,
+    total_buses: data.total_buses ?? 0,
+    high_severity_count: data.high_severity ?? 0,
+    event_breakdown: data.events_by_type ?? {}
+  }
+}
+
 export const statsApi = {
   /**
    * Get dashboard statistics
@@ -79,13 +92,7 @@ export const statsApi = {
    */
   async getStats(): Promise<DashboardStats> {
     const data = await apiFetch<any>('/api/stats') // eslint-disable-line @typescript-eslint/no-explicit-any
-    return {
-      total_events_today: data.today_events ?? 0,
-      active_buses: data.active_buses ?? 0,
-      total_buses: data.total_buses ?? 0,
-      high_severity_count: data.high_severity ?? 0,
-      event_breakdown: data.events_by_type ?? {}
-    }
+    return mapStats(data)
   }
 }
 
@@ -361,6 +368,41 @@ export const analyticsApi = {
   }
 }
 
+/**
+ * ═══════════════════════════════════════════════════
+ * DASHBOARD API
+ * ═══════════════════════════════════════════════════
+ */
+
+export interface DashboardSnapshot {
+  version: string
+  latestEventId: number
+  stats: DashboardStats
+  buses: Bus[]
+  locations: BusLocation[]
+  events: Event[]
+  simulation: { running: boolean; pid: number | null }
+}
+
+export const dashboardApi = {
+  /**
+   * Get everything needed for first paint in one round-trip
+   * GET /api/dashboard/snapshot
+   */
+  async getSnapshot(eventsLimit = 20): Promise<DashboardSnapshot> {
+    const data = await apiFetch<any>(`/api/dashboard/snapshot?events_limit=${eventsLimit}`) // eslint-disable-line @typescript-eslint/no-explicit-any
+    return {
+      version: data.version,
+      latestEventId: data.latest_event_id ?? 0,
+      stats: mapStats(data.stats ?? {}),
+      buses: data.buses?.buses || [],
+      locations: (data.locations?.locations || []).map(mapBusLocation),
+      events: (data.events?.events || []).map(mapEvent),
+      simulation: data.simulation ?? { running: false, pid: null }
+    }
+  }
+}
+
 /**
  * ═══════════════════════════════════════════════════
  * COMBINED API EXPORT
@@ -375,7 +417,8 @@ const api = {
   export: exportApi,
   auth: authApi,
   simulation: simulationApi,
-  analytics: analyticsApi
+  analytics: analyticsApi,
+  dashboard: dashboardApi
 }
 
 export default api
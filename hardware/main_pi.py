@@ -38,6 +38,7 @@ from sensors.ultrasonic import UltrasonicSensor, OvertakingDetector
 from sensors.sensor_fusion import KalmanFilter
 from sensors.phone_gps import PhoneGPSReceiver
 from data_manager import DataManager
+from telemetry_stream import TelemetryStreamer
 
 # Flask for Pi Connect Mode demo server (optional)
 try:
@@ -83,6 +84,8 @@ def _parse_args():
                    help='Run network_setup.py to auto-connect WiFi first')
     p.add_argument('--demo-port', metavar='PORT', type=int, default=8082,
                    help='Port for the demo server (default: 8082)')
+    p.add_argument('--telemetry', action='store_true',
+                   help='Stream live 10 Hz telemetry while a dashboard watches')
     return p.parse_args()
 
 _cli = _parse_args()
@@ -93,6 +96,9 @@ BUS_REGISTRATION = _cli.bus or os.getenv('BUS_REGISTRATION', 'KL-01-TEST-001')
 SAMPLE_RATE = float(os.getenv('SAMPLE_RATE', '0.1'))  # 100ms = 10Hz
 ENABLE_CAMERA = os.getenv('ENABLE_CAMERA', 'true').lower() == 'true'
 API_KEY = os.getenv('API_KEY', 'default-secure-key-123')
+# Live telemetry relay (telemetry_stream.py) — off unless enabled
+TELEMETRY_STREAM = _cli.telemetry or os.getenv('TELEMETRY_STREAM', 'false').lower() == 'true'
+TELEMETRY_IDLE_POLL = float(os.getenv('TELEMETRY_IDLE_POLL', '5'))  # seconds between "anyone watching?" checks
 
 # Phone GPS receiver port
 PHONE_GPS_PORT = _cli.gps_port or int(os.getenv('PHONE_GPS_PORT', '8081'))
@@ -749,6 +755,11 @@ def main():
     print("─"*50)
     register_bus_with_backend()
     _start_heartbeat()
+    telemetry = None
+    if TELEMETRY_STREAM:
+        telemetry = TelemetryStreamer(SERVER_URL, API_KEY, lambda: BUS_ID,
+                                      idle_poll=TELEMETRY_IDLE_POLL)
+        print("📈 Live telemetry streaming enabled (sends only while watched)")
     _wait_for_user("Bus registration done. Press ENTER to proceed to IMU calibration...")
 
     # ── STEP 2: IMU Calibration ──────────────────────────────
@@ -921,6 +932,10 @@ def main():
             # else: GPS stale >10 s — skip predict to freeze speed estimate
                 
             estimated_speed = kf.get_speed()
+
+            # --- LIVE TELEMETRY (only buffered while a dashboard watches) ---
+            if telemetry:
+                telemetry.add(accel, estimated_speed)
             
             # --- LIVE LOCATION UPDATE (for Live Map) ---
             if (current_time - last_location_update >= LOCATION_UPDATE_INTERVAL
@@ -1057,6 +1072,7 @@ def main():
         if gps: gps.close()
         if camera: camera.close()
         if overtaking_detector: ultrasonic.cleanup()
+        if telemetry: telemetry.close()
         data_manager.close()
 
 
@@ -0,0 +1,102 @@
+"""
+Live Telemetry Streamer (optional)
+
+Streams the raw 10 Hz IMU/speed samples of the sensor loop to the backend,
+which relays them to dashboards over Socket.IO. Samples are batched per
+wall-clock second (one small HTTP request per second, never a request per
+sample) and only while someone is watching: the backend answers every POST
+with whether the bus has watchers, and when it has none the streamer stops
+buffering and just checks back every TELEMETRY_IDLE_POLL seconds.
+
+Enable with TELEMETRY_STREAM=true (or --telemetry).
+"""
+
+import threading
+import time
+import requests
+
+FIELDS = ('ax', 'ay', 'az', 'speed')
+MAX_BUFFERED = 600        # samples kept while the server is unreachable (~1 min)
+
+
+class TelemetryStreamer:
+    """Buffers samples from the sensor loop and posts them once per second."""
+
+    def __init__(self, server_url, api_key, bus_id_getter, idle_poll=5.0):
+        self.server_url = server_url
+        self.api_key = api_key
+        self.bus_id_getter = bus_id_getter   # bus ID is resolved in the background
+        self.idle_poll = idle_poll
+        self.watched = False
+        self.lock = threading.Lock()
+        self.samples = []
+
+        self.running = True
+        self.thread = threading.Thread(target=self._send_loop, daemon=True, name='telemetry-stream')
+        self.thread.start()
+
+    def add(self, accel, speed):
+        """Record one sample (called every loop iteration; cheap when nobody watches)."""
+        if not self.watched:
+            return
+        sample = [int(time.time() * 1000),
+                  round(accel['x'], 3), round(accel['y'], 3), round(accel['z'], 3),
+                  round(speed, 1)]
+        with self.lock:
+            self.samples.append(sample)
+            if len(self.samples) > MAX_BUFFERED:
+                del self.samples[:len(self.samples) - MAX_BUFFERED]
+
+    def _take_complete_seconds(self):
+        """
+        Samples of every finished second. A second is never split across two
+        posts, so the backend can downsample each post on its own.
+        """
+        boundary = int(time.time()) * 1000
+        with self.lock:
+            split = len(self.samples)
+            while split and self.samples[split - 1][0] >= boundary:
+                split -= 1
+            batch = self.samples[:split]
+            del self.samples[:split]
+        return batch
+
+    def _post(self, bus_id, samples):
+        try:
+            r = requests.post(
+                f"{self.server_url}/api/buses/{bus_id}/telemetry",
+                json={'fields': FIELDS, 'samples': samples},
+                headers={'X-API-Key': self.api_key},
+                timeout=3,
+            )
+            if r.status_code != 200:
+                return False
+            self.watched = bool(r.json().get('watched'))
+            if not self.watched:
+                with self.lock:
+                    self.samples.clear()
+            return True
+        except Exception:
+            return False  # Non-critical; the samples are retried with the next post
+
+    def _send_loop(self):
+        last_poll = 0.0
+        while self.running:
+            # Wake just after each second boundary
+            time.sleep(1.0 - time.time() % 1.0 + 0.02)
+            bus_id = self.bus_id_getter()
+            if bus_id is None:
+                continue
+            if self.watched:
+                batch = self._take_complete_seconds()
+                if batch and not self._post(bus_id, batch):
+                    with self.lock:
+                        self.samples[:0] = batch
+                        del self.samples[:max(0, len(self.samples) - MAX_BUFFERED)]
+            elif time.time() - last_poll >= self.idle_poll:
+                # Empty post: just asks whether anyone started watching
+                self._post(bus_id, [])
+                last_poll = time.time()
+
+    def close(self):
+        self.running = False